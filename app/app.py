@@ -1,8 +1,15 @@
+import asyncio
 import reflex as rx 
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse
+from starlette.routing import Route
 from app.components.sidebar.logo import logo
 from app.components.sidebar.nav import navigation
 from app.components.sidebar.ratio_card import ratio_card
 from app.components.sidebar.user_card import user_card
+from app.model.search import PALETTE_BUDGET_MS, PALETTE_K
+from app.model.snapshot import cache_stats, get_dataset
+from app.model.watcher import track_sessions, watch_data_dir
 
 def sidebar(current: str) -> rx.Component:
     return rx.vstack(
@@ -63,6 +70,31 @@ def analytics() -> rx.Component:
     return layout("/analytics", view())
 
 
+async def data_stats(request):
+    """Scrape endpoint: shared-dataset cache counters + per-table load breakdown."""
+    return JSONResponse(cache_stats())
+
+def _int_param(request, name: str, default: int, hi: int) -> int:
+    try:
+        return max(1, min(hi, int(request.query_params.get(name, default))))
+    except ValueError:
+        return default
+
+async def search(request):
+    """Command palette: ?q=&k=&budget_ms= -> top-k hits per entity type."""
+    q = request.query_params.get("q", "")
+    k = _int_param(request, "k", PALETTE_K, 50)
+    budget = _int_param(request, "budget_ms", PALETTE_BUDGET_MS, 1000)
+    # the first call may still load the snapshot: keep it off the event loop
+    hits = await asyncio.to_thread(lambda: get_dataset().search_index.palette(q, k, budget))
+    return JSONResponse(hits)
+
 app = rx.App(
-    stylesheets=["/index.css"]
-)
\ No newline at end of file
+    stylesheets=["/index.css"],
+    api_transformer=Starlette(routes=[Route("/api/data-stats", data_stats),
+                                         Route("/api/search", search)]),
+)
+# pick up fresh CSV extracts dropped into app/data without a restart
+app.register_lifespan_task(watch_data_dir)
+# follow tasks of disconnected sessions check here and stop
+track_sessions(app)
\ No newline at end of file
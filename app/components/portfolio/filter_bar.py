@@ -4,7 +4,7 @@ from app.state import AppState as State
 
 def _chip_select(
     value: rx.Var,
-    items: rx.Var | list[str],
+    items: rx.Var | list[dict],
     on_change,
     placeholder: str,
 ) -> rx.Component:
@@ -26,8 +26,9 @@ def _chip_select(
             ),
             # Dropdown items
             rx.select.content(
-                rx.foreach(items, lambda it: rx.select.item(it, 
-                                                            value=it,
+                # items are {"value", "label"}: the label carries the live count
+                rx.foreach(items, lambda it: rx.select.item(it["label"],
+                                                            value=it["value"],
                                                             style={"color":"#0F172A"})),
                 bg="white",
             ),
@@ -39,6 +40,28 @@ def _chip_select(
         width="100%",
     )
 
+def _as_of_chip() -> rx.Component:
+    # only the bookings active on this day feed the cards (blank = all bookings)
+    return rx.hstack(
+        rx.icon(tag="calendar", size=16, color="#64748B"),
+        rx.input(
+            type="date",
+            value=State.as_of,
+            on_change=State.set_as_of,
+            size="2",
+            radius="full",
+            title="As of",
+            style={"color": "#0F172A", "background": "#FFFFFF", "border": "1px solid #E2E8F0"},
+        ),
+        rx.cond(
+            State.as_of != "",
+            rx.icon_button(rx.icon(tag="x", size=14), size="1", variant="ghost",
+                           radius="full", on_click=State.clear_as_of),
+        ),
+        spacing="2",
+        align="center",
+    )
+
 def filter_bar() -> rx.Component:
     """Filter bar shown under the page header and above KPI cards."""
     icon_chip = rx.box(
@@ -52,28 +75,28 @@ def filter_bar() -> rx.Component:
 
     chips_grid = rx.grid(
         _chip_select(State.status, 
-                     State.status_options, 
+                     State.status_option_items, 
                      State.set_status,
                     #  lambda v: State.set_status(v), 
                      "All Status"),
 
         _chip_select(State.phase, 
-                     State.phase_options, 
+                     State.phase_option_items, 
                      lambda v: State.set_phase(v),
                      "All Phases"),
 
         _chip_select(State.priority, 
-                     State.priority_options, 
+                     State.priority_option_items, 
                      lambda v: State.set_priority(v),
                      "All Priority"),
 
         _chip_select(State.therapeutic_area,
-                     State.area_options, 
+                     State.area_option_items, 
                      lambda v: State.set_therapeutic_area(v),
                      "All Areas"),
 
         _chip_select(State.department, 
-                     State.department_options, 
+                     State.department_option_items, 
                      lambda v: State.set_department(v), 
                      "All Departments"),
 
@@ -91,6 +114,7 @@ def filter_bar() -> rx.Component:
                 width="100%",
                 min_width="240px",
             ),
+            _as_of_chip(),
             align="center",
             width="100%",
             column_gap="3",
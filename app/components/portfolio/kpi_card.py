@@ -7,7 +7,7 @@ def kpi_card(
     subtitle: str | None = None,
     *,
     icon_text: str = "•",
-    accent: str = "indigo-sky",          # indigo-sky | emerald | violet
+    accent: str = "indigo-sky",          # indigo-sky | emerald | violet | rose
     trend_text: str | None = None,
     trend_positive: bool = True,
 ) -> rx.Component:
@@ -24,6 +24,10 @@ def kpi_card(
             "bubble": "linear-gradient(135deg, #EDE9FE 0%, #F5D0FE 100%)",
             "pill":   "linear-gradient(135deg, #8B5CF6 0%, #A855F7 100%)",
         },
+        "rose": {
+            "bubble": "linear-gradient(135deg, #FFE4E6 0%, #FEF3C7 100%)",
+            "pill":   "linear-gradient(135deg, #E11D48 0%, #F59E0B 100%)",
+        },
     }
     g = grads.get(accent, grads["indigo-sky"])
     trend_color = "#059669" if trend_positive else "#DC2626"
@@ -68,6 +68,20 @@ def _resource_count_pill(count_var: rx.Var) -> rx.Component:
         style={"background": "#F1F5F9"},
     )
 
+def _stat_pill(icon: str, text: rx.Var, color: str = "#475569", bg: str = "#F1F5F9") -> rx.Component:
+    return rx.box(
+        rx.hstack(
+            rx.icon(tag=icon, size=14, color=color),
+            rx.text(text, size="1", weight="regular", color=color),
+            spacing="1",
+            align="center",
+        ),
+        padding_x="8px",
+        padding_y="4px",
+        border_radius="9999px",
+        style={"background": bg},
+    )
+
 # --- individual trial card ----------------------------------------------------
 def trial_card(t: dict) -> rx.Component:
     # selection indicator uses reactive expression with '=='
@@ -107,6 +121,14 @@ def trial_card(t: dict) -> rx.Component:
                 _phase_pill(t["phase"]),
                 _bullet(),
                 _resource_count_pill(t.get("resource_count", 0)),
+                # precomputed with the snapshot (AppState.filtered_trials_with_counts)
+                _stat_pill("clock", t["weekly_hours"].to_string() + " h/wk"),
+                _stat_pill("gauge", t["avg_util"].to_string() + "% avg util"),
+                rx.cond(
+                    t["overallocated"].to(int) > 0,
+                    _stat_pill("triangle-alert", t["overallocated"].to_string() + " over-allocated",
+                               color="#B91C1C", bg="#FEE2E2"),
+                ),
                 spacing="2",
                 align="center",
                 # wrap="wrap",
@@ -16,6 +16,100 @@ def _kpi_card(value: str, label: str) -> rx.Component:
         width="100%",
     )
 
+def _contributor(c) -> rx.Component:
+    return rx.badge(
+        rx.fragment(c["trial"], " · ", c["pct"], " · ", c["hours"]),
+        color_scheme="red",
+        variant="soft",
+        radius="full",
+    )
+
+def _overload_callout() -> rx.Component:
+    # booked above 100% across the portfolio: show which trials add up to it
+    return rx.box(
+        rx.vstack(
+            rx.hstack(
+                rx.icon(tag="triangle-alert", size=16, color="#DC2626"),
+                rx.text("Over-allocated across trials", weight="medium", color="#DC2626"),
+                spacing="2",
+                align="center",
+            ),
+            rx.flex(
+                rx.foreach(State.selected_resource_contributors, _contributor),
+                wrap="wrap",
+                gap="8px",
+            ),
+            spacing="2",
+            align="start",
+        ),
+        bg="#FEF2F2",
+        border="1px solid #FECACA",
+        border_radius="12px",
+        padding="12px 16px",
+        width="100%",
+    )
+
+def _conflict_row(c) -> rx.Component:
+    return rx.hstack(
+        rx.icon(tag="calendar", size=14, color="#B45309"),
+        rx.text(c["range"], weight="medium"),
+        rx.badge(c["peak"], color_scheme="amber", variant="soft", radius="full"),
+        rx.text(c["trials"], size="2", color="#64748B"),
+        spacing="2",
+        align="center",
+        wrap="wrap",
+    )
+
+def _conflicts() -> rx.Component:
+    # dated: the windows in which the bookings running together exceed capacity
+    return rx.box(
+        rx.vstack(
+            rx.text("Capacity Conflicts", weight="bold"),
+            rx.foreach(State.selected_resource_conflicts, _conflict_row),
+            spacing="2",
+            align="start",
+        ),
+        bg="#FFFBEB",
+        border="1px solid #FDE68A",
+        border_radius="12px",
+        padding="12px 16px",
+        width="100%",
+    )
+
+def _weekly_load() -> rx.Component:
+    # time-phased: booked hours over each week's capacity (no bar while unavailable)
+    chart = rx.recharts.bar_chart(
+        rx.recharts.cartesian_grid(stroke_dasharray="3 3"),
+        rx.recharts.x_axis(data_key="week", min_tick_gap=24),
+        rx.recharts.y_axis(unit="%"),
+        rx.recharts.tooltip(),
+        rx.recharts.reference_line(y=100, stroke="#DC2626", stroke_dasharray="4 4"),
+        rx.recharts.bar(data_key="load", fill="#3B82F6"),
+        data=State.selected_resource_weekly,
+        width="100%",
+        height=200,
+    )
+    return rx.box(
+        rx.vstack(
+            rx.hstack(
+                rx.text("Weekly Load", weight="bold"),
+                rx.spacer(),
+                rx.text(State.selected_resource_away, size="2", color="#B45309"),
+                rx.text(State.selected_resource_peak, size="2", color="#64748B"),
+                width="100%",
+                align="center",
+            ),
+            chart,
+            spacing="2",
+            width="100%",
+        ),
+        bg="#FFFFFF",
+        border="1px solid #E5E7EB",
+        border_radius="12px",
+        padding="16px",
+        width="100%",
+    )
+
 def _alloc_header() -> rx.Component:
     # Title row with back button and "Add Allocation"
     return rx.hstack(
@@ -36,6 +130,7 @@ def _alloc_header() -> rx.Component:
                     ),
                     color="#64748B",
                 ),
+                rx.text(State.selected_resource["availability"], size="2", color="#64748B"),
                 spacing="1",
                 align="start",
             ),
@@ -132,16 +227,19 @@ def allocations_panel() -> rx.Component:
             rx.box(
                 rx.vstack(
                     _alloc_header(),
-                    # KPI row (optional placeholders; remove if you prefer)
+                    # KPI row: the person's load across every trial they are booked on
                     rx.grid(
-                        _kpi_card("40h", "Weekly Capacity"),
-                        _kpi_card("60%", "Total Allocation"),
-                        _kpi_card("24h", "Weekly Hours"),
-                        _kpi_card("2", "Active Trials"),
+                        _kpi_card(State.selected_resource_load["capacity"], "Weekly Capacity"),
+                        _kpi_card(State.selected_resource_load["load"], "Total Allocation"),
+                        _kpi_card(State.selected_resource_load["hours"], "Weekly Hours"),
+                        _kpi_card(State.selected_resource_load["trials"], "Trials"),
                         columns="4",
                         gap="16px",
                         width="100%",
                     ),
+                    rx.cond(State.selected_resource_overallocated, _overload_callout()),
+                    rx.cond(State.selected_resource_conflicts.length() > 0, _conflicts()),
+                    rx.cond(State.selected_resource_weekly.length() > 0, _weekly_load()),
                     _alloc_table(),
                     spacing="4",
                     width="100%",
@@ -0,0 +1,73 @@
+import reflex as rx
+from app.state import AppState as State
+from app.model.simulation import HORIZON
+
+def _cell(c) -> rx.Component:
+    return rx.box(
+        rx.text(c["text"], size="1", weight="medium", color=c["color"], trim="both"),
+        bg=c["bg"],
+        border_radius="6px",
+        padding="6px 8px",
+        white_space="nowrap",
+        overflow="hidden",
+        text_overflow="ellipsis",
+    )
+
+def _flag(f) -> rx.Component:
+    return rx.hstack(
+        rx.icon(tag="triangle-alert", size=14, color="#DC2626"),
+        rx.text(f["role"], weight="medium"),
+        rx.text(rx.fragment("short from ", f["month"]), color="#64748B"),
+        rx.badge(f["p"], color_scheme="red", variant="soft", radius="full"),
+        spacing="2",
+        align="center",
+    )
+
+def capacity_planning() -> rx.Component:
+    # shortage probability per role and month, from the Monte Carlo forecast
+    return rx.vstack(
+        rx.hstack(
+            rx.text("Capacity Planning", weight="bold", size="4"),
+            rx.spacer(),
+            rx.text(State.forecast_summary, size="2", color="#64748B"),
+            width="100%",
+            align="center",
+        ),
+        rx.cond(
+            State.forecast_flags.length() > 0,
+            rx.box(
+                rx.vstack(
+                    rx.foreach(State.forecast_flags, _flag),
+                    spacing="2",
+                    align="start",
+                ),
+                bg="#FEF2F2",
+                border="1px solid #FECACA",
+                border_radius="12px",
+                padding="12px 16px",
+                width="100%",
+            ),
+        ),
+        rx.box(
+            rx.grid(
+                rx.foreach(State.forecast_cells, _cell),
+                # role names, then one narrow column per month
+                grid_template_columns=f"minmax(180px, 1.5fr) repeat({HORIZON}, minmax(52px, 1fr))",
+                gap="4px",
+                width="100%",
+            ),
+            bg="#FFFFFF",
+            border="1px solid #E5E7EB",
+            border_radius="12px",
+            padding="16px",
+            overflow_x="auto",
+            width="100%",
+        ),
+        rx.text(
+            "Share of simulated scenarios in which the role's demand exceeds its roster capacity that month.",
+            size="1",
+            color="#94A3B8",
+        ),
+        spacing="3",
+        width="100%",
+    )
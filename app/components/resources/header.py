@@ -5,6 +5,16 @@ def _title_block() -> rx.Component:
     return rx.vstack(
         rx.heading("Resource Management", size="8"),
         rx.text("Manage resources, capacity planning, and trial allocations"),
+        rx.cond(
+            State.overallocated_people > 0,
+            rx.hstack(
+                rx.icon(tag="triangle-alert", size=14, color="#DC2626"),
+                rx.text(State.overallocated_people.to_string() + " people over 100% across trials",
+                        size="2", color="#DC2626"),
+                spacing="1",
+                align="center",
+            ),
+        ),
         spacing="2",
         align="start",
     )
@@ -29,6 +39,26 @@ def _primary_actions() -> rx.Component:
         align="center",
     )
 
+def _as_of() -> rx.Component:
+    # bookings active on this day only (blank = all bookings)
+    return rx.hstack(
+        rx.text("As of", size="2", color="#64748B"),
+        rx.input(
+            type="date",
+            value=State.as_of,
+            on_change=State.set_as_of,
+            size="3",
+            style={"background": "#FFFFFF", "border": "1px solid #E2E8F0", "color": "#0F172A"},
+        ),
+        rx.cond(
+            State.as_of != "",
+            rx.icon_button(rx.icon(tag="x", size=14), size="1", variant="ghost",
+                           radius="full", on_click=State.clear_as_of),
+        ),
+        spacing="2",
+        align="center",
+    )
+
 def _search_row() -> rx.Component:
     return rx.box(
         rx.hstack(
@@ -47,9 +77,20 @@ def _search_row() -> rx.Component:
                     "color":"#0F172A",
                 }
             ),
+            _as_of(),
             spacing="2",
             align="center",
         ),
+        rx.cond(
+            State.resources_search != "",
+            rx.text(
+                State.open_positions_count.to_string() + " open positions match",
+                size="1",
+                color="#64748B",
+                padding_left="26px",
+                padding_top="4px",
+            ),
+        ),
         padding="10px",
         border_radius="10px",
         width="100%",
@@ -70,6 +111,11 @@ def _tabs_row() -> rx.Component:
                     value="resources",
                     on_click=lambda: State.set_resources_tab("resources"),
                 ),
+                rx.tabs.trigger(
+                    rx.text("Capacity Planning"),
+                    value="capacity_planning",
+                    on_click=State.open_capacity_planning,
+                ),
             ],
             wrap="wrap",
             gap="6px",
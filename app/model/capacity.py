@@ -0,0 +1,89 @@
+# app/model/capacity.py
+"""Effective capacity: each person's capacity hours per week, built once per snapshot.
+
+Utilization divides booked hours by a flat roster `capacity`, as if everyone
+were around for every week of every study. The calendar here is people x
+weeks on the rows and week axis of the weekly timeline (app/model/timeline.py):
+a roster row has its capacity in each week its availability_start ..
+availability_end overlaps and zero outside it; people who are not on the
+roster have none. A blank availability date is open on that side.
+
+Overrides (CapacityOverride.csv: resource_id, start_date, end_date,
+weekly_hours) then replace the hours for the weeks they cover - 0 for leave,
+20 for a half-time month - in file order, so a later row wins. Blank dates
+run to the edge of the axis, as bookings do.
+
+With booked hours and capacity on the same grid, time-phased utilization for
+the whole roster is one division (`load`).
+"""
+from __future__ import annotations
+from typing import TYPE_CHECKING, Optional
+import numpy as np
+
+from app.model.timeline import WeeklyLoad, monday
+
+if TYPE_CHECKING:
+    from app.model.records import RecordSet
+
+BOOKED_EPS = 1e-6   # hours; the timeline's prefix sums leave float residue after a booking ends
+
+def _first(weeks: np.ndarray, d: np.ndarray) -> np.ndarray:
+    """Index of the week containing each date (0 for NaT = open)."""
+    return np.where(np.isnat(d), 0, np.searchsorted(weeks, monday(d)))
+
+def _last(weeks: np.ndarray, d: np.ndarray) -> np.ndarray:
+    """Index of the week containing each date (the last week for NaT = open)."""
+    return np.where(np.isnat(d), len(weeks) - 1, np.searchsorted(weeks, monday(d), "right") - 1)
+
+class CapacityCalendar:
+    """Capacity hours per person per week (`hours`), beside the booked hours (`booked`)."""
+    __slots__ = ("weeks", "people", "hours", "booked", "overridden")
+
+    def __init__(self, R: RecordSet, T: WeeklyLoad,
+                 overrides: Optional[tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]] = None):
+        """`overrides`: (roster row, start, end, weekly hours) per override row; row -1 is skipped."""
+        P = R.resource_arrays
+        self.weeks, self.people, self.booked = T.weeks, T.people, T.hours
+        n, w, n_roster = len(T.people), len(T.weeks), len(P.capacity)
+        first = np.zeros(n, dtype=np.int64)
+        last = np.full(n, -1, dtype=np.int64)   # off-roster rows: no available week
+        first[:n_roster] = _first(self.weeks, P.available_from)
+        last[:n_roster] = _last(self.weeks, P.available_to)
+        axis = np.arange(w)
+        on = (axis >= first[:, None]) & (axis <= last[:, None])
+        self.hours = np.where(on, T.capacity[:, None], 0.0)
+
+        self.overridden = 0
+        if overrides is not None and w:
+            rows, start, end, hours = overrides
+            ok = rows >= 0
+            lo, hi = _first(self.weeks, start[ok]), _last(self.weeks, end[ok])
+            # few rows (leave, part-time spells), applied in order so the later one wins
+            for k, a, b, h in zip(rows[ok].tolist(), lo.tolist(), hi.tolist(), hours[ok].tolist()):
+                if b >= a:
+                    self.hours[k, a:b + 1] = h
+                    self.overridden += 1
+
+    def load(self, weeks: slice = slice(None), people=slice(None)) -> np.ndarray:
+        """Booked hours / capacity hours as % (NaN where there is no capacity that week)."""
+        cap, booked = self.hours[people, weeks], self.booked[people, weeks]
+        booked = np.where(np.abs(booked) > BOOKED_EPS, booked, 0.0)
+        return np.divide(booked, cap, out=np.full(cap.shape, np.nan), where=cap > 0) * 100.0
+
+    def away(self, weeks: slice = slice(None), people=slice(None)) -> np.ndarray:
+        """Weeks with hours booked but no capacity (outside availability, or on leave)."""
+        return (self.booked[people, weeks] > BOOKED_EPS) & (self.hours[people, weeks] <= 0)
+
+    def booked_span(self, person: int) -> slice:
+        """A person's weeks from the first with hours booked to the last (empty when none)."""
+        weeks = np.flatnonzero(np.abs(self.booked[person]) > BOOKED_EPS)
+        return slice(weeks[0], weeks[-1] + 1) if len(weeks) else slice(0, 0)
+
+class _Empty(CapacityCalendar):
+    def __init__(self):
+        self.weeks = np.zeros(0, dtype="datetime64[D]")
+        self.people = np.zeros(0, dtype=object)
+        self.hours = self.booked = np.zeros((0, 0))
+        self.overridden = 0
+
+NO_CAPACITY = _Empty()
@@ -0,0 +1,73 @@
+# app/model/columnar.py
+"""Allocations and roster as column arrays, built once per snapshot.
+
+The vectorized rollups (app/model/rollup.py) and the utilization matrix
+(app/model/utilization.py) group allocation rows with `bincount` instead of
+walking records. These hold what they group on and look up: hours and
+percent per allocation row, the person and trial references as integer
+codes, and dates as codes that sort like the date strings. On the
+roster side they hold capacity, utilization, the FTE flag, role,
+department and the availability dates.
+"""
+from __future__ import annotations
+from typing import TYPE_CHECKING, Sequence
+import numpy as np
+import pandas as pd
+
+from app.model.intervals import parse_days
+
+if TYPE_CHECKING:
+    from app.model.records import Allocation, Resource
+
+def _sorted_codes(values: Sequence[str]) -> tuple[np.ndarray, np.ndarray]:
+    """Codes that order like the strings (blank -> -1), and the labels they index."""
+    codes, labels = pd.factorize(np.asarray(values, dtype=object), sort=True)
+    labels = np.asarray(labels, dtype=object)
+    if len(labels) and labels[0] == "":
+        codes = codes - 1   # "" sorts first: it becomes -1, the rest shift down
+        labels = labels[1:]
+    return codes.astype(np.int64), labels
+
+def take(values: np.ndarray, idx: np.ndarray, fill) -> np.ndarray:
+    """values[idx], with `fill` wherever idx is -1 (no roster row)."""
+    out = np.full(len(idx), fill, dtype=values.dtype)
+    ok = idx >= 0
+    out[ok] = values[idx[ok]]
+    return out
+
+class AllocationArrays:
+    """One entry per allocation row, in table order."""
+    __slots__ = ("weekly_hours", "pct", "alias", "aliases", "trial", "trials",
+                 "start", "starts", "end", "ends")
+
+    def __init__(self, allocations: Sequence[Allocation]):
+        n = len(allocations)
+        self.weekly_hours = np.fromiter((a.weekly_hours for a in allocations), np.float64, n)
+        self.pct = np.fromiter((a.allocation_percentage for a in allocations), np.float64, n)
+        # the raw person reference; rows that resolve to no roster row are told apart by it
+        self.alias, aliases = pd.factorize(np.asarray([a.resource_id for a in allocations], dtype=object))
+        self.aliases = np.asarray(aliases, dtype=object)
+        # the booked trial reference (trial id or protocol id, as extracted)
+        self.trial, trials = pd.factorize(np.asarray([a.trial_id for a in allocations], dtype=object))
+        self.trials = np.asarray(trials, dtype=object)
+        self.start, self.starts = _sorted_codes([a.start_date for a in allocations])
+        self.end, self.ends = _sorted_codes([a.end_date for a in allocations])
+
+class ResourceArrays:
+    """One entry per roster row."""
+    __slots__ = ("capacity", "utilization", "fte", "role", "department",
+                 "available_from", "available_to")
+
+    def __init__(self, resources: Sequence[Resource]):
+        n = len(resources)
+        self.capacity = np.fromiter((r.capacity for r in resources), np.float64, n)
+        self.utilization = np.fromiter((r.utilization for r in resources), np.float64, n)
+        self.fte = np.fromiter((r.type_uc == "FTE" for r in resources), bool, n)
+        self.role = np.array([r.role or "Unknown" for r in resources], dtype=object)
+        self.department = np.array([r.department or "Unknown" for r in resources], dtype=object)
+        # datetime64[D]; NaT = open (no availability date on the roster)
+        self.available_from = parse_days([r.availability_start for r in resources])
+        self.available_to = parse_days([r.availability_end for r in resources])
+
+NO_ALLOCATION_ARRAYS = AllocationArrays(())
+NO_RESOURCE_ARRAYS = ResourceArrays(())
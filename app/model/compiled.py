@@ -0,0 +1,129 @@
+# app/model/compiled.py
+"""Compiled columnar snapshot of the entity tables (.npy, memory-mapped).
+
+`compile_snapshot` runs the normal CSV load (projection + coercion) once and
+writes every kept column as a typed .npy array:
+
+    <data_dir>/.compiled/manifest.json
+    <data_dir>/.compiled/<table>/<col>.npy                     numeric columns
+    <data_dir>/.compiled/<table>/<col>.codes.npy + .vocab.npy  string columns
+
+String columns are dictionary-encoded (int32 codes, -1 = missing) so they can
+be memory-mapped too. `open_table` maps a table back in with
+`np.load(mmap_mode="r")`; it returns None when there is no snapshot or the
+source CSV no longer matches the manifest, and the caller falls back to CSV.
+"""
+from __future__ import annotations
+import hashlib
+import json
+import os
+import shutil
+from pathlib import Path
+from typing import Optional, Dict
+import numpy as np
+import pandas as pd
+
+from app.model.loader import SPECS, read_table
+
+FORMAT = 4   # 2: Resource availability dates, 3: Trial enrollment_target, 4: numeric Trial drivers
+DIRNAME = ".compiled"
+
+def file_digest(p: Path) -> str:
+    h = hashlib.sha1()
+    with p.open("rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def snapshot_dir(data_dir: Path) -> Path:
+    return data_dir / DIRNAME
+
+def _encode(col: pd.Series) -> tuple[np.ndarray, np.ndarray]:
+    """Dictionary-encode an object column -> (int32 codes, unicode vocab)."""
+    col = col.astype(object)
+    codes, uniques = pd.factorize(col.where(col.isna(), col.astype(str)))
+    vocab = np.asarray([str(u) for u in uniques], dtype=str) if len(uniques) else np.array([], dtype="<U1")
+    return codes.astype(np.int32), vocab
+
+def compile_snapshot(data_dir: Path) -> Dict:
+    """Compile every present table under data_dir; returns the manifest written."""
+    out = snapshot_dir(data_dir)
+    tmp = out.with_name(DIRNAME + ".tmp")
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+
+    manifest: Dict = {"format": FORMAT, "tables": {}}
+    for name, spec in SPECS.items():
+        src = data_dir / spec.file
+        if not src.exists():
+            continue
+        df = read_table(data_dir, name)
+        tdir = tmp / name
+        tdir.mkdir()
+        cols: Dict[str, str] = {}
+        for c in df.columns:
+            s = df[c]
+            if s.dtype.kind in "biuf":
+                np.save(tdir / f"{c}.npy", s.to_numpy())
+                cols[c] = s.dtype.str
+            else:
+                codes, vocab = _encode(s)
+                np.save(tdir / f"{c}.codes.npy", codes)
+                np.save(tdir / f"{c}.vocab.npy", vocab)
+                cols[c] = "dict"
+        st = src.stat()
+        manifest["tables"][name] = {
+            "file": spec.file,
+            "size": st.st_size,
+            "mtime_ns": st.st_mtime_ns,
+            "sha1": file_digest(src),
+            "rows": int(len(df)),
+            "columns": cols,
+        }
+    (tmp / "manifest.json").write_text(json.dumps(manifest, indent=2))
+
+    # swap the finished directory in; readers never see a half-written snapshot
+    old = out.with_name(DIRNAME + ".old")
+    shutil.rmtree(old, ignore_errors=True)
+    if out.exists():
+        os.replace(out, old)
+    os.replace(tmp, out)
+    shutil.rmtree(old, ignore_errors=True)
+    return manifest
+
+def read_manifest(data_dir: Optional[Path]) -> Optional[Dict]:
+    if not data_dir:
+        return None
+    p = snapshot_dir(data_dir) / "manifest.json"
+    try:
+        m = json.loads(p.read_text())
+    except (OSError, ValueError):
+        return None
+    return m if m.get("format") == FORMAT else None
+
+def open_table(data_dir: Optional[Path], name: str, st: os.stat_result,
+               digest: Optional[str] = None) -> Optional[tuple[str, pd.DataFrame]]:
+    """(source sha1, frame) from the compiled snapshot, or None if missing/stale.
+
+    Fresh means the source CSV still has the size and mtime recorded at compile
+    time, or - when the caller already hashed it - the same content hash.
+    """
+    m = read_manifest(data_dir)
+    meta = (m or {}).get("tables", {}).get(name)
+    if not meta or meta["size"] != st.st_size:
+        return None
+    if meta["mtime_ns"] != st.st_mtime_ns and meta["sha1"] != digest:
+        return None
+    tdir = snapshot_dir(data_dir) / name
+    data: Dict[str, object] = {}
+    try:
+        for c, kind in meta["columns"].items():
+            if kind == "dict":
+                codes = np.load(tdir / f"{c}.codes.npy", mmap_mode="r")
+                vocab = np.load(tdir / f"{c}.vocab.npy")
+                data[c] = pd.Categorical.from_codes(codes, categories=pd.Index(vocab, dtype=object))
+            else:
+                data[c] = np.load(tdir / f"{c}.npy", mmap_mode="r")
+    except (OSError, ValueError):
+        return None
+    return meta["sha1"], pd.DataFrame(data, copy=False)
@@ -0,0 +1,174 @@
+# app/model/conflicts.py
+"""Capacity conflicts: every window in which a person's overlapping bookings exceed capacity.
+
+The cross-portfolio load (app/model/utilization.py) adds up all of a person's
+bookings as if they ran at once. Here their dates count: a sweep over each
+person's start/end events finds the exact day ranges in which the bookings
+running together come to more than OVERALLOCATED % of the person's capacity,
+for the whole portfolio in one O(n log n) pass (one sort, one prefix sum).
+
+A booking's share of its person's capacity follows the usual precedence -
+weekly hours / capacity, else allocation % - and is kept in hundredths of a
+percent, so the running sums are exact integers and every person's total
+returns to zero at their last event. Open dates follow the timeline
+(app/model/timeline.py): a blank start runs from the past and a blank end is
+ongoing (None in the windows); bookings with neither date are left out.
+
+Windows are sorted by person, then start. Which trials add up to a window is
+worked out on demand (`contributors`).
+"""
+from __future__ import annotations
+from datetime import date
+from typing import TYPE_CHECKING, List, Optional, Union
+import numpy as np
+
+from app.model.columnar import take
+from app.model.intervals import NAT, parse_days
+from app.model.rollup import OVERALLOCATED
+from app.model.utilization import UtilizationMatrix, person_rows
+
+if TYPE_CHECKING:
+    from app.model.records import RecordSet
+
+BASIS = 100                         # shares are kept in hundredths of a percent
+_PAST, _FUTURE = -1_000_000, 1_000_000   # open start / end, in days since 1970
+_SPAN = 4_000_000                   # > _FUTURE - _PAST: person * _SPAN + day orders windows
+
+def _days(d: np.ndarray, open_day: int) -> np.ndarray:
+    return np.where(np.isnat(d), open_day, d.astype(np.int64))
+
+def _day(d: Union[date, str, np.datetime64]) -> int:
+    return int(np.datetime64(d, "D").astype(np.int64))
+
+def iso(day: int) -> Optional[str]:
+    """A window bound as YYYY-MM-DD (None when open)."""
+    return None if day <= _PAST or day >= _FUTURE else str(np.datetime64(int(day), "D"))
+
+class Conflicts:
+    """Over-capacity windows per person: `person`, `start`, `end` (days, inclusive), `peak` %."""
+    __slots__ = ("people", "trials", "person", "start", "end", "peak", "indptr", "_key",
+                 "_row_person", "_share", "_s", "_e", "_by_person", "_row_ptr", "_trial")
+
+    def __init__(self, R: RecordSet, U: UtilizationMatrix):
+        A = R.allocation_arrays
+        row, self.people = person_rows(R)
+        self.trials = U.trials
+        n = len(self.people)
+        cap = U.capacity[row]
+        by_hours = (cap > 0) & R.has_hours
+        if R.has_hours or R.has_pct:
+            pct = A.pct if R.has_pct else np.zeros(len(row))
+            share = np.where(by_hours, A.weekly_hours / np.where(by_hours, cap, 1.0) * 100.0, pct)
+        else:
+            share = np.zeros(len(row))
+        share = np.rint(np.maximum(share, 0.0) * BASIS).astype(np.int64)
+        start = take(parse_days(A.starts), A.start, NAT)
+        end = take(parse_days(A.ends), A.end, NAT)
+        s, e = _days(start, _PAST), _days(end, _FUTURE)
+        ok = ~(np.isnat(start) & np.isnat(end)) & (e >= s) & (share > 0)
+        share[~ok] = 0
+        self._row_person, self._share, self._s, self._e, self._trial = row, share, s, e, A.trial
+        # each person's bookings, for `contributors`
+        self._by_person = np.argsort(row, kind="stable")
+        self._row_ptr = np.concatenate(([0], np.cumsum(np.bincount(row, minlength=n))))
+
+        # ---------- sweep: +share at each start, -share the day after each end ----------
+        keep = np.flatnonzero(ok)
+        p = np.concatenate([row[keep], row[keep]])
+        d = np.concatenate([s[keep], e[keep] + 1])
+        delta = np.concatenate([share[keep], -share[keep]])
+        order = np.lexsort((d, p))
+        p, d, delta = p[order], d[order], delta[order]
+        if len(p):
+            first = np.flatnonzero(np.r_[True, (p[1:] != p[:-1]) | (d[1:] != d[:-1])])
+            p, d, delta = p[first], d[first], np.add.reduceat(delta, first)
+        load = np.cumsum(delta)   # running share from each event day to the next
+        # segment i runs [d[i], d[i+1] - 1] while the next event is the same person's
+        same = np.r_[p[1:] == p[:-1], False] if len(p) else np.zeros(0, bool)
+        over = same & (load > OVERALLOCATED * BASIS)
+        begins = over & ~np.r_[False, over[:-1] & same[:-1]] if len(p) else over
+        runs = np.flatnonzero(begins)
+        # a run ends at its last over segment: the next segment is not over (or another person)
+        ends = np.flatnonzero(over & ~np.r_[over[1:], False])
+        self.person = p[runs]
+        self.start = d[runs]
+        self.end = d[ends + 1] - 1 if len(ends) else ends
+        seg = np.flatnonzero(over)
+        at = np.searchsorted(seg, runs)
+        self.peak = (np.maximum.reduceat(load[seg], at) / BASIS) if len(seg) else np.zeros(0)
+        self.indptr = np.concatenate(([0], np.cumsum(np.bincount(self.person, minlength=n))))
+        self._key = self.person * _SPAN + (self.start - _PAST)
+
+    def __len__(self) -> int:
+        return len(self.person)
+
+    @property
+    def in_conflict(self) -> int:
+        """People with at least one window."""
+        return int(np.count_nonzero(np.diff(self.indptr)))
+
+    def on(self, day: Union[date, str, np.datetime64]) -> np.ndarray:
+        """Windows that include `day`."""
+        d = _day(day)
+        return np.flatnonzero((self.start <= d) & (self.end >= d))
+
+    def of(self, person: int) -> range:
+        """A person's windows (indexes into person/start/end/peak), earliest first."""
+        if not 0 <= person < len(self.indptr) - 1:
+            return range(0)
+        return range(self.indptr[person], self.indptr[person + 1])
+
+    def contributors(self, window: int) -> List[tuple]:
+        """(trial, share %) summed over each trial's bookings running in a window, largest first."""
+        k = self.person[window]
+        rows = self._by_person[self._row_ptr[k]:self._row_ptr[k + 1]]
+        rows = rows[(self._share[rows] > 0) & (self._s[rows] <= self.end[window])
+                    & (self._e[rows] >= self.start[window])]
+        totals: dict = {}
+        for t, v in zip(self._trial[rows].tolist(), self._share[rows].tolist()):
+            totals[t] = totals.get(t, 0) + v
+        ranked = sorted(totals.items(), key=lambda x: x[1], reverse=True)
+        return [(self.trials[t], v / BASIS) for t, v in ranked]
+
+    def _running(self, rows: np.ndarray, day: Union[date, str, np.datetime64, None] = None) -> np.ndarray:
+        """The rows among `rows` whose booking runs inside one of its person's windows."""
+        rows = np.asarray(rows, dtype=np.int64)
+        if not len(rows) or not len(self.person):
+            return rows[:0]
+        rows = rows[self._share[rows] > 0]
+        p, s, e = self._row_person[rows], self._s[rows], self._e[rows]
+        if day is not None:
+            d = _day(day)
+            keep = (s <= d) & (e >= d)
+            rows, p = rows[keep], p[keep]
+            s = e = np.full(len(rows), d)
+        # the person's last window starting by the booking's end overlaps it iff it ends after its start
+        i = np.searchsorted(self._key, p * _SPAN + (e - _PAST), "right") - 1
+        ok = i >= 0
+        hit = np.zeros(len(p), bool)
+        hit[ok] = (self.person[i[ok]] == p[ok]) & (self.end[i[ok]] >= s[ok])
+        return rows[hit]
+
+    def involving(self, rows: np.ndarray, day: Union[date, str, np.datetime64, None] = None) -> int:
+        """People whose bookings among `rows` run inside one of their windows (on `day` only, if given)."""
+        return len(np.unique(self._row_person[self._running(rows, day)]))
+
+    def involving_by(self, keys: np.ndarray, n: int,
+                     day: Union[date, str, np.datetime64, None] = None) -> np.ndarray:
+        """`involving` for every group at once: n counts, rows grouped by `keys` (-1 = no group)."""
+        keys = np.asarray(keys, dtype=np.int64)
+        rows = self._running(np.flatnonzero(keys >= 0), day)
+        m = max(len(self.people), 1)
+        pairs = np.unique(keys[rows] * m + self._row_person[rows])   # one per (group, person)
+        return np.bincount(pairs // m, minlength=n)[:n]
+
+class _Empty(Conflicts):
+    def __init__(self):
+        zi = np.zeros(0, dtype=np.int64)
+        self.people = self.trials = np.zeros(0, dtype=object)
+        self.person = self.start = self.end = self._key = zi
+        self._row_person = self._share = self._s = self._e = self._by_person = self._trial = zi
+        self.peak = np.zeros(0)
+        self.indptr = self._row_ptr = np.zeros(1, dtype=np.int64)
+
+NO_CONFLICTS = _Empty()
@@ -0,0 +1,193 @@
+# app/model/identity.py
+"""Identity resolution: every person reference -> one roster row.
+
+The booking tables point at people in different ways: Allocation.resource_id
+holds display names ("Dr. Emily Rodriguez"), SiteAllocation.resource_id holds
+ids ("R001"), and some extracts carry an NTID. `IdentityResolver` maps each
+distinct reference (an alias) to a roster row. It tries, in order: the
+persisted crosswalk, Resource.id, NTID, the exact name, the normalized name,
+and finally a fuzzy name match. The fuzzy match only compares against
+roster names that share a phonetic blocking key (`blocking_keys`), so it
+stays near-linear on a large roster instead of comparing all pairs.
+
+Each roster row gets a canonical key (`keys`): its NTID, else its roster id,
+else its normalized name. The crosswalk (`ResourceCrosswalk.csv`: alias,
+resource_key, method) records alias -> canonical key. Rows there win over
+everything else, so a match written once stays stable when similar names
+join the roster, and a reviewer can pin or correct one by hand
+(`method=manual`). `python scripts/resolve_identities.py` rebuilds the file.
+"""
+from __future__ import annotations
+from difflib import SequenceMatcher
+from typing import Dict, Iterable, Optional, Sequence
+
+from app.model.keys import Interner, norm_name
+
+MATCH_THRESHOLD = 0.88   # minimum name similarity for a fuzzy match
+MATCH_MARGIN = 0.04      # ... and its lead over the runner-up, else "ambiguous"
+
+# resolution methods, as recorded in the crosswalk
+CROSSWALK, ID, NTID, NAME, NORMALIZED, FUZZY = "crosswalk", "id", "ntid", "name", "normalized", "fuzzy"
+AMBIGUOUS, UNRESOLVED, MANUAL = "ambiguous", "unresolved", "manual"
+
+_SOUNDEX = {c: d for d, cs in {"1": "bfpv", "2": "cgjkqsxz", "3": "dt", "4": "l",
+                               "5": "mn", "6": "r"}.items() for c in cs}
+
+def soundex(word: str) -> str:
+    """American Soundex ("rodriguez" -> "r362"); "" for a word with no letters."""
+    word = "".join(c for c in word.lower() if "a" <= c <= "z")
+    if not word:
+        return ""
+    out, last = word[0], _SOUNDEX.get(word[0], "")
+    for c in word[1:]:
+        d = _SOUNDEX.get(c, "")
+        if d and d != last:
+            out += d
+            if len(out) == 4:
+                break
+        if c not in "hw":   # h/w do not separate two equal codes
+            last = d
+    return out.ljust(4, "0")
+
+def person_name(alias: str) -> str:
+    """Normalized "first ... last" form; "Rodriguez, Emily" reads as "emily rodriguez"."""
+    if alias.count(",") == 1:
+        last, first = alias.split(",")
+        alias = f"{first} {last}"
+    return norm_name(alias)
+
+def blocking_keys(name: str) -> tuple[str, ...]:
+    """Blocks a normalized name falls in: surname sound + first initial, and
+    first-name sound + surname initial, so one typo in either part still
+    shares a block with the roster spelling."""
+    tokens = name.split()
+    if not tokens:
+        return ()
+    first, last = tokens[0], tokens[-1]
+    if len(tokens) == 1:
+        return ("s" + soundex(last),)
+    return ("s" + soundex(last) + first[0], "f" + soundex(first) + last[0])
+
+def canonical_keys(ntids: Sequence[str], ids: Sequence[str], names: Sequence[str]) -> list[str]:
+    """Canonical key per roster row, made unique (a repeat gets "#<row>")."""
+    out, seen = [], set()
+    for i, (ntid, rid, name) in enumerate(zip(ntids, ids, names)):
+        key = ntid.lower() if ntid else rid or norm_name(name)
+        if not key or key in seen:
+            key = f"{key}#{i}"
+        seen.add(key)
+        out.append(key)
+    return out
+
+class IdentityResolver(Interner):
+    """Interner over roster rows whose `get` resolves any alias of a person.
+
+    `labels` are the roster names (as for a plain name Interner); `keys` the
+    canonical keys. Each distinct alias is resolved once and memoized, with
+    the method that matched it in `methods`.
+    """
+    __slots__ = ("keys", "methods", "_memo", "_crosswalk", "_by_id", "_by_ntid",
+                 "_by_norm", "_dup_norm", "_norms", "_blocks", "_fuzzy_memo")
+
+    def __init__(self, names: Sequence[str], ids: Sequence[str], ntids: Sequence[str],
+                 crosswalk: Optional[Dict[str, str]] = None):
+        super().__init__(names)
+        self.keys = canonical_keys(ntids, ids, names)
+        by_key = {k: i for i, k in enumerate(self.keys)}
+        # crosswalk rows pointing at someone no longer on the roster are ignored
+        self._crosswalk = {a: by_key[k] for a, k in (crosswalk or {}).items() if k in by_key}
+        self._by_id = {r: i for i, r in enumerate(ids) if r}
+        self._by_ntid = {n.lower(): i for i, n in enumerate(ntids) if n}
+        self._norms = [person_name(n) for n in names]
+        self._by_norm: Dict[str, int] = {}
+        self._dup_norm: set[str] = set()
+        self._blocks: Dict[str, list[int]] = {}
+        for i, n in enumerate(self._norms):
+            if not n:
+                continue
+            if n in self._by_norm:
+                self._dup_norm.add(n)
+            self._by_norm[n] = i   # last row wins, as the name Interner did
+            for b in blocking_keys(n):
+                self._blocks.setdefault(b, []).append(i)
+        self._memo: Dict[str, int] = {}
+        self._fuzzy_memo: Dict[str, tuple[int, str]] = {}
+        self.methods: Dict[str, str] = {}
+
+    def get(self, key: str) -> int:
+        hit = self._memo.get(key)
+        if hit is None:
+            hit, self.methods[key] = self._resolve(key)
+            self._memo[key] = hit
+        return hit
+
+    def resolve_all(self, aliases: Iterable[str]) -> Dict[str, int]:
+        """Batch form of `get`: alias -> roster row (-1 = no match)."""
+        return {a: self.get(a) for a in dict.fromkeys(aliases) if a}
+
+    def key_of(self, alias: str) -> str:
+        """Canonical key an alias resolves to ("" when it does not)."""
+        i = self.get(alias)
+        return self.keys[i] if i >= 0 else ""
+
+    def _resolve(self, alias: str) -> tuple[int, str]:
+        if not alias:
+            return -1, UNRESOLVED
+        if alias in self._crosswalk:
+            return self._crosswalk[alias], CROSSWALK
+        if alias in self._by_id:
+            return self._by_id[alias], ID
+        if alias.lower() in self._by_ntid:
+            return self._by_ntid[alias.lower()], NTID
+        norm = person_name(alias)
+        if norm in self._dup_norm:
+            # two people share this name: joined to the last one, as before, but flagged
+            return self.ids.get(alias, self._by_norm[norm]), AMBIGUOUS
+        if alias in self.ids:
+            return self.ids[alias], NAME
+        if norm in self._by_norm:
+            return self._by_norm[norm], NORMALIZED
+        return self._fuzzy(norm)
+
+    def _fuzzy(self, norm: str) -> tuple[int, str]:
+        candidates = {i for b in blocking_keys(norm) for i in self._blocks.get(b, ())}
+        if not candidates:
+            return -1, UNRESOLVED
+        hit = self._fuzzy_memo.get(norm)
+        if hit is None:
+            hit = self._fuzzy_memo[norm] = self._score(norm, candidates)
+        return hit
+
+    def _score(self, norm: str, candidates: set[int]) -> tuple[int, str]:
+        m = SequenceMatcher(b=norm, autojunk=False)
+        floor = MATCH_THRESHOLD - MATCH_MARGIN   # below this a name cannot win or tie
+        scored = [(0.0, -1)]
+        for i in candidates:
+            m.set_seq1(self._norms[i])
+            # cheap upper bounds first; ratio() only for names that could count
+            if m.real_quick_ratio() >= floor and m.quick_ratio() >= floor:
+                scored.append((m.ratio(), i))
+        scored.sort(reverse=True)
+        best, i = scored[0]
+        if best < MATCH_THRESHOLD:
+            return -1, UNRESOLVED
+        if len(scored) > 1 and best - scored[1][0] < MATCH_MARGIN:
+            return -1, AMBIGUOUS
+        return i, FUZZY
+
+    def crosswalk_rows(self, previous: Optional[Dict[str, tuple[str, str]]] = None) -> list[dict]:
+        """Crosswalk table for every alias resolved so far.
+
+        `previous` (alias -> (resource_key, method)) is the crosswalk on disk:
+        its manual rows are kept as they are.
+        """
+        rows = {a: {"alias": a, "resource_key": k, "method": m}
+                for a, (k, m) in (previous or {}).items() if m == MANUAL}
+        for a, m in self.methods.items():
+            if a and a not in rows:
+                if m == CROSSWALK:
+                    m = (previous or {}).get(a, ("", FUZZY))[1]   # keep how it was first matched
+                # an ambiguous match is left blank for a reviewer rather than pinned
+                key = self.key_of(a) if m != AMBIGUOUS else ""
+                rows[a] = {"alias": a, "resource_key": key, "method": m}
+        return sorted(rows.values(), key=lambda r: r["alias"])
@@ -0,0 +1,154 @@
+# app/model/indexes.py
+"""Lookup indexes over a snapshot's tables, built once per snapshot.
+
+Per-trial and per-person vars used to scan every allocation on each
+recompute; with these they touch only that trial's or person's rows. The
+Portfolio filters work the same way: each facet value is a bitset over the
+trials, so a filter combination is an AND instead of a pass per filter.
+"""
+from __future__ import annotations
+from typing import TYPE_CHECKING, Dict, Optional, Sequence
+import numpy as np
+import pandas as pd
+
+if TYPE_CHECKING:
+    from app.model.records import Allocation, Trial
+
+EMPTY = np.empty(0, dtype=np.int64)
+
+def _positions(codes: np.ndarray, uniques: Sequence[str]) -> Dict[str, np.ndarray]:
+    """key -> ascending row positions holding it (blank keys are not indexed)."""
+    order = np.argsort(codes, kind="stable")
+    bounds = np.searchsorted(codes[order], np.arange(1, len(uniques)))
+    groups = dict(zip(uniques, np.split(order, bounds)))
+    groups.pop("", None)
+    return groups
+
+def _factorize(keys: Sequence[str]) -> tuple[np.ndarray, list[str]]:
+    codes, uniques = pd.factorize(np.asarray(keys, dtype=object))
+    return codes, uniques.tolist()
+
+class AllocationIndex:
+    """Hash indexes from trial_id / protocol_id / resource_id / person join key
+    to allocation row positions."""
+    __slots__ = ("allocations", "by_trial", "by_protocol", "by_resource", "by_person",
+                 "resource_counts", "_pairs", "_width", "_trials")
+
+    def __init__(self, allocations: Sequence[Allocation], people: Optional[Sequence[str]] = None):
+        """`people` is each row's person key (default: the row's own join key)."""
+        self.allocations = allocations
+        t_codes, trials = _factorize([a.trial_id for a in allocations])
+        if people is None:
+            people = [a.join_key for a in allocations]
+        p_codes, persons = _factorize(people)
+        self.by_trial = _positions(t_codes, trials)
+        self.by_protocol = _positions(*_factorize([a.protocol_id for a in allocations]))
+        self.by_resource = _positions(*_factorize([a.resource_id for a in allocations]))
+        self.by_person = _positions(p_codes, persons)
+        # (trial, person) code pair per row, -1 where either key is blank
+        self._width = width = max(len(persons), 1)
+        self._pairs = t_codes.astype(np.int64) * width + p_codes
+        if "" in trials:
+            self._pairs[t_codes == trials.index("")] = -1
+        if "" in persons:
+            self._pairs[p_codes == persons.index("")] = -1
+        self._trials = trials
+        self.resource_counts = self.people_per_trial()
+
+    def people_per_trial(self, rows: Optional[np.ndarray] = None) -> Dict[str, int]:
+        """Distinct people booked per trial_id (both keys non-blank), over `rows` (default all)."""
+        pairs = self._pairs if rows is None else self._pairs[rows]
+        pairs = pd.unique(pairs[pairs >= 0])
+        per_trial = np.bincount(pairs // self._width, minlength=len(self._trials))
+        return {self._trials[i]: int(per_trial[i]) for i in np.flatnonzero(per_trial).tolist()}
+
+    def trial_rows(self, trial_id: str) -> np.ndarray:
+        return self.by_trial.get(trial_id, EMPTY)
+
+    def protocol_rows(self, protocol_id: str) -> np.ndarray:
+        return self.by_protocol.get(protocol_id, EMPTY)
+
+    def resource_rows(self, resource_id: str) -> np.ndarray:
+        return self.by_resource.get(resource_id, EMPTY)
+
+    def person_rows(self, key: str) -> np.ndarray:
+        return self.by_person.get(key, EMPTY)
+
+    def take(self, positions: np.ndarray) -> list[Allocation]:
+        allocs = self.allocations
+        return [allocs[i] for i in positions.tolist()]
+
+NO_ALLOCATIONS = AllocationIndex(())
+
+# ---------- Trial facets (Portfolio filter bar) ----------
+FACETS = ("status", "phase", "priority", "therapeutic_area")
+
+def _bitset(positions: np.ndarray, n: int) -> int:
+    """Python int with bit i set for each row position i."""
+    bits = np.zeros(n, dtype=bool)
+    bits[positions] = True
+    return int.from_bytes(np.packbits(bits, bitorder="little").tobytes(), "little")
+
+class TrialFacets:
+    """One bitset per (facet, value) over the trial rows: bit i = trial i has that value.
+
+    The bitsets are Python ints, so combining filters is `&` and counting is
+    `int.bit_count()`, both word-at-a-time in C. Per-option counts under the
+    other active filters come from the same bitsets.
+    """
+    __slots__ = ("trials", "all", "bits", "options")
+
+    def __init__(self, trials: Sequence[Trial]):
+        self.trials = trials
+        n = len(trials)
+        self.all = (1 << n) - 1
+        self.bits: Dict[str, Dict[str, int]] = {}
+        for f in FACETS:
+            groups = _positions(*_factorize([getattr(t, f) for t in trials]))
+            self.bits[f] = {v: _bitset(p, n) for v, p in groups.items()}
+        # dropdown values present in the data ("0" is the numeric fill, not a label)
+        self.options = {f: sorted(v for v in self.bits[f] if v != "0") for f in FACETS}
+
+    def mask(self, filters: Dict[str, str], base: Optional[int] = None) -> int:
+        """Trials matching every filter that is not "All" (within `base`, if given)."""
+        m = self.all if base is None else base
+        for f, v in filters.items():
+            if v != "All":
+                m &= self.bits[f].get(v, 0)
+        return m
+
+    def counts(self, filters: Dict[str, str], base: Optional[int] = None) -> Dict[str, Dict[str, int]]:
+        """facet -> {value: trials it would show}, under the *other* active filters.
+
+        "All" is the count with that facet's own filter cleared.
+        """
+        out: Dict[str, Dict[str, int]] = {}
+        for f in FACETS:
+            others = self.mask({g: v for g, v in filters.items() if g != f}, base)
+            c = {v: (b & others).bit_count() for v, b in self.bits[f].items()}
+            c["All"] = others.bit_count()
+            out[f] = c
+        return out
+
+    def of(self, positions: np.ndarray) -> int:
+        """Bitset of the given trial positions (e.g. search hits)."""
+        return _bitset(positions, len(self.trials))
+
+    def flags(self, mask: int) -> np.ndarray:
+        """Bitset as one bool per trial."""
+        n = len(self.trials)
+        raw = np.frombuffer(mask.to_bytes((n + 7) // 8, "little"), dtype=np.uint8)
+        return np.unpackbits(raw, bitorder="little")[:n].astype(bool)
+
+    def take(self, mask: int, order: Optional[np.ndarray] = None) -> list[Trial]:
+        """Trials in a bitset, in table order - or in `order` (positions) when given."""
+        trials = self.trials
+        if not mask or not trials:
+            return []
+        if order is not None:
+            return [trials[i] for i in order[self.flags(mask)[order]].tolist()]
+        if mask == self.all:
+            return list(trials)
+        return [trials[i] for i in np.flatnonzero(self.flags(mask)).tolist()]
+
+NO_FACETS = TrialFacets(())
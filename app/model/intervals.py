@@ -0,0 +1,134 @@
+# app/model/intervals.py
+"""Interval index over booking date ranges, built once per snapshot.
+
+"Who is booked on 2025-06-01" and "which allocations overlap this window"
+used to mean comparing every row's date strings. `IntervalIndex` is a static
+centered interval tree over [start, end] day ranges (both ends inclusive):
+each node keeps the ranges that contain its center, sorted by start and by
+end, and hands the ranges wholly before or after the center to its children.
+A point query walks one root-to-leaf path and takes a sorted prefix or suffix
+at each node, so it costs O(log n + k) for k hits; a window query visits the
+nodes whose centers it spans. Small subtrees stay as leaves that are masked
+directly.
+
+Dates follow the weekly timeline (app/model/timeline.py): a blank or
+unparseable start is open to the past and a blank end to the future; ranges
+with neither date, or ending before they start, are not indexed (`undated`).
+Hits are row positions in table order.
+"""
+from __future__ import annotations
+from datetime import date
+from typing import List, Sequence, Union
+import numpy as np
+import pandas as pd
+
+NAT = np.datetime64("NaT", "D")
+LEAF = 64   # ranges below which a subtree is masked directly instead of split
+
+_PAST = np.iinfo(np.int64).min
+_FUTURE = np.iinfo(np.int64).max
+
+def parse_days(labels: Sequence[str]) -> np.ndarray:
+    """Date labels as datetime64[D]; blank or unparseable -> NaT."""
+    return pd.to_datetime(pd.Series(labels, dtype=object), errors="coerce").to_numpy("datetime64[D]")
+
+def _day(d: Union[date, str, np.datetime64]) -> int:
+    return int(np.datetime64(d, "D").astype(np.int64))
+
+class IntervalIndex:
+    """Centered interval tree over per-row [start, end] day ranges."""
+    __slots__ = ("undated", "center", "left", "right", "leaf", "rows", "starts", "by_end", "ends")
+
+    def __init__(self, start: np.ndarray, end: np.ndarray):
+        start = np.asarray(start, dtype="datetime64[D]")
+        end = np.asarray(end, dtype="datetime64[D]")
+        lo = np.where(np.isnat(start), _PAST, start.astype(np.int64))
+        hi = np.where(np.isnat(end), _FUTURE, end.astype(np.int64))
+        ok = ~(np.isnat(start) & np.isnat(end)) & (hi >= lo)
+        self.undated = int(np.count_nonzero(~ok))
+        # per node: center day, children (-1 = none), whether it is a leaf, its
+        # rows sorted by start (with their starts and ends), and sorted by end
+        self.center: List[int] = []
+        self.left: List[int] = []
+        self.right: List[int] = []
+        self.leaf: List[bool] = []
+        self.rows: List[np.ndarray] = []
+        self.starts: List[np.ndarray] = []
+        self.by_end: List[np.ndarray] = []
+        self.ends: List[np.ndarray] = []
+        rows = np.flatnonzero(ok)
+        if len(rows):
+            self._build(rows, lo, hi)
+
+    def __len__(self) -> int:
+        return sum(len(r) for r in self.rows)
+
+    def _node(self, rows: np.ndarray, lo: np.ndarray, hi: np.ndarray, center: int, leaf: bool) -> int:
+        s = np.argsort(lo[rows], kind="stable")
+        # a leaf is masked, not searched: its ends stay aligned with the start order
+        e = s if leaf else np.argsort(hi[rows], kind="stable")
+        self.center.append(center)
+        self.left.append(-1)
+        self.right.append(-1)
+        self.leaf.append(leaf)
+        self.rows.append(rows[s])
+        self.starts.append(lo[rows[s]])
+        self.by_end.append(rows[e])
+        self.ends.append(hi[rows[e]])
+        return len(self.center) - 1
+
+    def _build(self, rows: np.ndarray, lo: np.ndarray, hi: np.ndarray) -> None:
+        # iterative: (rows, parent node, which side of it)
+        todo = [(rows, -1, None)]
+        while todo:
+            rows, parent, side = todo.pop()
+            if len(rows) <= LEAF:
+                node = self._node(rows, lo, hi, 0, True)
+            else:
+                # the median endpoint: at least one range contains it, so both sides shrink
+                ends = np.concatenate([lo[rows], hi[rows]])
+                ends = ends[(ends != _PAST) & (ends != _FUTURE)]
+                center = int(np.partition(ends, len(ends) // 2)[len(ends) // 2])
+                before, after = hi[rows] < center, lo[rows] > center
+                node = self._node(rows[~before & ~after], lo, hi, center, False)
+                for part, child in ((rows[before], "left"), (rows[after], "right")):
+                    if len(part):
+                        todo.append((part, node, child))
+            if parent >= 0:
+                getattr(self, side)[parent] = node
+
+    def overlapping(self, start: Union[date, str, np.datetime64],
+                    end: Union[date, str, np.datetime64, None] = None) -> np.ndarray:
+        """Rows whose range overlaps [start, end] (a single day when `end` is None), in table order."""
+        lo = _day(start)
+        hi = lo if end is None else _day(end)
+        if not self.center or hi < lo:
+            return np.zeros(0, dtype=np.int64)
+        out: List[np.ndarray] = []
+        todo = [0]
+        while todo:
+            node = todo.pop()
+            if self.leaf[node]:
+                rows = self.rows[node]
+                out.append(rows[(self.starts[node] <= hi) & (self.ends[node] >= lo)])
+                continue
+            c = self.center[node]
+            if hi < c:
+                # every range here ends at or after c > hi: keep those starting by hi
+                out.append(self.rows[node][:np.searchsorted(self.starts[node], hi, "right")])
+                nxt = [self.left[node]]
+            elif lo > c:
+                # ... and starts at or before c < lo: keep those ending from lo on
+                out.append(self.by_end[node][np.searchsorted(self.ends[node], lo, "left"):])
+                nxt = [self.right[node]]
+            else:
+                out.append(self.rows[node])
+                nxt = [self.left[node], self.right[node]]
+            todo.extend(n for n in nxt if n >= 0)
+        return np.sort(np.concatenate(out))
+
+    def at(self, day: Union[date, str, np.datetime64]) -> np.ndarray:
+        """Rows booked on `day`, in table order."""
+        return self.overlapping(day)
+
+NO_INTERVALS = IntervalIndex(np.zeros(0, dtype="datetime64[D]"), np.zeros(0, dtype="datetime64[D]"))
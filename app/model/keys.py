@@ -0,0 +1,71 @@
+# app/model/keys.py
+"""Dense integer surrogate keys, assigned once per snapshot.
+
+Trials, resources, sites and open positions are numbered by their row
+position. An `Interner` maps each table's natural join key (protocol_id,
+person name, site_id, position id) to that number. The booking tables get
+int32 foreign-key arrays (-1 = no match) next to their string columns, so a
+join is an array lookup and a group-by is a bincount over small ints.
+
+People are matched across tables on a normalized join key (`join_key`),
+computed once per row at ingestion and memoized for ad-hoc lookups.
+"""
+from __future__ import annotations
+import re
+from functools import lru_cache
+from typing import Sequence
+import numpy as np
+import pandas as pd
+
+# alternate spellings of a stable person id (see DATA_MODEL.md §4)
+NTID_COLUMNS = ["NTID", "Network ID", "Employee ID", "resource_ntid", "resource_guid"]
+
+@lru_cache(maxsize=1 << 17)
+def norm_name(s: str) -> str:
+    s = (s or "").strip().lower()
+    s = re.sub(r"^(dr|mr|mrs|ms|miss|prof)\.?\s+", "", s)   # drop titles
+    s = re.sub(r"[^a-z\s]", "", s)                         # rm punct
+    s = re.sub(r"\s+", " ", s)
+    return s
+
+def join_key(ntid: str, name: str) -> str:
+    """Person join key: a stable id when the extract has one, else the normalized name."""
+    return (ntid or norm_name(name)).lower()
+
+class Interner:
+    """Natural key -> dense int. On duplicate keys the last row wins (as a dict build would)."""
+    __slots__ = ("labels", "ids")
+
+    def __init__(self, labels: Sequence[str]):
+        self.labels = list(labels)
+        self.ids = {k: i for i, k in enumerate(self.labels) if k}
+
+    def __len__(self) -> int:
+        return len(self.labels)
+
+    def get(self, key: str) -> int:
+        return self.ids.get(key, -1)
+
+    def encode(self, col: pd.Series) -> np.ndarray:
+        """int32 key per cell; each distinct value is looked up once."""
+        if col is None or not len(col):
+            return np.empty(0, dtype=np.int32)
+        codes, uniques = pd.factorize(col)
+        # trailing -1 so missing cells (code -1) map to "no match"
+        table = np.array([self.get(str(u).strip()) for u in uniques] + [-1], dtype=np.int32)
+        return table[codes]
+
+NO_KEYS = Interner(())
+
+def column_keys(df: pd.DataFrame, col: str, keys: Interner) -> np.ndarray:
+    """Foreign keys for df[col] against `keys`; all -1 when the column is absent."""
+    if col not in df.columns:
+        return np.full(len(df), -1, dtype=np.int32)
+    return keys.encode(df[col])
+
+def labels(df: pd.DataFrame, col: str) -> list[str]:
+    """Natural keys of a table in row order (stripped; blank when missing)."""
+    if col not in df.columns:
+        return [""] * len(df)
+    s = df[col].astype(object)
+    return [str(v).strip() for v in s.where(s.notna(), "").tolist()]
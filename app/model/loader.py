@@ -0,0 +1,203 @@
+# app/model/loader.py
+"""CSV ingestion for the six entity tables, capacity overrides and the resource crosswalk.
+
+Same defensive rules the state layer always used: only known columns are kept,
+numeric fields are coerced with `pd.to_numeric(..., errors="coerce").fillna(0)`,
+ids are stringified, and a missing/unreadable file yields an empty table.
+"""
+from __future__ import annotations
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional, List, Dict
+import pandas as pd
+
+from app.model.keys import NTID_COLUMNS
+
+DATA_DIRS = [
+    Path("app/data"),
+    Path("data"),
+    # repo-local fallback you specified
+    Path("/mnt/data/reins_reflex/reins_reflex/app/data"),
+    # original React upload fallback (kept for dev convenience)
+    Path("/mnt/data/reins_js/reins_js/src/data"),
+]
+
+@dataclass(frozen=True)
+class TableSpec:
+    """Which columns of a file we keep and how each is typed.
+
+    numeric      coerced with to_numeric after reading (bad values -> 0)
+    ids          read as str, then stringified
+    text         read as str (titles, names, dates)
+    categorical  low-cardinality labels, read as pandas categoricals
+    """
+    file: str
+    columns: tuple[str, ...]
+    numeric: tuple[str, ...] = ()
+    ids: tuple[str, ...] = ()
+    text: tuple[str, ...] = ()
+    categorical: tuple[str, ...] = ()
+
+    def dtypes(self) -> Dict[str, str]:
+        """Explicit reader dtypes. Numerics are left to the reader and coerced
+        afterwards so a stray non-number still becomes 0 instead of failing the file."""
+        out = {c: "str" for c in self.ids + self.text}
+        out.update({c: "category" for c in self.categorical})
+        return out
+
+SPECS: Dict[str, TableSpec] = {
+    "trials": TableSpec(
+        "Trial.csv",
+        ("id", "title", "protocol_id", "phase", "therapeutic_area", "status",
+         "start_date", "end_date", "fte_allocation", "fsp_allocation",
+         "priority", "sites_count", "enrollment_target"),
+        numeric=("fte_allocation", "fsp_allocation", "sites_count", "enrollment_target"),
+        text=("id", "title", "protocol_id", "start_date", "end_date"),
+        categorical=("phase", "therapeutic_area", "status", "priority"),
+    ),
+    "resources": TableSpec(
+        "Resource.csv",
+        ("id", "name", "type", "role", "utilization", "capacity", "department",
+         "availability_start", "availability_end", *NTID_COLUMNS),
+        numeric=("utilization", "capacity"),
+        ids=("id",),
+        text=("name", "availability_start", "availability_end", *NTID_COLUMNS),
+        categorical=("type", "role", "department"),
+    ),
+    "allocations": TableSpec(
+        "Allocation.csv",
+        ("trial_id", "protocol_id", "resource_id",
+         "weekly_hours", "allocation_percentage",
+         "role", "type", "start_date", "end_date", *NTID_COLUMNS),
+        numeric=("weekly_hours", "allocation_percentage"),
+        ids=("trial_id", "protocol_id", "resource_id"),
+        text=("start_date", "end_date", *NTID_COLUMNS),
+        # ids repeat across bookings, so they are dictionary-encoded too
+        categorical=("role", "type", "trial_id", "protocol_id", "resource_id"),
+    ),
+    "sites": TableSpec(
+        "Site.csv",
+        ("trial_id", "site_id", "site_name", "country", "city", "principal_investigator",
+         "latitude", "longitude", "status", "enrollment_target", "enrolled_count"),
+        numeric=("latitude", "longitude", "enrollment_target", "enrolled_count"),
+        ids=("trial_id", "site_id"),
+        text=("site_name", "city", "principal_investigator"),
+        categorical=("country", "status"),
+    ),
+    "site_allocations": TableSpec(
+        "SiteAllocation.csv",
+        ("site_id", "resource_id", "allocation_percentage", "weekly_hours",
+         "start_date", "end_date", "role_at_site"),
+        numeric=("allocation_percentage", "weekly_hours"),
+        ids=("site_id", "resource_id"),
+        text=("start_date", "end_date"),
+        categorical=("role_at_site",),
+    ),
+    "open_positions": TableSpec(
+        "OpenPosition.csv",
+        ("id", "title", "functional_group", "level", "type", "status", "priority",
+         "posted_date", "target_fill_date", "required_skills", "location"),
+        ids=("id",),
+        text=("title", "posted_date", "target_fill_date", "required_skills", "location"),
+        categorical=("functional_group", "level", "type", "status", "priority"),
+    ),
+    # not an entity: leave / part-time weeks, weekly_hours replacing capacity (app/model/capacity.py)
+    "capacity_overrides": TableSpec(
+        "CapacityOverride.csv",
+        ("resource_id", "start_date", "end_date", "weekly_hours"),
+        numeric=("weekly_hours",),
+        ids=("resource_id",),
+        text=("start_date", "end_date"),
+    ),
+    # not an entity: person alias -> canonical resource key (app/model/identity.py)
+    "crosswalk": TableSpec(
+        "ResourceCrosswalk.csv",
+        ("alias", "resource_key", "method"),
+        text=("alias", "resource_key", "method"),
+    ),
+}
+
+def find_data_dir() -> Optional[Path]:
+    """First existing data directory: app/data, then known fallbacks."""
+    return next((p for p in DATA_DIRS if p.exists()), None)
+
+def safe_csv(data_dir: Optional[Path], name: str, spec: Optional[TableSpec] = None) -> pd.DataFrame:
+    """Read one CSV; with a spec, only its columns are parsed, with explicit dtypes."""
+    if not data_dir:
+        return pd.DataFrame()
+    p = data_dir / name
+    if not p.exists():
+        return pd.DataFrame()
+    kw = {}
+    if spec is not None:
+        wanted = set(spec.columns)
+        kw = {"usecols": lambda c: c in wanted, "dtype": spec.dtypes()}
+    try:
+        return pd.read_csv(p, **kw)
+    except Exception:
+        return pd.DataFrame()
+
+def project(raw: pd.DataFrame, spec: TableSpec) -> pd.DataFrame:
+    """Keep only known columns (in spec order), coerce numerics, stringify ids."""
+    if raw.empty:
+        return pd.DataFrame()
+    df = raw[[c for c in spec.columns if c in raw.columns]].copy()
+    # numeric coercion only when present
+    for num in spec.numeric:
+        if num in df.columns:
+            df[num] = pd.to_numeric(df[num], errors="coerce").fillna(0.0)
+    for idc in spec.ids:
+        if idc in df.columns:
+            df[idc] = _as_str(df[idc])
+    return df
+
+def _as_str(col: pd.Series) -> pd.Series:
+    """astype(str) semantics (missing -> "nan"), keeping categoricals categorical."""
+    if not isinstance(col.dtype, pd.CategoricalDtype):
+        return col.astype(str)
+    if col.isna().any():
+        if "nan" not in col.cat.categories:
+            col = col.cat.add_categories(["nan"])
+        col = col.fillna("nan")
+    return col.cat.rename_categories([str(c) for c in col.cat.categories])
+
+STREAM_BYTES = 64 << 20   # files larger than this are ingested in chunks
+
+def read_table(data_dir: Optional[Path], name: str, timings: Optional[Dict] = None) -> pd.DataFrame:
+    """Load one table; `timings`, if given, receives bytes / parse_s / coerce_s."""
+    spec = SPECS[name]
+    timings = timings if timings is not None else {}
+    p = data_dir / spec.file if data_dir else None
+    timings["bytes"] = p.stat().st_size if p and p.exists() else 0
+    if timings["bytes"] > STREAM_BYTES:
+        from app.model.stream import stream_table
+        try:
+            return stream_table(data_dir, name, timings=timings)
+        except Exception:
+            return pd.DataFrame()
+    t0 = time.perf_counter()
+    raw = safe_csv(data_dir, spec.file, spec)
+    t1 = time.perf_counter()
+    df = project(raw, spec)
+    timings["parse_s"] = t1 - t0
+    timings["coerce_s"] = time.perf_counter() - t1
+    return df
+
+def frame_bytes(df: pd.DataFrame) -> int:
+    """Resident size of a table, strings included."""
+    return int(df.memory_usage(deep=True).sum()) if not df.empty else 0
+
+def _plain(df: pd.DataFrame) -> pd.DataFrame:
+    """Categorical columns back to object so fillna/to_dict behave like the CSV path."""
+    cats = {c: object for c in df.columns if isinstance(df[c].dtype, pd.CategoricalDtype)}
+    return df.astype(cats) if cats else df
+
+def to_records(name: str, df: pd.DataFrame) -> List[Dict]:
+    """Row dicts as the state layer consumes them."""
+    if df.empty:
+        return []
+    df = _plain(df)
+    if name == "trials":
+        df = df.fillna(0)
+    return df.to_dict("records")
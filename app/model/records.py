@@ -0,0 +1,270 @@
+# app/model/records.py
+"""Typed, slot-based row records compiled once per snapshot.
+
+The metric vars used to re-coerce every dict field on every recompute
+(`str(a.get("trial_id", ""))`, `float(a.get("weekly_hours") or 0.0)`, ...).
+Here that work happens once, column-at-a-time, when a snapshot is built: ids
+are stringified and stripped, hours/percentages/capacity are floats, and
+which columns the extract actually carried is recorded per table (`*_columns`)
+so the "only use columns that exist" rules still hold.
+
+Each table is compiled on its own, the first time a page that attached it
+reads it (see `RecordSet`).
+"""
+from __future__ import annotations
+import re
+from typing import Optional, List, Iterable
+import numpy as np
+import pandas as pd
+
+from app.model.capacity import NO_CAPACITY, CapacityCalendar
+from app.model.columnar import (AllocationArrays, NO_ALLOCATION_ARRAYS, NO_RESOURCE_ARRAYS,
+                                 ResourceArrays)
+from app.model.conflicts import NO_CONFLICTS, Conflicts
+from app.model.indexes import AllocationIndex, NO_ALLOCATIONS, NO_FACETS, TrialFacets
+from app.model.intervals import NO_INTERVALS, IntervalIndex
+from app.model.search import NO_SEGMENT, Segment
+from app.model.timeline import NO_TIMELINE, WeeklyLoad
+from app.model.utilization import NO_UTILIZATION, UtilizationMatrix
+from app.model.keys import NTID_COLUMNS, Interner, NO_KEYS, join_key
+
+class Trial:
+    __slots__ = ("row", "id", "protocol_id", "title_lc", "protocol_lc",
+                 "status", "phase", "priority", "therapeutic_area")
+
+    def __init__(self, row: dict):
+        self.row = row   # the display dict handed to the UI
+        self.id = str(row.get("id", ""))
+        self.protocol_id = str(row.get("protocol_id", ""))
+        self.title_lc = str(row.get("title", "")).lower()
+        self.protocol_lc = self.protocol_id.lower()
+        self.status = _label(row.get("status"))
+        self.phase = _label(row.get("phase"))
+        self.priority = _label(row.get("priority"))
+        self.therapeutic_area = _label(row.get("therapeutic_area"))
+
+class Resource:
+    __slots__ = ("id", "name", "type", "type_uc", "role", "department",
+                 "capacity", "utilization", "availability_start", "availability_end",
+                 "ntid", "join_key")
+
+    def __init__(self, id: str, name: str, type: str, role: str, department: str,
+                 capacity: float, utilization: float, availability_start: str,
+                 availability_end: str, ntid: str):
+        self.id = id
+        self.name = name
+        self.type = type
+        self.type_uc = type.upper()
+        self.role = role
+        self.department = department
+        self.capacity = capacity
+        self.utilization = utilization
+        self.availability_start = availability_start
+        self.availability_end = availability_end
+        self.ntid = ntid
+        self.join_key = join_key(ntid, name)
+
+class Allocation:
+    __slots__ = ("idx", "trial_id", "protocol_id", "resource_id", "weekly_hours",
+                 "allocation_percentage", "start_date", "end_date", "ntid", "join_key")
+
+    def __init__(self, idx: int, trial_id: str, protocol_id: str, resource_id: str,
+                 weekly_hours: float, allocation_percentage: float,
+                 start_date: str, end_date: str, ntid: str):
+        self.idx = idx   # row position in the allocations frame
+        self.trial_id = trial_id
+        self.protocol_id = protocol_id
+        self.resource_id = resource_id
+        self.weekly_hours = weekly_hours
+        self.allocation_percentage = allocation_percentage
+        # as in the extract ("" when missing); date logic runs on AllocationArrays
+        self.start_date = start_date
+        self.end_date = end_date
+        self.ntid = ntid
+        self.join_key = join_key(ntid, resource_id)   # same key as Resource.join_key
+
+class RecordSet:
+    """A session's view of one snapshot's records, limited to the tables its page attached.
+
+    `ds` is the snapshot (`app.model.snapshot.Dataset`). Tables outside `tables`
+    read as empty, so a var evaluated on a page that never needs that table
+    does not make the snapshot parse it.
+    """
+    __slots__ = ("_ds", "tables")
+
+    def __init__(self, ds, tables: Iterable[str]):
+        self._ds = ds
+        self.tables = frozenset(tables)
+
+    @property
+    def trials(self) -> tuple[Trial, ...]:
+        return self._ds.trial_records if "trials" in self.tables else ()
+
+    @property
+    def resources(self) -> tuple[Resource, ...]:
+        return self._ds.resource_records if "resources" in self.tables else ()
+
+    @property
+    def allocations(self) -> tuple[Allocation, ...]:
+        return self._ds.allocation_records if "allocations" in self.tables else ()
+
+    def _columns(self, name: str) -> frozenset[str]:
+        return frozenset(self._ds.frame(name).columns) if name in self.tables else frozenset()
+
+    @property
+    def trial_columns(self) -> frozenset[str]:
+        return self._columns("trials")
+
+    @property
+    def resource_columns(self) -> frozenset[str]:
+        return self._columns("resources")
+
+    @property
+    def allocation_columns(self) -> frozenset[str]:
+        return self._columns("allocations")
+
+    @property
+    def allocation_index(self) -> AllocationIndex:
+        """Empty when allocations are not attached."""
+        if "allocations" not in self.tables:
+            return NO_ALLOCATIONS
+        return self._ds.allocation_index
+
+    @property
+    def allocation_arrays(self) -> AllocationArrays:
+        return self._ds.allocation_arrays if "allocations" in self.tables else NO_ALLOCATION_ARRAYS
+
+    @property
+    def resource_arrays(self) -> ResourceArrays:
+        return self._ds.resource_arrays if "resources" in self.tables else NO_RESOURCE_ARRAYS
+
+    @property
+    def allocation_intervals(self) -> IntervalIndex:
+        return self._ds.allocation_intervals if "allocations" in self.tables else NO_INTERVALS
+
+    @property
+    def site_allocation_intervals(self) -> IntervalIndex:
+        return self._ds.site_allocation_intervals if "site_allocations" in self.tables else NO_INTERVALS
+
+    @property
+    def utilization(self) -> UtilizationMatrix:
+        if {"resources", "allocations"} <= self.tables:
+            return self._ds.utilization
+        return NO_UTILIZATION
+
+    @property
+    def timeline(self) -> WeeklyLoad:
+        if {"resources", "allocations"} <= self.tables:
+            return self._ds.timeline
+        return NO_TIMELINE
+
+    @property
+    def capacity_calendar(self) -> CapacityCalendar:
+        if {"resources", "allocations"} <= self.tables:
+            return self._ds.capacity_calendar
+        return NO_CAPACITY
+
+    @property
+    def conflicts(self) -> Conflicts:
+        if {"resources", "allocations"} <= self.tables:
+            return self._ds.conflicts
+        return NO_CONFLICTS
+
+    @property
+    def trial_facets(self) -> TrialFacets:
+        return self._ds.trial_facets if "trials" in self.tables else NO_FACETS
+
+    @property
+    def trial_search(self) -> Segment:
+        return self._ds.trial_search if "trials" in self.tables else NO_SEGMENT
+
+    @property
+    def resource_search(self) -> Segment:
+        return self._ds.resource_search if "resources" in self.tables else NO_SEGMENT
+
+    @property
+    def position_search(self) -> Segment:
+        return self._ds.position_search if "open_positions" in self.tables else NO_SEGMENT
+
+    # surrogate keys: a foreign-key array needs both of its tables attached
+    @property
+    def trial_keys(self) -> Interner:
+        return self._ds.trial_keys if "trials" in self.tables else NO_KEYS
+
+    @property
+    def resource_keys(self) -> Interner:
+        return self._ds.resource_keys if "resources" in self.tables else NO_KEYS
+
+    @property
+    def allocation_trial_keys(self) -> np.ndarray:
+        if {"allocations", "trials"} <= self.tables:
+            return self._ds.allocation_trial_keys
+        return np.full(len(self.allocations), -1, dtype=np.int32)
+
+    @property
+    def allocation_resource_keys(self) -> np.ndarray:
+        if {"allocations", "resources"} <= self.tables:
+            return self._ds.allocation_resource_keys
+        return np.full(len(self.allocations), -1, dtype=np.int32)
+
+    @property
+    def has_hours(self) -> bool:
+        return "weekly_hours" in self.allocation_columns
+
+    @property
+    def has_pct(self) -> bool:
+        return "allocation_percentage" in self.allocation_columns
+
+def _label(v) -> str:
+    """Filterable label: falsy cells (blank, the 0 fill) become ""."""
+    return str(v) if v else ""
+
+def _norm_col(s: str) -> str:
+    # "Resource ID" == "resource_id" == "resource-id" == "resourceid"
+    return re.sub(r"[^a-z0-9]", "", (s or "").lower())
+
+def _text(df: pd.DataFrame, col: str) -> List[str]:
+    """Column as stripped strings; missing column or cell -> "".
+
+    Decoded through the column's distinct values, so a repeated id or date is
+    one shared str object rather than one per row.
+    """
+    if col not in df.columns:
+        return [""] * len(df)
+    codes, uniques = pd.factorize(df[col])
+    vocab = [str(u).strip() for u in uniques] + [""]   # code -1 (missing) -> ""
+    return [vocab[c] for c in codes.tolist()]
+
+def _num(df: pd.DataFrame, col: str) -> List[float]:
+    if col not in df.columns:
+        return [0.0] * len(df)
+    codes, uniques = pd.factorize(pd.to_numeric(df[col], errors="coerce").fillna(0.0))
+    vocab = [float(u) for u in uniques]   # hours/percentages repeat: share the float objects
+    return [vocab[c] for c in codes.tolist()]
+
+def _ntid(df: pd.DataFrame) -> List[str]:
+    want = {_norm_col(k) for k in NTID_COLUMNS}
+    for c in df.columns:
+        if _norm_col(c) in want:
+            return _text(df, c)
+    return [""] * len(df)
+
+# ---------- Per-table compilation (column-at-a-time coercion) ----------
+def compile_trials(rows: Iterable[dict]) -> tuple[Trial, ...]:
+    return tuple(Trial(row) for row in rows)
+
+def compile_resources(r: pd.DataFrame) -> tuple[Resource, ...]:
+    return tuple(map(
+        Resource,
+        _text(r, "id"), _text(r, "name"), _text(r, "type"), _text(r, "role"),
+        _text(r, "department"), _num(r, "capacity"), _num(r, "utilization"),
+        _text(r, "availability_start"), _text(r, "availability_end"), _ntid(r),
+    ))
+
+def compile_allocations(a: pd.DataFrame) -> tuple[Allocation, ...]:
+    return tuple(map(
+        Allocation, range(len(a)),
+        _text(a, "trial_id"), _text(a, "protocol_id"), _text(a, "resource_id"),
+        _num(a, "weekly_hours"), _num(a, "allocation_percentage"),
+        _text(a, "start_date"), _text(a, "end_date"), _ntid(a),
+    ))
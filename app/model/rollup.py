@@ -0,0 +1,358 @@
+# app/model/rollup.py
+"""Per-trial rollup: one pass over a trial's allocations feeds the whole trial card.
+
+The card's vars (utilization, type split, hours by role and department, the
+resources table) used to rebuild their own resource lookups and re-scan the
+trial's allocations, one pass each. `rollup_trial` walks the rows once and
+keeps every aggregate; the vars only read it.
+
+People are keyed by their resolved roster row, so every alias of one person
+adds to the same totals; an unresolved reference is its own person.
+
+`rollup_trial` is vectorized: it groups the rows with `bincount` over the
+column arrays in app/model/columnar.py. `rollup_trial_loop` is the same
+rollup as a record loop, kept as the reference the vectorized one is checked
+against (`python scripts/check_rollup.py`). Both apply one precedence:
+
+    hours of a row       weekly_hours, else allocation % x capacity
+    utilization / person weekly hours / capacity, else the summed
+                         allocation %, else the roster's utilization
+
+and both keep the same orders: people by first row, roles and departments by
+their first person, and float sums in row order.
+
+`rollup_portfolio` precomputes every trial's rollup once per snapshot
+(`Dataset.rollups`), split across a process pool on large portfolios, so
+selecting a trial is a dict lookup.
+"""
+from __future__ import annotations
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import TYPE_CHECKING, Dict, List, Optional
+import numpy as np
+import pandas as pd
+
+from app.model.columnar import take
+
+if TYPE_CHECKING:
+    from app.model.records import RecordSet
+
+class TrialRollup:
+    """Aggregates for one selected trial (plain values, safe to share)."""
+    __slots__ = ("rows", "weekly_hours", "people", "utils", "avg_util", "overallocated",
+                 "underutilized", "type_counts", "by_role", "by_department", "detail")
+
+    def __init__(self):
+        self.rows = 0                  # allocations of the trial
+        self.weekly_hours = 0.0        # sum of their weekly_hours
+        self.people = 0                # distinct people booked
+        self.utils: List[float] = []   # utilization % per person
+        self.avg_util = 0              # their mean, rounded
+        self.overallocated = 0         # people above OVERALLOCATED %
+        self.underutilized = 0         # ... and below UNDERUTILIZED %
+        self.type_counts: Dict[str, int] = {"fte": 0, "fsp": 0}
+        self.by_role: List[dict] = []        # [{"label", "hours"}], most hours first
+        self.by_department: List[dict] = []
+        # resources table, highest allocation first: DETAIL_FIELDS tuples, which
+        # keep a whole portfolio's rollups compact (see `detail_rows`)
+        self.detail: List[tuple] = []
+
+    def detail_rows(self) -> List[dict]:
+        return [dict(zip(DETAIL_FIELDS, d)) for d in self.detail]
+
+DETAIL_FIELDS = ("name", "role", "type", "department", "capacity", "weekly_hours",
+                 "allocation_pct", "start_date", "end_date", "date_range")
+
+NO_ROLLUP = TrialRollup()
+
+OVERALLOCATED = 100.0
+UNDERUTILIZED = 30.0
+
+def _ranked(totals: Dict[str, float]) -> List[dict]:
+    items = [{"label": k, "hours": v} for k, v in totals.items()]
+    items.sort(key=lambda x: x["hours"], reverse=True)
+    return items
+
+def _detail_rows(people, has, detail) -> List[tuple]:
+    """Resources table rows from (roster row, hours, pct, first start, last end) per person."""
+    out = []
+    for k, h, pct, start, end in detail:
+        r = people[k] if k >= 0 and has else None
+        cap = r.capacity if r and "capacity" in has else 0.0
+        # one of hours / percent missing: derive it from the other through capacity
+        if h == 0.0 and pct and cap:
+            h = (pct / 100.0) * float(cap)
+        if pct == 0.0 and h and cap:
+            pct = (h / float(cap)) * 100.0
+        out.append((
+            r.name if r else "",
+            r.role if r and "role" in has else "",
+            r.type if r and "type" in has else "",
+            r.department if r and "department" in has else "",
+            cap,
+            round(h or 0.0, 1),
+            int(round(pct or 0.0)),
+            start,
+            end,
+            f"{start or ''} - {end or ''}" if (start or end) else "",
+        ))
+    out.sort(key=lambda x: x[6], reverse=True)   # allocation_pct
+    return out
+
+def rollup_trial_loop(R: RecordSet, rows: np.ndarray, card_rows: np.ndarray) -> TrialRollup:
+    """Roll up a trial's allocations in one pass over the records.
+
+    `rows` are all of the trial's allocation rows (matched by trial id or
+    protocol id) and drive the headline numbers: hours, head count,
+    utilization, type split. `card_rows` are the rows booked under the
+    selected id, which the role/department charts and the resources table use.
+    """
+    every = np.union1d(rows, card_rows)
+    if not len(every):
+        return NO_ROLLUP
+    cols = R.resource_columns
+    people = R.resources
+    has_hours, has_pct = R.has_hours, R.has_pct
+    use_cap = {"id", "capacity"} <= cols
+    use_util = {"id", "utilization"} <= cols
+    use_role = {"id", "role"} <= cols
+    use_dept = {"id", "department"} <= cols
+    use_type = {"name", "type"} <= cols
+    has = cols if "name" in cols else frozenset()
+
+    totals: dict = {}   # person -> [roster row, hours, pct]
+    hours: dict = {}    # person -> [roster row, booked hours] (card rows, non-zero only)
+    detail: dict = {}   # person -> [roster row, hours, pct, first start, last end] (card rows)
+    alias_rows: dict = {}
+    out = TrialRollup()
+    # card rows are normally the trial's rows (else a subset); one walk covers both
+    if len(every) == len(rows) == len(card_rows):
+        main = card = [True] * len(every)
+    else:
+        main, card = np.isin(every, rows).tolist(), np.isin(every, card_rows).tolist()
+    pct_hours = not has_hours and has_pct and use_cap
+    for a, k, in_main, in_card in zip(R.allocation_index.take(every),
+                                      R.allocation_resource_keys[every].tolist(), main, card):
+        rid, wh, ap = a.resource_id, a.weekly_hours, a.allocation_percentage
+        person = k if k >= 0 else rid
+        if in_main:
+            out.weekly_hours += wh
+            alias_rows[rid] = k
+            t = totals.get(person)
+            if t is None:
+                t = totals[person] = [k, 0.0, 0.0]
+            t[1] += wh
+            t[2] += ap
+        if not in_card:
+            continue
+
+        # booked hours: weekly_hours, else allocation % of the person's capacity
+        val = wh if has_hours else (ap / 100.0) * people[k].capacity if pct_hours and k >= 0 else 0.0
+        if val:
+            h = hours.get(person)
+            if h is None:
+                h = hours[person] = [k, 0.0]
+            h[1] += val
+
+        d = detail.get(person)
+        if d is None:
+            d = detail[person] = [k, 0.0, 0.0, None, None]
+        if has_hours:
+            d[1] += wh
+        if has_pct:
+            d[2] += ap
+        # earliest start / latest end where present
+        s, e = a.start_date, a.end_date
+        if s and (d[3] is None or s < d[3]):
+            d[3] = s
+        if e and (d[4] is None or e > d[4]):
+            d[4] = e
+
+    out.rows = len(rows)
+    out.people = len(totals)
+
+    # utilization per person: weekly hours / capacity, else the booked %, else
+    # the roster's own utilization figure
+    for k, h, pct in totals.values():
+        cap = people[k].capacity if use_cap and k >= 0 else 0.0
+        if has_hours and cap > 0:
+            u = (h / cap) * 100.0
+        elif has_pct:
+            u = pct
+        else:
+            u = people[k].utilization if use_util and k >= 0 else 0.0
+        out.utils.append(max(0.0, u))
+    out.avg_util = int(round(sum(out.utils) / len(out.utils))) if out.utils else 0
+    out.overallocated = sum(1 for u in out.utils if u > OVERALLOCATED)
+    out.underutilized = sum(1 for u in out.utils if u < UNDERUTILIZED)
+
+    # FTE vs everyone else, once per person (unresolved references count apiece)
+    seen: set[int] = set()
+    for rid in sorted(alias_rows):
+        k = alias_rows[rid] if use_type else -1
+        if k >= 0 and k in seen:
+            continue
+        seen.add(k)
+        out.type_counts["fte" if k >= 0 and people[k].type_uc == "FTE" else "fsp"] += 1
+
+    by_role: Dict[str, float] = {}
+    by_dept: Dict[str, float] = {}
+    for k, h in hours.values():
+        role = (people[k].role or "Unknown") if use_role and k >= 0 else "Unknown"
+        dept = (people[k].department or "Unknown") if use_dept and k >= 0 else "Unknown"
+        by_role[role] = by_role.get(role, 0.0) + h
+        by_dept[dept] = by_dept.get(dept, 0.0) + h
+    out.by_role, out.by_department = _ranked(by_role), _ranked(by_dept)
+
+    out.detail = _detail_rows(people, has, detail.values())
+    return out
+
+def _groups(keys: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """(group code per row, first row of each group), groups in order of first row."""
+    codes = pd.factorize(keys)[0]
+    return codes, np.unique(codes, return_index=True)[1]
+
+def _sums(codes: np.ndarray, weights: np.ndarray, n: int) -> np.ndarray:
+    # bincount adds in row order, as the loop does, so the sums match to the bit
+    return np.bincount(codes, weights=weights, minlength=n)
+
+def _ranked_by(labels: np.ndarray, hours: np.ndarray) -> List[dict]:
+    codes, uniques = pd.factorize(labels)
+    return _ranked(dict(zip(uniques.tolist(), _sums(codes, hours, len(uniques)).tolist())))
+
+def rollup_trial(R: RecordSet, rows: np.ndarray, card_rows: np.ndarray) -> TrialRollup:
+    """`rollup_trial_loop`, vectorized over the allocation and roster arrays."""
+    rows, card_rows = np.unique(rows), np.unique(card_rows)
+    if not len(rows) and not len(card_rows):
+        return NO_ROLLUP
+    cols = R.resource_columns
+    has_hours, has_pct = R.has_hours, R.has_pct
+    use_cap = {"id", "capacity"} <= cols
+    use_util = {"id", "utilization"} <= cols
+    has = cols if "name" in cols else frozenset()
+    A, P = R.allocation_arrays, R.resource_arrays
+    fk = R.allocation_resource_keys.astype(np.int64)
+    # person per row: the roster row, else (negative) the unresolved reference
+    person = lambda r: np.where(fk[r] >= 0, fk[r], -1 - A.alias[r])
+    capacity = P.capacity if use_cap else np.zeros(len(P.capacity))
+    out = TrialRollup()
+    out.rows = len(rows)
+
+    # ---------- headline: all of the trial's rows ----------
+    wh, pct = A.weekly_hours[rows], A.pct[rows]
+    out.weekly_hours = float(np.cumsum(wh)[-1]) if len(wh) else 0.0   # row-order sum
+    codes, first = _groups(person(rows))
+    n = out.people = len(first)
+    k = fk[rows][first]
+    h, p = _sums(codes, wh, n), _sums(codes, pct, n)
+    cap = take(capacity, k, 0.0)
+    fallback = p if has_pct else (take(P.utilization, k, 0.0) if use_util else np.zeros(n))
+    u = np.where(cap > 0, h / np.where(cap > 0, cap, 1.0) * 100.0, fallback) if has_hours else fallback
+    u = np.maximum(u, 0.0)
+    out.utils = u.tolist()
+    out.avg_util = int(round(sum(out.utils) / n)) if n else 0
+    out.overallocated = int(np.count_nonzero(u > OVERALLOCATED))
+    out.underutilized = int(np.count_nonzero(u < UNDERUTILIZED))
+
+    # FTE vs everyone else, once per person (unresolved references count apiece)
+    aliases, at = np.unique(A.alias[rows], return_index=True)
+    ka = fk[rows][at] if {"name", "type"} <= cols else np.full(len(aliases), -1)
+    resolved = np.unique(ka[ka >= 0])
+    fte = int(np.count_nonzero(P.fte[resolved]))
+    out.type_counts = {"fte": fte, "fsp": len(resolved) - fte + int(np.count_nonzero(ka < 0))}
+
+    # ---------- card: rows booked under the selected id ----------
+    if not len(card_rows):
+        return out
+    kc = fk[card_rows]
+    if has_hours:
+        val = A.weekly_hours[card_rows]
+    elif has_pct and use_cap:
+        val = np.where(kc >= 0, (A.pct[card_rows] / 100.0) * take(capacity, kc, 0.0), 0.0)
+    else:
+        val = np.zeros(len(card_rows))
+    booked = val != 0
+    if booked.any():
+        codes, first = _groups(person(card_rows[booked]))
+        hours = _sums(codes, val[booked], len(first))
+        kb = kc[booked][first]
+        roles = take(P.role, kb, "Unknown") if {"id", "role"} <= cols else np.full(len(kb), "Unknown", object)
+        depts = (take(P.department, kb, "Unknown") if {"id", "department"} <= cols
+                 else np.full(len(kb), "Unknown", object))
+        out.by_role, out.by_department = _ranked_by(roles, hours), _ranked_by(depts, hours)
+
+    codes, first = _groups(person(card_rows))
+    n = len(first)
+    dh = _sums(codes, A.weekly_hours[card_rows], n) if has_hours else np.zeros(n)
+    dp = _sums(codes, A.pct[card_rows], n) if has_pct else np.zeros(n)
+    # earliest start / latest end: date codes order like the strings; -1 = blank
+    start = np.full(n, np.iinfo(np.int64).max)
+    np.minimum.at(start, codes, np.where(A.start[card_rows] >= 0, A.start[card_rows], np.iinfo(np.int64).max))
+    end = np.full(n, -1)
+    np.maximum.at(end, codes, A.end[card_rows])
+    starts = [A.starts[c] if c < len(A.starts) else None for c in start.tolist()]
+    ends = [A.ends[c] if c >= 0 else None for c in end.tolist()]
+    out.detail = _detail_rows(R.resources, has,
+                              zip(kc[first].tolist(), dh.tolist(), dp.tolist(), starts, ends))
+    return out
+
+# ---------- Whole portfolio: every trial's rollup, built once per snapshot ----------
+ROLLUP_TABLES = ("trials", "resources", "allocations")
+POOL_MIN_ALLOCATIONS = 50_000   # below this a process pool costs more than it saves
+ROLLUP_WORKERS = max(1, min(8, (os.cpu_count() or 2) - 1))
+
+class RollupInputs:
+    """What `rollup_trial` reads from a RecordSet, as a picklable bundle for pool workers."""
+    __slots__ = ("resource_columns", "has_hours", "has_pct", "allocation_arrays",
+                 "resource_arrays", "allocation_resource_keys", "resources")
+
+    def __init__(self, R: RecordSet):
+        for name in self.__slots__:
+            setattr(self, name, getattr(R, name))
+
+_inputs: Optional[RollupInputs] = None   # set once in each pool worker
+
+def _init_worker(inputs: RollupInputs) -> None:
+    global _inputs
+    _inputs = inputs
+
+def _rollup_chunk(selections: list) -> list:
+    return [(key, rollup_trial(_inputs, rows, card)) for key, rows, card in selections]
+
+def selections(R: RecordSet, active: Optional[np.ndarray] = None) -> List[tuple]:
+    """(key, trial rows, card rows) per trial, as the trial list selects it (by protocol id).
+
+    The key is (trial id, protocol id, selected id): the rollup depends on
+    nothing else, so trials sharing those share one entry. `active` keeps
+    only those allocation rows (sorted; e.g. the ones booked on a day).
+    """
+    ix = R.allocation_index
+    keep = (lambda r: r) if active is None else (lambda r: np.intersect1d(r, active, assume_unique=True))
+    out = {}
+    for t in R.trials:
+        sel = t.protocol_id
+        key = (t.id, t.protocol_id, sel)
+        if not sel or key in out:
+            continue
+        rows = [ix.trial_rows(t.id)] if t.id else []
+        rows += [ix.protocol_rows(sel), ix.trial_rows(sel)]
+        out[key] = (key, keep(np.unique(np.concatenate(rows))), keep(ix.trial_rows(sel)))
+    return list(out.values())
+
+def rollup_portfolio(R: RecordSet, workers: int = ROLLUP_WORKERS,
+                     active: Optional[np.ndarray] = None) -> Dict[tuple, TrialRollup]:
+    """Every trial's rollup keyed as in `selections` (over the `active` rows only, if given).
+
+    Large portfolios are split across a process pool; the inputs are shipped
+    to each worker once.
+    """
+    todo = selections(R, active)
+    if workers <= 1 or len(R.allocations) < POOL_MIN_ALLOCATIONS or len(todo) < 2 * workers:
+        return {key: rollup_trial(R, rows, card) for key, rows, card in todo}
+    chunks = [todo[i::workers * 4] for i in range(workers * 4)]
+    # spawn, not fork: the app process runs threads (event loop, loaders)
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(workers, mp_context=ctx, initializer=_init_worker,
+                             initargs=(RollupInputs(R),)) as pool:
+        return {key: roll for part in pool.map(_rollup_chunk, chunks) for key, roll in part}
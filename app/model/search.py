@@ -0,0 +1,313 @@
+# app/model/search.py
+"""n-gram search over short lower-cased documents, built once per snapshot.
+
+One index serves every search box and the command palette (`GlobalIndex`). It
+is segmented per entity table, and each segment is cached by the table's
+content digest, so a new snapshot reuses the segments of unchanged tables and
+re-indexes only what changed.
+
+Every 1-, 2- and 3-character gram of every document gets a postings array (the
+sorted positions of the documents containing it). A query is answered from
+postings instead of scanning all documents, so search time follows the
+number of matches rather than the size of the portfolio:
+
+- substring: intersect the postings of the query's grams (exact for queries
+  of up to three characters), then confirm the survivors with a find;
+- typo-tolerant: when nothing contains the query, documents sharing at least
+  FUZZY_MIN of its trigrams are returned instead ("oncolgy" -> Oncology).
+
+Results are ranked: documents whose first match starts a word first, then
+earlier matches, then table order; fuzzy matches by the share of trigrams they hit.
+"""
+from __future__ import annotations
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional, Sequence
+import numpy as np
+import pandas as pd
+
+from app.model.keys import labels
+
+FUZZY_MIN = 0.5   # share of the query's trigrams a typo match must contain
+SEPARATORS = (" ", "\x1f", "-", "/", "(")   # a match right after one of these starts a word
+
+_EMPTY = np.empty(0, dtype=np.int64)
+_IS_SEPARATOR = np.zeros(128, dtype=bool)   # indexed by code point (anything above 127 is not)
+_IS_SEPARATOR[[ord(c) for c in SEPARATORS]] = True
+
+def _codes(text: str) -> np.ndarray:
+    return np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32).astype(np.int64)
+
+def _gram_codes(cp: np.ndarray, starts: np.ndarray, k: int) -> np.ndarray:
+    """One int64 per k-gram (21 bits per code point, so 3 chars fit)."""
+    g = cp[starts]
+    for j in range(1, k):
+        g = (g << 21) | cp[starts + j]
+    return g
+
+class TrigramIndex:
+    """Postings for every 1-3 character gram of `docs` (already lower-cased).
+
+    Each posting also keeps the gram's first offset in the document, so a query
+    of up to three characters (itself one gram) is answered and ranked without
+    touching the text.
+    """
+    __slots__ = ("docs", "_array", "_chars", "_postings", "_offsets")
+
+    def __init__(self, docs: Sequence[str]):
+        self.docs = list(docs)
+        self._array = np.array(self.docs, dtype=str) if self.docs else np.array([], dtype="<U1")
+        # the same buffer as one code point per cell: doc i, char j -> _chars[i, j]
+        self._chars = self._array.view(np.uint32).reshape(len(self.docs), self._array.itemsize // 4)
+        self._postings: Dict[int, Dict[int, np.ndarray]] = {1: {}, 2: {}, 3: {}}
+        self._offsets: Dict[int, Dict[int, np.ndarray]] = {1: {}, 2: {}, 3: {}}
+        n = len(self.docs)
+        if not n:
+            return
+        lens = np.fromiter(map(len, self.docs), dtype=np.int64, count=n)
+        cp = _codes("".join(self.docs))
+        doc = np.repeat(np.arange(n, dtype=np.int64), lens)
+        off = np.arange(len(cp), dtype=np.int64) - np.repeat(np.cumsum(lens) - lens, lens)
+        room = lens[doc] - off   # characters left in the document from each position
+        for k in (1, 2, 3):
+            at = np.flatnonzero(room >= k)
+            if not len(at):
+                continue   # no document has k characters: no k-grams
+            codes, grams = pd.factorize(_gram_codes(cp, at, k))
+            # few distinct grams: a 16-bit key gets numpy's radix sort; stable, so
+            # docs (and offsets within a doc) stay ascending within a gram
+            key = codes.astype(np.uint16 if len(grams) <= 1 << 16 else np.int64)
+            order = np.argsort(key, kind="stable")
+            g, d, o = key[order], doc[at][order], off[at][order].astype(np.int32)
+            first = np.ones(len(g), dtype=bool)
+            first[1:] = (g[1:] != g[:-1]) | (d[1:] != d[:-1])   # one posting per (gram, doc)
+            g, d, o = g[first], d[first], o[first]
+            bounds = np.flatnonzero(g[1:] != g[:-1]) + 1
+            heads = grams[g[np.r_[0, bounds]].astype(np.int64)].tolist()
+            self._postings[k] = dict(zip(heads, np.split(d, bounds)))
+            self._offsets[k] = dict(zip(heads, np.split(o, bounds)))
+
+    def __len__(self) -> int:
+        return len(self.docs)
+
+    def _grams(self, q: str, k: int) -> list[np.ndarray]:
+        cp = _codes(q)
+        codes = np.unique(_gram_codes(cp, np.arange(len(cp) - k + 1), k)).tolist()
+        return [self._postings[k].get(c, _EMPTY) for c in codes]
+
+    def _contains(self, q: str) -> tuple[np.ndarray, np.ndarray]:
+        """(ascending positions of documents containing `q`, offset of its first match)."""
+        if not q or not self.docs:
+            return _EMPTY, _EMPTY
+        if len(q) <= 3:
+            # the query is one gram: its posting list is the answer
+            code = int(_gram_codes(_codes(q), np.zeros(1, dtype=np.int64), len(q))[0])
+            return (self._postings[len(q)].get(code, _EMPTY),
+                    self._offsets[len(q)].get(code, _EMPTY))
+        lists = sorted(self._grams(q, min(3, len(q))), key=len)
+        hits = lists[0]
+        for p in lists[1:]:
+            if not len(hits):
+                break
+            hits = np.intersect1d(hits, p, assume_unique=True)
+        # every trigram present does not yet mean they are adjacent
+        pos = np.strings.find(self._array[hits], q)
+        return hits[pos >= 0], pos[pos >= 0]
+
+    def contains(self, q: str) -> np.ndarray:
+        """Positions of documents containing `q`, ascending."""
+        return self._contains(q)[0]
+
+    def search(self, q: str) -> np.ndarray:
+        """Ranked positions of the documents matching `q` (substring, else typo-tolerant)."""
+        hits, pos = self._contains(q)
+        if len(hits):
+            before = self._chars[hits, np.maximum(pos - 1, 0)]
+            word = (pos == 0) | _IS_SEPARATOR[np.minimum(before, 127)]
+            return hits[np.lexsort((hits, pos, ~word))]
+        if len(q) < 4:
+            return _EMPTY
+        grams = self._grams(q, 3)
+        if not grams:
+            return _EMPTY
+        shared = np.bincount(np.concatenate(grams), minlength=len(self.docs))
+        need = max(2, int(np.ceil(FUZZY_MIN * len(grams))))
+        cand = np.flatnonzero(shared >= need)
+        return cand[np.lexsort((cand, -shared[cand]))]
+
+# ---------- Global search: one index over every entity table ----------
+# what each table is searched on (site name/city/PI, position title/skills, ...)
+SEARCH_FIELDS: Dict[str, tuple[str, ...]] = {
+    "trials": ("protocol_id", "title", "therapeutic_area"),
+    "resources": ("name", "role", "type", "department"),
+    "sites": ("site_name", "city", "principal_investigator", "site_id", "country"),
+    "open_positions": ("title", "required_skills", "functional_group", "location"),
+    "allocations": ("trial_id", "resource_id"),
+    "site_allocations": ("site_id", "resource_id", "role_at_site"),
+}
+# palette hit: (label column, detail columns)
+DISPLAY: Dict[str, tuple[str, tuple[str, ...]]] = {
+    "trials": ("title", ("protocol_id", "therapeutic_area")),
+    "resources": ("name", ("role", "department")),
+    "sites": ("site_name", ("city", "principal_investigator")),
+    "open_positions": ("title", ("functional_group", "location")),
+    "allocations": ("resource_id", ("trial_id",)),
+    "site_allocations": ("resource_id", ("site_id", "role_at_site")),
+}
+PALETTE_K = 5            # hits per entity type
+PALETTE_BUDGET_MS = 50   # the palette answers within this, skipping what does not fit
+SEGMENT_CACHE = 18       # six tables x the snapshot versions kept resolvable
+
+def _cell(df: pd.DataFrame, col: str, row: int) -> str:
+    if col not in df.columns:
+        return ""
+    v = df[col].iat[row]
+    return "" if v is None or v != v else str(v).strip()
+
+def _documents(df: pd.DataFrame, fields: Sequence[str]) -> list[str]:
+    cols = [labels(df, c) for c in fields if c in df.columns]
+    if not cols:
+        return [""] * len(df)
+    return ["\x1f".join(t).lower() for t in zip(*cols)]
+
+class Segment:
+    """The index over one table's distinct documents, for one content digest.
+
+    Rows with the same text (an allocation booked twice, say) share a
+    document; `search` maps ranked documents back to rows.
+    """
+    __slots__ = ("table", "digest", "index", "doc_of_row", "first_row", "count")
+
+    def __init__(self, table: str, digest: str, docs: Sequence[str]):
+        self.table, self.digest = table, digest
+        codes, uniques = pd.factorize(np.asarray(docs, dtype=object))
+        self.index = TrigramIndex([str(u) for u in uniques])
+        self.doc_of_row = codes.astype(np.int64)
+        self.first_row = np.unique(codes, return_index=True)[1] if len(codes) else _EMPTY
+        self.count = np.bincount(codes, minlength=len(uniques))
+
+    def __len__(self) -> int:
+        return len(self.doc_of_row)
+
+    def search_docs(self, q: str) -> np.ndarray:
+        """Ranked distinct documents."""
+        return self.index.search(q)
+
+    def search(self, q: str) -> np.ndarray:
+        """Ranked row positions; rows sharing a document keep table order."""
+        docs = self.index.search(q)
+        rank = np.full(len(self.index), len(docs), dtype=np.int64)
+        rank[docs] = np.arange(len(docs))
+        r = rank[self.doc_of_row]
+        rows = np.flatnonzero(r < len(docs))
+        return rows[np.argsort(r[rows], kind="stable")]
+
+NO_SEGMENT = Segment("", "", ())
+
+_segments: "OrderedDict[tuple[str, str], Segment]" = OrderedDict()
+_segments_lock = threading.Lock()
+_build_lock = threading.Lock()   # one build at a time; a second asker waits, then hits the cache
+_builder = ThreadPoolExecutor(max_workers=1, thread_name_prefix="reins-search")
+_pending: set[tuple[str, str]] = set()
+_searched: set[str] = set()      # tables someone has searched: re-warmed after a reload
+
+class GlobalIndex:
+    """Search over every entity table of one snapshot (`ds`: app.model.snapshot.Dataset)."""
+    __slots__ = ("_ds",)
+
+    def __init__(self, ds):
+        self._ds = ds
+
+    def _key(self, table: str) -> tuple[str, str]:
+        return table, self._ds.digests.get(table, "")
+
+    def segment(self, table: str, build: bool = True) -> Optional[Segment]:
+        """The table's segment; built now (parsing the table if needed) unless `build` is off."""
+        key = self._key(table)
+        with _segments_lock:
+            seg = _segments.get(key)
+            if seg is not None:
+                _segments.move_to_end(key)
+        if seg is not None or not build:
+            return seg
+        with _build_lock:
+            with _segments_lock:
+                seg = _segments.get(key)
+            if seg is None:
+                seg = Segment(table, key[1], _documents(self._ds.frame(table), SEARCH_FIELDS[table]))
+                with _segments_lock:
+                    _segments[key] = seg
+                    while len(_segments) > SEGMENT_CACHE:
+                        _segments.popitem(last=False)
+        return seg
+
+    def schedule(self, table: str) -> None:
+        """Build a segment on the background worker (no-op if built or queued)."""
+        key = self._key(table)
+        with _segments_lock:
+            if key in _segments or key in _pending:
+                return
+            _pending.add(key)
+
+        def run():
+            try:
+                self.segment(table)
+            finally:
+                with _segments_lock:
+                    _pending.discard(key)
+        _builder.submit(run)
+
+    def search(self, q: str, tables: Sequence[str] = tuple(SEARCH_FIELDS)) -> Dict[str, np.ndarray]:
+        """table -> ranked row positions, building any segment not built yet."""
+        q = q.lower().strip()
+        _searched.update(tables)
+        return {t: self.segment(t).search(q) if q else _EMPTY for t in tables}
+
+    def palette(self, q: str, k: int = PALETTE_K, budget_ms: float = PALETTE_BUDGET_MS) -> Dict:
+        """Top-k hits per entity type, answered within `budget_ms`.
+
+        Types are searched in SEARCH_FIELDS order. A type whose segment is not
+        built yet is listed under "pending" and built in the background; the
+        ones left when the budget runs out are listed under "skipped".
+        """
+        t0 = time.perf_counter()
+        q = q.lower().strip()
+        out: Dict = {"query": q, "groups": {}, "pending": [], "skipped": []}
+        for table in SEARCH_FIELDS:
+            _searched.add(table)
+            if (time.perf_counter() - t0) * 1000 > budget_ms:
+                out["skipped"].append(table)
+                continue
+            seg = self.segment(table, build=False)
+            if seg is None:
+                self.schedule(table)
+                out["pending"].append(table)
+                continue
+            if not q:
+                continue
+            docs = seg.search_docs(q)
+            df = self._ds.frame(table)
+            label, detail = DISPLAY[table]
+            hits = []
+            for d in docs[:k].tolist():
+                row = int(seg.first_row[d])
+                hits.append({"row": row,
+                             "label": _cell(df, label, row),
+                             "detail": " · ".join(filter(None, (_cell(df, c, row) for c in detail))),
+                             "rows": int(seg.count[d])})
+            out["groups"][table] = {"total": len(docs), "hits": hits}
+        out["partial"] = bool(out["pending"] or out["skipped"])
+        out["elapsed_ms"] = round((time.perf_counter() - t0) * 1000, 3)
+        return out
+
+def warm(ds) -> None:
+    """After a reload: queue the segments people have been searching.
+
+    Unchanged tables keep their digest, so they hit the cache; only changed
+    tables are re-indexed.
+    """
+    index = GlobalIndex(ds)
+    for table in sorted(_searched):
+        index.schedule(table)
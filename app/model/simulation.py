@@ -0,0 +1,231 @@
+# app/model/simulation.py
+"""Capacity planning: a Monte Carlo forecast of staffing demand against roster supply.
+
+Every other figure in the app is what is booked today. Here each trial that
+is still to run is played forward month by month, thousands of times, and the
+result is the probability that a role's demand exceeds its roster supply in a
+month (`Forecast.shortage`, roles x months).
+
+A trial's drivers are its phase, status, sites_count, enrollment_target and
+dates. In each scenario:
+
+    sites       activate linearly over a ramp drawn around the phase's
+                RAMP_MONTHS (x RAMP_SPREAD)
+    enrollment  runs at the planned rate per active site (the rate that
+                meets enrollment_target by end_date less close-out) times a
+                lognormal draw, until the target is met
+    close-out   CLOSEOUT_LOAD of the site load for CLOSEOUT_MONTHS
+    Planning    trials start no earlier than now, plus up to PLANNING_SLIP months
+
+Completed and on-hold trials drive nothing. The ramp curve has a closed form
+(active site-months since start), so a batch of scenarios is a few array
+operations over scenarios x trials x months with no loop over either.
+
+A trial's demand for a role is its active sites x the role's weekly hours per
+site, calibrated from today's bookings on ongoing trials of the same phase
+(else of any phase). Bookings that are not simulated - trials without a site
+count, unknown trial references - carry over unchanged for the months their
+dates cover. Supply is each roster role's capacity in the months its people
+are available. Roles are the roster's; unresolved people have none.
+
+Batches are independent with their own seeds (so the result does not depend
+on how they are split) and large runs are spread across a process pool.
+"""
+from __future__ import annotations
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import TYPE_CHECKING, List, Optional
+import numpy as np
+import pandas as pd
+
+from app.model.columnar import take
+from app.model.intervals import NAT, parse_days
+from app.model.rollup import ROLLUP_WORKERS
+
+if TYPE_CHECKING:
+    from app.model.records import RecordSet
+
+SCENARIOS = 2_000
+HORIZON = 18               # months forecast from the planning month
+SHORTAGE_FLAG = 0.5        # probability at which a role-month is flagged
+RAMP_MONTHS = {"PHASE I": 3, "PHASE II": 6, "PHASE III": 9, "PHASE IV": 6, "REGISTRATION": 3}
+RAMP_DEFAULT = 6
+RAMP_SPREAD = (0.5, 1.5)   # a scenario's ramp is the phase's x uniform(spread)
+ENROLL_SIGMA = 0.4         # lognormal spread of the enrollment rate (mean 1)
+PLANNING_SLIP = 6          # months a Planning trial may start late, uniform
+CLOSEOUT_MONTHS = 3
+CLOSEOUT_LOAD = 0.3
+DURATION_DEFAULT = 24      # months, for a trial without an end date
+DONE = {"COMPLETED", "ON HOLD", "CANCELLED", "TERMINATED"}
+MONTH_DAYS = 30.4375
+BATCH_CELLS = 2_000_000    # scenarios x trials x months per vectorized batch
+POOL_MIN_CELLS = 20_000_000   # below this a process pool costs more than it saves
+SIM_WORKERS = ROLLUP_WORKERS
+
+def _sites_months(x: np.ndarray, ramp: np.ndarray) -> np.ndarray:
+    """Active site-months per site after x months, sites activating linearly over `ramp`."""
+    x = np.maximum(x, 0.0)
+    return np.where(x <= ramp, x * x / (2.0 * ramp), x - ramp / 2.0)
+
+def _months_since(days: np.ndarray, first: np.datetime64) -> np.ndarray:
+    return (days - first.astype("datetime64[D]")).astype(np.float64) / MONTH_DAYS
+
+class PlanInputs:
+    """Per-trial drivers, per-role rates, carried-over load and supply: arrays only, picklable."""
+    __slots__ = ("months", "roles", "sites", "start", "planning", "ramp", "planned", "enrolls",
+                 "on_plan", "weights", "baseline", "supply", "trials")
+
+    def __init__(self, R: RecordSet, first: np.datetime64):
+        first = np.datetime64(first, "M")
+        self.months = np.arange(first, first + HORIZON)
+        lo = self.months.astype("datetime64[D]")
+        hi = (self.months + 1).astype("datetime64[D]") - 1
+        day0 = lo[0]
+
+        # ---------- trials ----------
+        trials = R.trials
+        phase = np.array([t.phase.upper() for t in trials], dtype=object)
+        status = np.array([t.status.upper() for t in trials], dtype=object)
+        sites = np.array([float(t.row.get("sites_count") or 0) for t in trials])
+        target = np.array([float(t.row.get("enrollment_target") or 0) for t in trials])
+        start = parse_days([str(t.row.get("start_date") or "") for t in trials])
+        end = parse_days([str(t.row.get("end_date") or "") for t in trials])
+        live = ~np.isin(status, list(DONE))
+        sim = live & (sites > 0)
+        self.trials = int(np.count_nonzero(sim))
+
+        s = np.where(np.isnat(start), 0.0, _months_since(start, day0))
+        duration = np.where(np.isnat(start) | np.isnat(end), DURATION_DEFAULT,
+                            (end - start).astype(np.float64) / MONTH_DAYS)
+        planned = np.maximum(duration - CLOSEOUT_MONTHS, 1.0)
+        ramp = np.array([RAMP_MONTHS.get(p, RAMP_DEFAULT) for p in phase], dtype=np.float64)
+        planning = status == "PLANNING"
+        self.sites, self.ramp, self.planned = sites[sim], ramp[sim], planned[sim]
+        # enrolling at the planned rate meets the target after `on_plan` active
+        # site-months; without a target, enrollment ends on plan
+        self.enrolls = target[sim] > 0
+        self.on_plan = _sites_months(self.planned, self.ramp)
+        self.start = np.where(planning, np.maximum(s, 0.0), s)[sim]
+        self.planning = planning[sim].astype(np.float64)
+
+        # ---------- roles: hours per active site per week, by phase ----------
+        P, A = R.resource_arrays, R.allocation_arrays
+        codes, roles = pd.factorize(P.role)
+        self.roles = np.asarray(roles, dtype=object)
+        n_roles = len(self.roles)
+        fk = R.allocation_resource_keys.astype(np.int64)
+        tk = R.allocation_trial_keys.astype(np.int64)
+        cap = take(P.capacity, fk, 0.0) if "capacity" in R.resource_columns else np.zeros(len(fk))
+        hours = A.weekly_hours if R.has_hours else (A.pct / 100.0 * cap if R.has_pct else np.zeros(len(fk)))
+        role = take(codes.astype(np.int64), fk, -1)
+        t_sim = take(sim, tk, False)
+        ongoing = t_sim & take(status == "ONGOING", tk, False) & (role >= 0)
+        phases, p_code = np.unique(phase, return_inverse=True)
+        n_ph = len(phases)
+        booked = np.zeros((n_ph, n_roles))
+        np.add.at(booked, (p_code[tk[ongoing]], role[ongoing]), hours[ongoing])
+        # the sites of ongoing simulated trials with bookings, per phase
+        staffed = np.zeros(len(trials), bool)
+        staffed[tk[ongoing]] = True
+        per_phase = np.bincount(p_code[staffed], sites[staffed], n_ph)
+        rate_pr = np.divide(booked, per_phase[:, None], out=np.zeros_like(booked), where=per_phase[:, None] > 0)
+        any_phase = booked.sum(0) / max(per_phase.sum(), 1.0)
+        rate_pr = np.where(per_phase[:, None] > 0, rate_pr, any_phase[None, :])
+        self.weights = rate_pr[p_code[sim]] * self.sites[:, None]     # trials x roles, hours per week at full activity
+
+        # ---------- bookings carried over: not simulated, not on a finished trial ----------
+        a_start = take(parse_days(A.starts), A.start, NAT)
+        a_end = take(parse_days(A.ends), A.end, NAT)
+        carry = (role >= 0) & ~t_sim & ((tk < 0) | take(live, tk, False)) & ~(np.isnat(a_start) & np.isnat(a_end))
+        on = ((np.isnat(a_start[carry])[:, None] | (a_start[carry][:, None] <= hi[None, :]))
+              & (np.isnat(a_end[carry])[:, None] | (a_end[carry][:, None] >= lo[None, :])))
+        self.baseline = np.zeros((HORIZON, n_roles))
+        for m in range(HORIZON):
+            self.baseline[m] = np.bincount(role[carry][on[:, m]], hours[carry][on[:, m]], n_roles)
+
+        # ---------- supply: roster capacity x the share of each month a person is available ----------
+        frm = np.where(np.isnat(P.available_from), lo[0], P.available_from)
+        to = np.where(np.isnat(P.available_to), hi[-1], P.available_to)
+        days = (np.minimum(to[:, None], hi[None, :]) - np.maximum(frm[:, None], lo[None, :])).astype(np.int64) + 1
+        share = np.clip(days, 0, None) / ((hi - lo).astype(np.int64) + 1)[None, :]
+        person_cap = P.capacity if "capacity" in R.resource_columns else np.zeros(len(P.capacity))
+        self.supply = np.zeros((HORIZON, n_roles))
+        for m in range(HORIZON):
+            self.supply[m] = np.bincount(codes, person_cap * share[:, m], n_roles)
+
+def _batch(P: PlanInputs, seed: np.random.SeedSequence, n: int) -> tuple[np.ndarray, np.ndarray]:
+    """(short counts, summed demand), months x roles, over n scenarios."""
+    rng = np.random.default_rng(seed)
+    T = len(P.sites)
+    ramp = P.ramp * rng.uniform(*RAMP_SPREAD, (n, T))
+    start = P.start + P.planning * rng.uniform(0.0, PLANNING_SLIP, (n, T))
+    pace = rng.lognormal(-ENROLL_SIGMA ** 2 / 2, ENROLL_SIGMA, (n, T))   # x the planned rate
+    # enrollment completes once active site-months reach on_plan / pace: invert _sites_months
+    need = P.on_plan / pace
+    done = np.where(need <= ramp / 2.0, np.sqrt(2.0 * ramp * need), need + ramp / 2.0)
+    done = np.where(P.enrolls, done, P.planned)[..., None]
+    ramp = ramp[..., None]
+    # month m covers [m, m + 1) of the horizon: k0..k1 months since the trial's start
+    k0 = np.arange(HORIZON, dtype=np.float64)[None, None, :] - start[..., None]
+    k1 = k0 + 1.0
+    enrolling = _sites_months(np.minimum(k1, done), ramp) - _sites_months(np.minimum(k0, done), ramp)
+    closing = np.clip(np.minimum(k1, done + CLOSEOUT_MONTHS) - np.maximum(k0, done), 0.0, None)
+    activity = enrolling + CLOSEOUT_LOAD * closing                       # scenarios x trials x months
+    demand = np.matmul(activity.transpose(0, 2, 1), P.weights) + P.baseline   # scenarios x months x roles
+    return (demand > P.supply + 1e-9).sum(0), demand.sum(0)
+
+_inputs: Optional[PlanInputs] = None   # set once in each pool worker
+
+def _init_worker(inputs: PlanInputs) -> None:
+    global _inputs
+    _inputs = inputs
+
+def _sum(P: PlanInputs, batches: list) -> tuple[np.ndarray, np.ndarray]:
+    short, demand = 0, 0
+    for seed, n in batches:
+        s, d = _batch(P, seed, n)
+        short, demand = short + s, demand + d
+    return short, demand
+
+def _run(batches: list) -> tuple[np.ndarray, np.ndarray]:
+    """Pool worker entry point: the worker's inputs were set by _init_worker."""
+    return _sum(_inputs, batches)
+
+class Forecast:
+    """Shortage probability, mean demand and supply (weekly hours) per role (rows) and month."""
+    __slots__ = ("months", "roles", "scenarios", "trials", "shortage", "demand", "supply")
+
+    def __init__(self, P: PlanInputs, scenarios: int, short: np.ndarray, demand: np.ndarray):
+        self.months, self.roles, self.scenarios, self.trials = P.months, P.roles, scenarios, P.trials
+        self.shortage = (short / max(scenarios, 1)).T
+        self.demand = (demand / max(scenarios, 1)).T
+        self.supply = P.supply.T
+
+    def flagged(self, threshold: float = SHORTAGE_FLAG) -> List[tuple]:
+        """(role, first month, peak probability) for each role short in some month, earliest first."""
+        out = []
+        for r in np.flatnonzero((self.shortage >= threshold).any(1)).tolist():
+            m = int(np.argmax(self.shortage[r] >= threshold))
+            out.append((self.roles[r], self.months[m], float(self.shortage[r].max())))
+        return sorted(out, key=lambda x: (x[1], -x[2]))
+
+def simulate(R: RecordSet, first: np.datetime64, scenarios: int = SCENARIOS,
+             workers: int = SIM_WORKERS, seed: int = 0) -> Forecast:
+    """Run `scenarios` forward from month `first`; split across a process pool when large."""
+    P = PlanInputs(R, first)
+    size = max(1, BATCH_CELLS // max(len(P.sites) * HORIZON, 1))
+    sizes = [min(size, scenarios - i) for i in range(0, scenarios, size)]
+    batches = list(zip(np.random.SeedSequence(seed).spawn(len(sizes)), sizes))
+    if workers <= 1 or scenarios * len(P.sites) * HORIZON < POOL_MIN_CELLS or len(batches) < 2:
+        # in-process: never through the worker global, sessions simulate on threads
+        short, demand = _sum(P, batches)
+    else:
+        chunks = [batches[i::workers] for i in range(workers)]
+        # spawn, not fork: the app process runs threads (event loop, loaders)
+        ctx = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(workers, mp_context=ctx, initializer=_init_worker,
+                                 initargs=(P,)) as pool:
+            parts = list(pool.map(_run, [c for c in chunks if c]))
+        short, demand = sum(p[0] for p in parts), sum(p[1] for p in parts)
+    zero = np.zeros((HORIZON, len(P.roles)))
+    return Forecast(P, scenarios, short + zero, demand + zero)
@@ -0,0 +1,462 @@
+# app/model/snapshot.py
+"""Process-wide dataset cache.
+
+The CSVs are parsed once per process into an immutable, versioned `Dataset`
+that every session reads. Sessions only hold the version token
+(`AppState.data_version`), so N connected planners share one copy of the
+tables instead of N.
+
+Tables are parsed lazily: a Dataset starts with only the content fingerprint
+of each source file (which is what the version is computed from) and parses a
+table the first time something asks for it - `acquire(tables)` from a page's
+on_load, or `Dataset.frame(name)`. `Dataset.resident()` lists what has been
+parsed, so a planner landing on /resources never pays for Trial or Site.
+
+Reloads build a new Dataset next to the current one, pre-loading the tables
+that were resident in it, and swap the reference atomically; the last few
+versions stay resolvable so a session that is still computing on an older
+token finishes against the tables it started with.
+"""
+from __future__ import annotations
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from functools import cached_property
+from pathlib import Path
+from typing import Any, Callable, Optional, Dict, Iterable
+import numpy as np
+import pandas as pd
+
+from app.model.loader import SPECS, find_data_dir, read_table, to_records, frame_bytes
+from app.model.capacity import CapacityCalendar
+from app.model.columnar import AllocationArrays, ResourceArrays, take
+from app.model.compiled import file_digest, open_table, read_manifest
+from app.model.conflicts import Conflicts
+from app.model.identity import IdentityResolver
+from app.model.indexes import AllocationIndex, TrialFacets
+from app.model.intervals import NAT, IntervalIndex, parse_days
+from app.model.keys import Interner, column_keys, labels
+from app.model.rollup import ROLLUP_TABLES, TrialRollup, rollup_portfolio
+from app.model.search import GlobalIndex, Segment
+from app.model.timeline import WeeklyLoad
+from app.model.utilization import UtilizationMatrix
+from app.model.records import (RecordSet, compile_trials, compile_resources,
+                               compile_allocations)
+
+TABLES = tuple(SPECS)   # every table (entities + crosswalk); each is parsed on first use
+KEEP_VERSIONS = 3   # old snapshots kept resolvable for in-flight sessions
+LOAD_WORKERS = 6    # one per entity table
+
+log = logging.getLogger("reins.data")
+
+@dataclass(frozen=True, eq=False)
+class Dataset:
+    """One immutable snapshot of the entity tables. Frames and rows are shared - never mutate them.
+
+    Tables are held columnar (`frames`, resident tables only) and parsed on
+    first access; the row-dict views and typed records the metric vars iterate
+    are built on first access too, once per snapshot.
+    """
+    version: str
+    data_dir: Optional[Path] = None
+    # table -> source fingerprint the version was computed from ("" = no file)
+    digests: Dict[str, str] = field(default_factory=dict)
+    frames: Dict[str, pd.DataFrame] = field(default_factory=dict)
+    # table -> {"origin": "compiled" | "csv" | "missing", "rows", "parse_s", "bytes"}
+    load_stats: Dict[str, Dict] = field(default_factory=dict)
+    source: str = ""
+    loaded_at: float = field(default_factory=time.time)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+    _rollup_lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+    # memo name -> {key: result}, most recently used last (see `memo`)
+    _memos: Dict[str, OrderedDict] = field(default_factory=dict, repr=False)
+    _memo_lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def resident(self) -> list[str]:
+        return [name for name in TABLES if name in self.frames]
+
+    def require(self, tables: Iterable[str]) -> None:
+        """Parse any of `tables` not yet resident (side by side on a worker pool)."""
+        if all(name in self.frames for name in tables):
+            return
+        with self._lock:
+            missing = [name for name in tables if name not in self.frames]
+            if not missing:
+                return
+            with ThreadPoolExecutor(max_workers=LOAD_WORKERS, thread_name_prefix="reins-load") as pool:
+                futures = {name: pool.submit(_read_table, self.data_dir, name) for name in missing}
+                entries = {name: f.result() for name, f in futures.items()}
+            for name, e in entries.items():
+                if e.digest != self.digests.get(name, ""):
+                    log.info("%s changed on disk after snapshot %s; the watcher will publish it",
+                             name, self.version)
+                st = e.stats()
+                log.info("%s: %d rows, %d bytes from %s, parse %.3fs, coerce %.3fs, %.1f KiB resident",
+                         name, st["rows"], st["bytes_read"], st["origin"],
+                         st["parse_s"], st["coerce_s"], st["resident_bytes"] / 1024)
+                self.load_stats[name] = st
+                self.frames[name] = e.frame
+
+    def frame(self, name: str) -> pd.DataFrame:
+        if name not in self.frames:
+            self.require((name,))
+        df = self.frames.get(name)
+        return df if df is not None else pd.DataFrame()
+
+    @cached_property
+    def trials(self) -> tuple[dict, ...]:
+        return tuple(to_records("trials", self.frame("trials")))
+
+    @cached_property
+    def resources(self) -> tuple[dict, ...]:
+        return tuple(to_records("resources", self.frame("resources")))
+
+    @cached_property
+    def allocations(self) -> tuple[dict, ...]:
+        return tuple(to_records("allocations", self.frame("allocations")))
+
+    @cached_property
+    def trial_records(self):
+        return compile_trials(self.trials)
+
+    @cached_property
+    def resource_records(self):
+        return compile_resources(self.frame("resources"))
+
+    @cached_property
+    def allocation_records(self):
+        return compile_allocations(self.frame("allocations"))
+
+    @cached_property
+    def allocation_index(self) -> AllocationIndex:
+        # people are indexed on their resolved key, so every alias of one person
+        # lands on the same roster row
+        keys = self.resource_keys.keys
+        people = [keys[k] if k >= 0 else a.join_key
+                  for a, k in zip(self.allocation_records, self.allocation_resource_keys.tolist())]
+        return AllocationIndex(self.allocation_records, people)
+
+    def rollups(self, build: bool = True) -> Optional[Dict[tuple, TrialRollup]]:
+        """Every trial's card rollup (app.model.rollup.rollup_portfolio), built once.
+
+        Blocking on the first call - call it off the event loop. With `build`
+        off, None until someone has built them.
+        """
+        done = self.__dict__.get("_rollups")
+        if done is not None or not build:
+            return done
+        with self._rollup_lock:
+            done = self.__dict__.get("_rollups")
+            if done is None:
+                self.require(ROLLUP_TABLES)
+                t0 = time.perf_counter()
+                done = rollup_portfolio(self.records(ROLLUP_TABLES))
+                log.info("trial rollups: %d trials in %.3fs", len(done), time.perf_counter() - t0)
+                object.__setattr__(self, "_rollups", done)
+        return done
+
+    def build(self, names: Iterable[str]) -> None:
+        """Build the cached structures `names` (blocking - call it off the event loop)."""
+        for name in names:
+            getattr(self, name)
+
+    def built(self, name: str) -> bool:
+        return name in self.__dict__
+
+    def memo(self, name: str, key: Any, make: Callable[[], Any], keep: int, build: bool = True) -> Any:
+        """`make()` for this snapshot and `key`, kept for the `keep` most recent keys of `name`.
+
+        Per-day and per-month results live here rather than in a module cache so
+        they are freed with the snapshot. With `build` off, None until built.
+        """
+        with self._memo_lock:
+            done = self._memos.setdefault(name, OrderedDict())
+            if key in done:
+                done.move_to_end(key)
+                return done[key]
+        if not build:
+            return None
+        value = make()
+        with self._memo_lock:
+            done[key] = value
+            while len(done) > keep:
+                done.popitem(last=False)
+        return value
+
+    @cached_property
+    def allocation_arrays(self) -> AllocationArrays:
+        return AllocationArrays(self.allocation_records)
+
+    @cached_property
+    def resource_arrays(self) -> ResourceArrays:
+        return ResourceArrays(self.resource_records)
+
+    @cached_property
+    def allocation_intervals(self) -> IntervalIndex:
+        # who is booked on a day / over a window; dates parsed once per distinct label
+        A = self.allocation_arrays
+        return IntervalIndex(take(parse_days(A.starts), A.start, NAT), take(parse_days(A.ends), A.end, NAT))
+
+    @cached_property
+    def site_allocation_intervals(self) -> IntervalIndex:
+        s = self.frame("site_allocations")
+        return IntervalIndex(parse_days(labels(s, "start_date")), parse_days(labels(s, "end_date")))
+
+    @cached_property
+    def utilization(self) -> UtilizationMatrix:
+        # cross-portfolio load per person; needs no trials table (columns are
+        # the booked trial references)
+        return UtilizationMatrix(self.records(("resources", "allocations")))
+
+    @cached_property
+    def timeline(self) -> WeeklyLoad:
+        # hours per week over the allocations' dates, rows and columns as in `utilization`
+        return WeeklyLoad(self.records(("resources", "allocations")), self.utilization)
+
+    @cached_property
+    def capacity_calendar(self) -> CapacityCalendar:
+        # capacity per week within each person's availability, then CapacityOverride.csv
+        o = self.frame("capacity_overrides")
+        hours = o["weekly_hours"].to_numpy(np.float64) if "weekly_hours" in o.columns else np.zeros(len(o))
+        overrides = (column_keys(o, "resource_id", self.resource_keys).astype(np.int64),
+                     parse_days(labels(o, "start_date")), parse_days(labels(o, "end_date")), hours)
+        return CapacityCalendar(self.records(("resources", "allocations")), self.timeline, overrides)
+
+    @cached_property
+    def conflicts(self) -> Conflicts:
+        # over-capacity windows per person, swept over the allocations' dates
+        return Conflicts(self.records(("resources", "allocations")), self.utilization)
+
+    @cached_property
+    def trial_facets(self) -> TrialFacets:
+        return TrialFacets(self.trial_records)
+
+    @cached_property
+    def search_index(self) -> GlobalIndex:
+        return GlobalIndex(self)
+
+    @cached_property
+    def trial_search(self) -> Segment:
+        # what the Portfolio search box matches: protocol id, title, therapeutic area
+        return self.search_index.segment("trials")
+
+    @cached_property
+    def resource_search(self) -> Segment:
+        # the roster search box: name, role, type, department
+        return self.search_index.segment("resources")
+
+    @cached_property
+    def position_search(self) -> Segment:
+        return self.search_index.segment("open_positions")
+
+    # ---------- Surrogate keys (row numbers; see app.model.keys) ----------
+    @cached_property
+    def trial_keys(self) -> Interner:
+        # allocations reference a trial by its protocol id
+        return Interner(labels(self.frame("trials"), "protocol_id"))
+
+    @cached_property
+    def resource_keys(self) -> IdentityResolver:
+        # ... and a person by name, roster id or NTID (see app.model.identity)
+        r = self.resource_records
+        return IdentityResolver([p.name for p in r], [p.id for p in r], [p.ntid for p in r],
+                                {a: k for a, (k, _) in self.crosswalk.items()})
+
+    @cached_property
+    def crosswalk(self) -> Dict[str, tuple[str, str]]:
+        """alias -> (resource_key, method) from ResourceCrosswalk.csv; blank keys are skipped."""
+        c = self.frame("crosswalk")
+        rows = zip(labels(c, "alias"), labels(c, "resource_key"), labels(c, "method"))
+        return {a: (k, m) for a, k, m in rows if a and k}
+
+    @cached_property
+    def site_keys(self) -> Interner:
+        return Interner(labels(self.frame("sites"), "site_id"))
+
+    @cached_property
+    def position_keys(self) -> Interner:
+        return Interner(labels(self.frame("open_positions"), "id"))
+
+    @cached_property
+    def allocation_trial_keys(self) -> np.ndarray:
+        return column_keys(self.frame("allocations"), "trial_id", self.trial_keys)
+
+    @cached_property
+    def allocation_resource_keys(self) -> np.ndarray:
+        return column_keys(self.frame("allocations"), "resource_id", self.resource_keys)
+
+    @cached_property
+    def site_allocation_site_keys(self) -> np.ndarray:
+        return column_keys(self.frame("site_allocations"), "site_id", self.site_keys)
+
+    @cached_property
+    def site_allocation_resource_keys(self) -> np.ndarray:
+        return column_keys(self.frame("site_allocations"), "resource_id", self.resource_keys)
+
+    def records(self, tables: Iterable[str]) -> RecordSet:
+        """Typed records, limited to `tables` (the ones a session's page attached)."""
+        return RecordSet(self, tables)
+
+    def allocation_rows(self, idx: list[int]) -> list[dict]:
+        """Row dicts for a few allocations by position, without building all of them."""
+        return to_records("allocations", self.frame("allocations").take(idx)) if idx else []
+
+@dataclass(frozen=True)
+class _FileEntry:
+    mtime_ns: int
+    size: int
+    digest: str
+    frame: pd.DataFrame
+    origin: str
+    timings: Dict = field(default_factory=dict)   # bytes / parse_s / coerce_s
+
+    def stats(self) -> Dict:
+        t = self.timings
+        return {"origin": self.origin, "rows": len(self.frame),
+                "bytes_read": int(t.get("bytes", 0)),
+                "parse_s": round(t.get("parse_s", 0.0), 4),
+                "coerce_s": round(t.get("coerce_s", 0.0), 4),
+                "resident_bytes": frame_bytes(self.frame)}
+
+_lock = threading.Lock()        # guards _current / _versions / _stats
+_reload_lock = threading.Lock() # one rebuild at a time
+_current: Optional[Dataset] = None
+_versions: Dict[str, Dataset] = {}
+_files: Dict[str, _FileEntry] = {}
+_digests: Dict[str, tuple[int, int, str]] = {}   # path -> (mtime_ns, size, content sha1)
+_stats = {"hits": 0, "misses": 0, "loads": 0, "reloads": 0, "reparsed": 0}
+
+def _fingerprint(data_dir: Optional[Path], name: str) -> str:
+    """Content sha1 of one source file without parsing it ("" if missing).
+
+    Cached on mtime/size; a compiled manifest that still matches the file
+    supplies the hash, so large extracts are not even re-read.
+    """
+    p = data_dir / SPECS[name].file if data_dir else None
+    if not p or not p.exists():
+        return ""
+    st = p.stat()
+    hit = _digests.get(str(p))
+    if hit and hit[:2] == (st.st_mtime_ns, st.st_size):
+        return hit[2]
+    meta = ((read_manifest(data_dir) or {}).get("tables") or {}).get(name)
+    if meta and (meta["size"], meta["mtime_ns"]) == (st.st_size, st.st_mtime_ns):
+        digest = meta["sha1"]
+    else:
+        digest = file_digest(p)
+    _digests[str(p)] = (st.st_mtime_ns, st.st_size, digest)
+    return digest
+
+def _read_table(data_dir: Optional[Path], name: str) -> _FileEntry:
+    """Frame for one table, re-reading only when its source content changed.
+
+    mtime/size is the cheap check; the content hash decides, so a `touch` or a
+    re-copied identical extract does not trigger a parse. A fresh compiled
+    snapshot is memory-mapped instead of parsing the CSV.
+    """
+    p = data_dir / SPECS[name].file if data_dir else None
+    if not p or not p.exists():
+        return _FileEntry(0, 0, "", pd.DataFrame(), "missing")
+    st = p.stat()
+    old = _files.get(str(p))
+    if old and old.mtime_ns == st.st_mtime_ns and old.size == st.st_size:
+        return old
+    t0 = time.perf_counter()
+    digest = _fingerprint(data_dir, name)
+    if old and old.digest == digest:
+        entry = _FileEntry(st.st_mtime_ns, st.st_size, digest, old.frame, old.origin, old.timings)
+    elif hit := open_table(data_dir, name, st, digest):
+        # memory-mapped: nothing is read up front, there is no coercion step
+        entry = _FileEntry(st.st_mtime_ns, st.st_size, digest, hit[1], "compiled",
+                           {"parse_s": time.perf_counter() - t0})
+    else:
+        timings: Dict = {}
+        frame = read_table(data_dir, name, timings)
+        entry = _FileEntry(st.st_mtime_ns, st.st_size, digest, frame, "csv", timings)
+        with _lock:
+            _stats["reparsed"] += 1
+    _files[str(p)] = entry
+    return entry
+
+def load_dataset(data_dir: Optional[Path] = None, preload: Iterable[str] = ()) -> Dataset:
+    """Fingerprint every table and build a Dataset; only `preload` is parsed now."""
+    data_dir = data_dir or find_data_dir()
+    digests = {name: _fingerprint(data_dir, name) for name in TABLES}
+    version = hashlib.sha1("".join(digests.values()).encode()).hexdigest()[:12]
+    ds = Dataset(version=version, data_dir=data_dir, digests=digests, source=str(data_dir or ""))
+    ds.require(preload)
+    return ds
+
+def _install(ds: Dataset) -> None:
+    """Atomic swap: publish ds as current, keep the last KEEP_VERSIONS resolvable."""
+    global _current
+    with _lock:
+        _versions.pop(ds.version, None)
+        _versions[ds.version] = ds
+        while len(_versions) > KEEP_VERSIONS:
+            _versions.pop(next(iter(_versions)))
+        _current = ds
+
+def _ensure_loaded() -> tuple[Dataset, bool]:
+    """Return (current dataset, was_cached), loading it on first use."""
+    ds = _current
+    if ds is not None:
+        return ds, True
+    with _reload_lock:
+        if _current is None:
+            _install(load_dataset())
+            _stats["loads"] += 1
+            return _current, False
+        return _current, True
+
+def reload_if_changed() -> Optional[str]:
+    """Rebuild from disk; swap and return the new version if any file changed.
+
+    Blocking (hashes and parses) - call it off the event loop.
+    """
+    with _reload_lock:
+        before = _current
+        # sessions are on the tables that were resident: have them ready on swap
+        # (unchanged files come straight from the file cache, nothing is parsed)
+        ds = load_dataset(preload=before.resident() if before else ())
+        if before is not None and ds.version == before.version:
+            return None
+        _install(ds)
+        _stats["reloads"] += 1
+        return ds.version
+
+def acquire(tables: Iterable[str] = ()) -> str:
+    """Session entry point: make sure the shared dataset and `tables` are loaded; return its version.
+
+    Blocking on a cold table - call it off the event loop.
+    """
+    ds, cached = _ensure_loaded()
+    cached = cached and all(name in ds.frames for name in tables)
+    ds.require(tables)
+    with _lock:
+        _stats["hits" if cached else "misses"] += 1
+    return ds.version
+
+def current_version() -> str:
+    ds = _current
+    return ds.version if ds else ""
+
+def get_dataset(version: str = "") -> Dataset:
+    """Dataset for a session's version token ("" or an evicted token = current)."""
+    ds = _versions.get(version) if version else None
+    return ds if ds is not None else _ensure_loaded()[0]
+
+def cache_stats() -> Dict:
+    """Hit/miss/reload counters plus the size of the one shared copy."""
+    ds = _current
+    with _lock:
+        out = dict(_stats)
+        out["resident_versions"] = list(_versions)
+    out["version"] = ds.version if ds else ""
+    out["resident"] = ds.resident() if ds else []
+    out["tables"] = dict(ds.load_stats) if ds else {}
+    return out
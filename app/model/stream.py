@@ -0,0 +1,120 @@
+# app/model/stream.py
+"""Chunked ingestion for very large extracts (Allocation.csv in production).
+
+The file is read `chunksize` rows at a time; each chunk goes through the same
+projection/coercion as a whole-file load (`loader.project`) and is appended to
+compact column buffers - numeric columns into growable numpy arrays, string
+columns as int32 codes against one shared vocabulary - so peak memory stays
+close to the final footprint instead of whole frame + row dicts.
+"""
+from __future__ import annotations
+import logging
+import time
+from pathlib import Path
+from typing import Callable, Optional, Dict
+import numpy as np
+import pandas as pd
+
+from app.model.loader import SPECS, project
+
+CHUNK_ROWS = 250_000
+
+log = logging.getLogger("reins.data")
+
+# progress(rows_done, bytes_done, bytes_total, elapsed_s)
+Progress = Callable[[int, int, int, float], None]
+
+class _NumericBuffer:
+    """Append-only numpy column that grows in place (amortized doubling)."""
+    def __init__(self, dtype, capacity: int):
+        self.data = np.empty(max(capacity, 1), dtype=dtype)
+        self.n = 0
+
+    def extend(self, values: np.ndarray) -> None:
+        if values.dtype != self.data.dtype:
+            dtype = np.result_type(self.data.dtype, values.dtype)
+            if dtype != self.data.dtype:
+                self.data = self.data.astype(dtype)
+        need = self.n + len(values)
+        if need > len(self.data):
+            self.data.resize(max(need, 2 * len(self.data)), refcheck=False)
+        self.data[self.n:need] = values
+        self.n = need
+
+    def finish(self) -> np.ndarray:
+        self.data.resize(self.n, refcheck=False)
+        return self.data
+
+class _CodeBuffer:
+    """String column as int32 codes into a vocabulary shared across chunks (-1 = missing)."""
+    def __init__(self, capacity: int):
+        self.codes = _NumericBuffer(np.int32, capacity)
+        self.vocab: Dict[str, int] = {}
+
+    def extend(self, col: pd.Series) -> None:
+        local, uniques = pd.factorize(col)
+        remap = np.fromiter((self.vocab.setdefault(str(u), len(self.vocab)) for u in uniques),
+                            dtype=np.int32, count=len(uniques))
+        out = np.full(len(local), -1, dtype=np.int32)
+        hit = local >= 0
+        out[hit] = remap[local[hit]]
+        self.codes.extend(out)
+
+    def finish(self) -> pd.Categorical:
+        return pd.Categorical.from_codes(self.codes.finish(),
+                                         categories=pd.Index(list(self.vocab), dtype=object))
+
+def log_progress(rows: int, done: int, total: int, elapsed: float) -> None:
+    pct = 100.0 * done / total if total else 100.0
+    log.info("%d rows (%.0f%%), %.0f rows/s", rows, pct, rows / max(elapsed, 1e-9))
+
+def stream_table(data_dir: Path, name: str, chunksize: int = CHUNK_ROWS,
+                 progress: Optional[Progress] = log_progress,
+                 timings: Optional[Dict] = None) -> pd.DataFrame:
+    """Read one table in bounded chunks into a compact frame (strings as categoricals).
+
+    `timings`, if given, receives bytes / parse_s (reader) / coerce_s (projection + buffering).
+    """
+    spec = SPECS[name]
+    p = data_dir / spec.file
+    total = p.stat().st_size
+    wanted = set(spec.columns)
+    buffers: Dict[str, object] = {}
+    rows = 0
+    parse_s = coerce_s = 0.0
+    t0 = time.perf_counter()
+    with p.open("rb") as f:
+        reader = pd.read_csv(f, usecols=lambda c: c in wanted, dtype=spec.dtypes(),
+                             chunksize=chunksize)
+        chunks = iter(reader)
+        while True:
+            t = time.perf_counter()
+            raw = next(chunks, None)
+            parse_s += time.perf_counter() - t
+            if raw is None:
+                break
+            t = time.perf_counter()
+            chunk = project(raw, spec)
+            if chunk.empty:
+                continue
+            if not buffers:
+                # size the buffers from the first chunk's bytes-per-row
+                est = int(len(chunk) * total / max(f.tell(), 1) * 1.05)
+                for c in chunk.columns:
+                    kind = chunk[c].dtype.kind
+                    buffers[c] = (_NumericBuffer(chunk[c].dtype, est) if kind in "biuf"
+                                  else _CodeBuffer(est))
+            for c, buf in buffers.items():
+                if isinstance(buf, _CodeBuffer):
+                    buf.extend(chunk[c])
+                else:
+                    buf.extend(chunk[c].to_numpy())
+            coerce_s += time.perf_counter() - t
+            rows += len(chunk)
+            if progress:
+                progress(rows, f.tell(), total, time.perf_counter() - t0)
+    if timings is not None:
+        timings.update(bytes=total, parse_s=parse_s, coerce_s=coerce_s)
+    if not buffers:
+        return pd.DataFrame()
+    return pd.DataFrame({c: buf.finish() for c, buf in buffers.items()}, copy=False)
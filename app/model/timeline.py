@@ -0,0 +1,120 @@
+# app/model/timeline.py
+"""Time-phased load: allocations spread over a weekly calendar, built once per snapshot.
+
+Everywhere else a booking is one figure, but every allocation also carries
+start_date / end_date. Here its weekly hours land on each week it covers, so
+a person's load is a curve over the study calendar instead of a scalar.
+
+The week axis is dense: Monday-aligned weeks from the earliest date in the
+extract to the latest, kept within WINDOW_WEEKS of this week so one mistyped
+year (2205, 1900) cannot blow up the matrices; a booking beyond the window
+counts in its edge week. Each allocation adds its hours at its first week and
+takes them off after its last one in a difference array, and one prefix sum
+along the axis turns that into hours per week - for every person (rows as in
+app/model/utilization.py) and every booked trial reference at once. The build
+is linear in the allocations plus the size of the two matrices, and "person X
+in Q3" or "department hours per week" is a slice.
+
+Hours follow the rollup's precedence: weekly_hours, else allocation % x
+capacity. A blank (or unparseable) start counts from the first week and a
+blank end runs to the last; rows with neither date, or ending before they
+start, are left out and counted in `undated`.
+"""
+from __future__ import annotations
+from datetime import date
+from typing import TYPE_CHECKING, Optional
+import numpy as np
+import pandas as pd
+
+from app.model.columnar import take
+from app.model.intervals import NAT, parse_days
+from app.model.utilization import UtilizationMatrix, person_rows
+
+if TYPE_CHECKING:
+    from app.model.records import RecordSet
+
+WEEK = np.timedelta64(7, "D")
+WINDOW_WEEKS = 520   # the axis spans at most this many weeks either side of this week
+
+def monday(d) -> np.ndarray:
+    """The Monday of each date's week (datetime64[D]; NaT stays NaT)."""
+    d = np.asarray(d, dtype="datetime64[D]")
+    # 1970-01-01 was a Thursday: weekday (Monday = 0) is (days + 3) % 7
+    return d - ((d.astype(np.int64) + 3) % 7).astype("timedelta64[D]")
+
+def _phase(keys: np.ndarray, n: int, first: np.ndarray, last: np.ndarray,
+           hours: np.ndarray, w: int) -> np.ndarray:
+    """n x w hours per week: +hours at each row's first week, -hours after its last, prefix-summed."""
+    flat = n * (w + 1)
+    diff = (np.bincount(keys * (w + 1) + first, hours, flat)
+            - np.bincount(keys * (w + 1) + last + 1, hours, flat))
+    return np.cumsum(diff.reshape(n, w + 1), axis=1)[:, :w]
+
+class WeeklyLoad:
+    """Hours per week for every person (`hours`) and every booked trial reference (`demand`)."""
+    __slots__ = ("weeks", "people", "capacity", "trials", "hours", "demand", "undated")
+
+    def __init__(self, R: RecordSet, U: UtilizationMatrix):
+        A = R.allocation_arrays
+        row, self.people = person_rows(R)
+        self.capacity, self.trials = U.capacity, U.trials
+        if R.has_hours:
+            booked = A.weekly_hours
+        elif R.has_pct:
+            booked = A.pct / 100.0 * self.capacity[row]
+        else:
+            booked = np.zeros(len(row))
+
+        # parsed once per distinct date label
+        start = take(monday(parse_days(A.starts)), A.start, NAT)
+        end = take(monday(parse_days(A.ends)), A.end, NAT)
+        no_start, no_end = np.isnat(start), np.isnat(end)
+        dated = np.concatenate([start[~no_start], end[~no_end]])
+        today = monday(date.today())
+        if not len(dated):
+            lo = hi = today
+        else:
+            floor, ceil = today - WINDOW_WEEKS * WEEK, today + WINDOW_WEEKS * WEEK
+            lo, hi = np.clip(dated.min(), floor, ceil), np.clip(dated.max(), floor, ceil)
+        self.weeks = np.arange(lo, hi + WEEK, WEEK)
+        w = len(self.weeks)
+        first = np.where(no_start, 0, (np.where(no_start, lo, start) - lo) // WEEK)
+        last = np.where(no_end, w - 1, (np.where(no_end, lo, end) - lo) // WEEK)
+        ok = ~(no_start & no_end) & (last >= first)
+        self.undated = int(np.count_nonzero(~ok))
+        # outside the window: into the edge weeks
+        first, last = np.clip(first, 0, w - 1), np.clip(last, 0, w - 1)
+
+        ok &= booked != 0
+        row, first, last, booked = row[ok], first[ok], last[ok], booked[ok]
+        self.hours = _phase(row, len(self.people), first, last, booked, w)
+        self.demand = _phase(A.trial[ok], len(self.trials), first, last, booked, w)
+
+    def span(self, start: Optional[date] = None, end: Optional[date] = None) -> slice:
+        """Weeks overlapping [start, end] (either end open), as a slice of the week axis."""
+        lo = 0 if start is None else int(np.searchsorted(self.weeks, monday(start)))
+        hi = len(self.weeks) if end is None else int(np.searchsorted(self.weeks, monday(end), "right"))
+        return slice(lo, max(lo, hi))
+
+    def load(self, person: int, weeks: slice = slice(None)) -> np.ndarray:
+        """A person's load % per week (hours / capacity; zeros without a capacity)."""
+        cap = self.capacity[person]
+        return self.hours[person, weeks] / cap * 100.0 if cap > 0 else np.zeros_like(self.hours[person, weeks])
+
+    def by(self, groups: np.ndarray, weeks: slice = slice(None)) -> tuple[np.ndarray, np.ndarray]:
+        """(labels, labels x weeks hours) with people summed by a label per row, e.g. department."""
+        codes, labels = pd.factorize(groups)
+        order = np.argsort(codes, kind="stable")
+        starts = np.flatnonzero(np.r_[True, np.diff(codes[order]) != 0]) if len(order) else order
+        out = np.add.reduceat(self.hours[order, weeks], starts, axis=0) if len(order) else self.hours[:0, weeks]
+        return np.asarray(labels, dtype=object), out
+
+class _Empty(WeeklyLoad):
+    def __init__(self):
+        self.weeks = np.zeros(0, dtype="datetime64[D]")
+        self.people = self.trials = np.zeros(0, dtype=object)
+        self.capacity = np.zeros(0)
+        self.hours = self.demand = np.zeros((0, 0))
+        self.undated = 0
+
+NO_TIMELINE = _Empty()
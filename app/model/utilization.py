@@ -0,0 +1,134 @@
+# app/model/utilization.py
+"""Cross-portfolio utilization: a sparse people x trials matrix, built once per snapshot.
+
+A trial card's utilization only sees that trial's bookings, so a CRA at 40%
+on each of three studies reads 40% on every card. The matrix holds every
+(person, trial) booking at once, as hours and percent of the person's
+capacity: a row sums to the person's load across the portfolio, and a column
+is the trial's staffing.
+
+Rows are people: roster rows first (row k is roster row k), then each
+allocation reference that resolves to no roster row. Columns are the booked
+trial references (trial id or protocol id, as extracted). The figures follow
+the trial rollup's precedence (app/model/rollup.py):
+
+    hours of a cell   weekly_hours, else allocation % x capacity
+    load of a person  weekly hours / capacity, else the summed
+                      allocation %, else the roster's utilization
+
+and a cell's percent is its share of that load (none for a person on the
+roster's figure). There is no scipy here, so it is stored CSR-style in plain
+numpy: `indptr` slices a person's cells, sorted by trial, and `col_indptr`
+slices `col_cells`, the same cells ordered by trial.
+"""
+from __future__ import annotations
+from typing import TYPE_CHECKING, List, Optional
+import numpy as np
+import pandas as pd
+
+from app.model.rollup import OVERALLOCATED
+
+if TYPE_CHECKING:
+    from app.model.records import RecordSet
+
+def person_rows(R: RecordSet) -> tuple[np.ndarray, np.ndarray]:
+    """(row per allocation, label per row): roster rows first, then each unresolved reference."""
+    A = R.allocation_arrays
+    fk = R.allocation_resource_keys.astype(np.int64)
+    n_roster = len(R.resources)
+    loose = fk < 0
+    codes, refs = pd.factorize(A.alias[loose])
+    row = fk.copy()
+    row[loose] = n_roster + codes
+    people = np.concatenate([np.array([r.name for r in R.resources], dtype=object), A.aliases[refs]])
+    return row, people
+
+class UtilizationMatrix:
+    """People x booked trials: hours and percent per cell, load per person."""
+    __slots__ = ("people", "roster", "trials", "capacity", "load", "overallocated", "order",
+                 "indptr", "cols", "rows", "hours", "pct", "col_indptr", "col_cells", "_col")
+
+    def __init__(self, R: RecordSet, rows: Optional[np.ndarray] = None):
+        """`rows` limits it to some allocation rows (e.g. those active on a day); default all."""
+        A, P = R.allocation_arrays, R.resource_arrays
+        has_hours, has_pct = R.has_hours, R.has_pct
+        cols = R.resource_columns
+        n_roster = len(P.capacity)
+        row, self.people = person_rows(R)
+        n = len(self.people)
+        take = slice(None) if rows is None else rows
+        row, wh_a, pct_a, trial_a = row[take], A.weekly_hours[take], A.pct[take], A.trial[take]
+        self.roster = np.concatenate([np.arange(n_roster), np.full(n - n_roster, -1)])
+        self.capacity = np.zeros(n)
+        if {"id", "capacity"} <= cols:
+            self.capacity[:n_roster] = P.capacity
+        self.trials = A.trials
+        self._col = {t: c for c, t in enumerate(self.trials.tolist())}
+
+        # ---------- load per person ----------
+        cap = self.capacity
+        by_hours = (cap > 0) & has_hours
+        # summed over the allocation rows in table order, as the rollup sums them
+        wh = np.bincount(row, wh_a, n) if has_hours else np.zeros(n)
+        ap = np.bincount(row, pct_a, n) if has_pct else np.zeros(n)
+        util = np.zeros(n)
+        if {"id", "utilization"} <= cols:
+            util[:n_roster] = P.utilization
+        load = np.where(by_hours, wh / np.where(by_hours, cap, 1.0) * 100.0, ap if has_pct else util)
+        self.load = np.maximum(load, 0.0)
+        self.order = np.argsort(-self.load, kind="stable")   # most loaded first
+        self.overallocated = int(np.count_nonzero(self.load > OVERALLOCATED))
+
+        # ---------- cells: one per (person, trial), sorted by person then trial ----------
+        m = max(len(self.trials), 1)
+        cell, inverse = np.unique(row * m + trial_a, return_inverse=True)
+        self.rows, self.cols = cell // m, cell % m
+        cwh = np.bincount(inverse, wh_a, len(cell)) if has_hours else np.zeros(len(cell))
+        cap_c = cap[self.rows]
+        if has_hours:
+            self.hours = cwh
+        else:
+            self.hours = np.bincount(inverse, pct_a, len(cell)) / 100.0 * cap_c if has_pct else np.zeros(len(cell))
+        cpct = np.bincount(inverse, pct_a, len(cell)) if has_pct else np.zeros(len(cell))
+        self.pct = np.where(by_hours[self.rows], cwh / np.where(cap_c > 0, cap_c, 1.0) * 100.0, cpct)
+        self.indptr = np.concatenate(([0], np.cumsum(np.bincount(self.rows, minlength=n))))
+        self.col_cells = np.argsort(self.cols, kind="stable")
+        self.col_indptr = np.concatenate(([0], np.cumsum(np.bincount(self.cols, minlength=len(self.trials)))))
+
+    def __len__(self) -> int:
+        return len(self.people)
+
+    def top_overallocated(self, n: int = 10) -> List[tuple]:
+        """(row, person, load %) for the `n` most loaded people above OVERALLOCATED %."""
+        top = self.order[:min(n, self.overallocated)].tolist()
+        return [(k, self.people[k], float(self.load[k])) for k in top]
+
+    def contributors(self, person: int) -> List[tuple]:
+        """(trial, hours, percent) for each trial a person is booked on, largest share first."""
+        if not 0 <= person < len(self.people):
+            return []
+        s = slice(self.indptr[person], self.indptr[person + 1])
+        cells = np.argsort(-self.pct[s], kind="stable") + s.start
+        return list(zip(self.trials[self.cols[cells]].tolist(),
+                        self.hours[cells].tolist(), self.pct[cells].tolist()))
+
+    def staffing(self, trial: str) -> List[tuple]:
+        """(person, hours, percent) for everyone booked under a trial reference, by row."""
+        c = self._col.get(trial)
+        if c is None:
+            return []
+        cells = self.col_cells[self.col_indptr[c]:self.col_indptr[c + 1]]
+        return list(zip(self.people[self.rows[cells]].tolist(),
+                        self.hours[cells].tolist(), self.pct[cells].tolist()))
+
+class _Empty(UtilizationMatrix):
+    def __init__(self):
+        z, zi = np.zeros(0), np.zeros(0, dtype=np.int64)
+        self.people = self.trials = np.zeros(0, dtype=object)
+        self.roster = self.rows = self.cols = self.order = self.col_cells = zi
+        self.capacity = self.load = self.hours = self.pct = z
+        self.indptr = self.col_indptr = np.zeros(1, dtype=np.int64)
+        self.overallocated = 0
+        self._col = {}
+
+NO_UTILIZATION = _Empty()
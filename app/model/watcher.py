@@ -0,0 +1,86 @@
+# app/model/watcher.py
+"""Hot reload of app/data: poll the CSVs, rebuild off the event loop, notify sessions.
+
+`watch_data_dir` runs as an app lifespan task. When a rebuild produces a new
+version it wakes every `wait_for_version` waiter, which is how open sessions
+get a version bump without re-running `on_load`. A session's follow task asks
+`connected` between waits and stops once its client has gone.
+"""
+from __future__ import annotations
+import asyncio
+import logging
+from typing import Optional
+
+from app.model.search import warm
+from app.model.snapshot import Dataset, get_dataset, reload_if_changed, current_version
+
+WATCH_INTERVAL = 5.0   # seconds between mtime checks
+
+# per-snapshot structures sessions read from computed vars: built ahead on a new
+# snapshot when they had been built on the old one
+CARRIED = ("utilization", "timeline", "conflicts", "capacity_calendar")
+
+log = logging.getLogger("reins.data")
+
+_bump: Optional[asyncio.Event] = None
+_app = None   # the rx.App, registered by app/app.py
+
+def track_sessions(app) -> None:
+    """Register the app whose websocket connections `connected` checks."""
+    global _app
+    _app = app
+
+def connected(token: str) -> bool:
+    """Whether the client `token` still has a websocket open (True before the app is up)."""
+    ns = _app.event_namespace if _app is not None else None
+    return ns is None or token in ns.token_to_sid
+
+def _bump_event() -> asyncio.Event:
+    global _bump
+    if _bump is None:
+        _bump = asyncio.Event()
+    return _bump
+
+def _notify() -> None:
+    """Wake everyone waiting on the old version; later waiters get a fresh event."""
+    global _bump
+    ev, _bump = _bump, asyncio.Event()
+    if ev is not None:
+        ev.set()
+
+async def wait_for_version(version: str) -> str:
+    """Block until the shared dataset moves past `version`; return the new token."""
+    while True:
+        cur = current_version()
+        if cur and cur != version:
+            return cur
+        await _bump_event().wait()
+
+def _prewarm(old: Dataset, new: Dataset) -> None:
+    """Build on `new` what sessions were already reading on `old` (blocking: run it on a thread)."""
+    if old.rollups(build=False) is not None:
+        # sessions move over with every trial's rollup already built
+        new.rollups()
+    new.build([name for name in CARRIED if old.built(name)])
+
+async def watch_data_dir(interval: float = WATCH_INTERVAL):
+    """Lifespan task: re-check the data dir every `interval` seconds."""
+    while True:
+        await asyncio.sleep(interval)
+        before = current_version()
+        try:
+            # hashing + parsing happens on a worker thread, never on the loop
+            new_version = await asyncio.to_thread(reload_if_changed)
+        except Exception:
+            log.exception("reloading the data dir failed; staying on snapshot %s", before)
+            continue
+        if not new_version:
+            continue
+        # the new snapshot is already installed: sessions hear about it even if this fails
+        try:
+            await asyncio.to_thread(_prewarm, get_dataset(before), get_dataset(new_version))
+        except Exception:
+            log.exception("pre-warming snapshot %s failed", new_version)
+        _notify()
+        # re-index only the searched tables whose content changed
+        warm(get_dataset(new_version))
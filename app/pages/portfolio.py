@@ -101,8 +101,15 @@ def kpi_strip() -> rx.Component:
             icon_text="📈",
             accent="violet",
         ),
+        kpi_card(
+            "Capacity Conflicts",
+            State.capacity_conflicts,       # scalar @rx.var
+            subtitle=State.capacity_conflicts_sub,
+            icon_text="⚠️",
+            accent="rose",
+        ),
         # columns must be a token or breakpoints mapping (NOT a list of ints)
-        columns=rx.breakpoints({"base": "1", "md": "2", "lg": "3"}),
+        columns=rx.breakpoints({"base": "1", "md": "2", "lg": "4"}),
         spacing="4",
         width="100%",
     )
@@ -2,13 +2,14 @@ import reflex as rx
 from app.state import AppState as State
 from app.components.resources.header import header
 from app.components.resources.table import table
+from app.components.resources.capacity_planning import capacity_planning
 from app.components.resources.allocations_panel import allocations_panel
 
 @rx.page(route="/resources", title="Resources", on_load=State.load_allocations)
 def page() -> rx.Component:
     return rx.vstack(
         header(),
-        table(),
+        rx.cond(State.resources_tab == "capacity_planning", capacity_planning(), table()),
         allocations_panel(),   # ⬅️ lives at page level, outside the table
         spacing="4",
         width="100%",
@@ -1,11 +1,29 @@
 # app/state.py
 from __future__ import annotations
+import asyncio
+import numpy as np
 import reflex as rx
 from datetime import date
-from pathlib import Path
+from functools import lru_cache
 from typing import Optional, List, Dict
-import pandas as pd
-import re
+
+from app.model.conflicts import iso
+from app.model.keys import norm_name
+from app.model.records import RecordSet, Trial
+from app.model.rollup import NO_ROLLUP, OVERALLOCATED, ROLLUP_TABLES, TrialRollup, rollup_portfolio, rollup_trial
+from app.model.simulation import HORIZON, Forecast, simulate
+from app.model.snapshot import KEEP_VERSIONS, Dataset, acquire, get_dataset
+from app.model.utilization import NO_UTILIZATION, UtilizationMatrix
+from app.model.watcher import connected, wait_for_version
+
+# tables each page attaches on load; nothing else is parsed for that page
+PORTFOLIO_TABLES = ("trials", "resources", "allocations")
+RESOURCES_TABLES = ("resources", "allocations", "open_positions")
+PLANNING_TABLES = ("trials", "resources", "allocations")   # the capacity-planning tab simulates trials
+# shared structures each page's vars read, built off the event loop on load
+PORTFOLIO_SHARED = ("conflicts",)
+RESOURCES_SHARED = ("utilization", "timeline", "conflicts", "capacity_calendar")
+FOLLOW_CHECK = 60.0   # seconds between checks that a following session's client is still connected
 
 def _type_style(t: str) -> tuple[str, str, str]:
     """Return (label, color, bg) for a given type string."""
@@ -21,21 +39,118 @@ def _type_style(t: str) -> tuple[str, str, str]:
     }
     return label, color_map.get(key, "#64748B"), bg_map.get(key, "rgba(100,116,139,0.12)")
 
-def _norm_name(s: str) -> str:
-    s = (s or "").strip().lower()
-    s = re.sub(r"^(dr|mr|mrs|ms|miss|prof)\.?\s+", "", s)   # drop titles
-    s = re.sub(r"[^a-z\s]", "", s)                         # rm punct
-    s = re.sub(r"\s+", " ", s)
-    return s
-
-def _first(d: dict, keys: list[str]) -> str:
-    for k in keys:
-        # case-insensitive column match
-        for dk in d.keys():
-            if dk.lower() == k.lower():
-                v = d.get(dk)
-                return "" if v is None else str(v).strip()
-    return ""
+def _fmt_num(v, suffix: str) -> str:
+    """31.0 -> "31%" style display; blank when missing."""
+    if v is None or v == "" or v != v:
+        return ""
+    try:
+        return f"{float(v):g}{suffix}"
+    except (TypeError, ValueError):
+        return str(v)
+
+def _option_items(options: List[str], counts: Optional[Dict[str, int]] = None) -> List[Dict[str, str]]:
+    """Dropdown items: the filter value plus its label, with a count when known."""
+    if counts is None:
+        return [{"value": v, "label": v} for v in options]
+    return [{"value": v, "label": f"{v} ({counts.get(v, 0)})"} for v in options]
+
+def _availability(start: str, end: str) -> str:
+    """Roster availability as a range ("" when both dates are blank)."""
+    if not start and not end:
+        return ""
+    return f"Available {start or 'now'} to {end or 'ongoing'}"
+
+@lru_cache(maxsize=KEEP_VERSIONS + 1)
+def _roster(ds: Dataset) -> list[dict]:
+    """Display rows for the Resources table, built once per snapshot and shared by all sessions."""
+    out: list[dict] = []
+    keys = ds.resource_keys.keys
+    for r, key in zip(ds.resource_records, keys):
+        tlab, tcolor, tbg = _type_style(r.type)
+        out.append({
+            "name": r.name,
+            "role": r.role,
+            "type": tlab,
+            "type_color": tcolor,
+            "type_bg": tbg,
+            "department": r.department,
+            "availability": _availability(r.availability_start, r.availability_end),
+            # resolved person key: NTID, else roster id, else normalized name
+            "join_key": key,
+        })
+    return out
+
+# ---------- As-of date: the bookings active on one day ----------
+AS_OF_CACHE = 8   # days kept per snapshot; planners tend to compare a handful of dates
+# the as-of results are built by handlers on a thread (_warm_as_of); computed vars
+# only read them (build=False) and see None until they exist
+
+def _booked_on(ds: Dataset, day: str, build: bool = True) -> Optional[np.ndarray]:
+    """Allocation rows booked on `day` (ISO date), from the snapshot's interval index."""
+    return ds.memo("booked_on", day, lambda: ds.allocation_intervals.at(day), AS_OF_CACHE, build)
+
+def _rollups_as_of(ds: Dataset, day: str, build: bool = True) -> Optional[Dict[tuple, TrialRollup]]:
+    """Every trial's card rollup over the bookings active on `day`."""
+    return ds.memo("rollups_as_of", day, lambda: rollup_portfolio(
+        ds.records(ROLLUP_TABLES), active=_booked_on(ds, day)), AS_OF_CACHE, build)
+
+def _utilization_as_of(ds: Dataset, day: str, build: bool = True) -> Optional[UtilizationMatrix]:
+    return ds.memo("utilization_as_of", day, lambda: UtilizationMatrix(
+        ds.records(("resources", "allocations")), _booked_on(ds, day)), AS_OF_CACHE, build)
+
+def _conflicts_by_trial(ds: Dataset, day: str, build: bool = True) -> Optional[np.ndarray]:
+    """People in a capacity conflict on each trial's bookings, in trial-key order ("" = any day).
+
+    The one definition of a trial's Over-allocated count: its card and its summary read it.
+    """
+    return ds.memo("conflicts_by_trial", day, lambda: ds.conflicts.involving_by(
+        ds.allocation_trial_keys, len(ds.trial_keys), day or None), AS_OF_CACHE + 1, build)
+
+_NO_ROWS = np.zeros(0, dtype=np.int64)
+
+def _warm_as_of(ds: Dataset, tables: set, day: str) -> None:
+    """Build what a session with `tables` attached reads for `day` (blocking: run it on a thread)."""
+    if set(PORTFOLIO_TABLES) <= tables:
+        _conflicts_by_trial(ds, day)
+    if not day or "allocations" not in tables:
+        return
+    _booked_on(ds, day)
+    if set(PORTFOLIO_TABLES) <= tables:
+        _rollups_as_of(ds, day)
+    if {"resources", "allocations"} <= tables:
+        _utilization_as_of(ds, day)
+
+# ---------- Capacity planning: the Monte Carlo forecast ----------
+FORECAST_CACHE = 4   # months kept per snapshot
+
+def _simulated(ds: Dataset, month: str, build: bool = True) -> Optional[Forecast]:
+    """Shortage forecast from `month` (YYYY-MM), run once per snapshot and shared across sessions.
+
+    Seconds of work: build it on a thread. With `build` off, None until someone has.
+    """
+    return ds.memo("forecast", month, lambda: simulate(
+        ds.records(PLANNING_TABLES), np.datetime64(month, "M")), FORECAST_CACHE, build)
+
+def _shortage_style(p: float) -> tuple[str, str]:
+    """(background, text color) of a role-month cell by shortage probability."""
+    if p >= 0.9:
+        return "#F87171", "#FFFFFF"
+    if p >= 0.5:
+        return "#FECACA", "#991B1B"
+    if p >= 0.1:
+        return "#FEF3C7", "#92400E"
+    return "#F8FAFC", "#94A3B8"
+
+def _count_at(counts: Optional[np.ndarray], k: int) -> int:
+    """counts[k], 0 for no key or counts not built yet."""
+    return int(counts[k]) if counts is not None and 0 <= k < len(counts) else 0
+
+def _iso_day(value: Optional[str]) -> str:
+    """A date input's value as YYYY-MM-DD ("" when blank or not a date)."""
+    try:
+        return date.fromisoformat((value or "").strip()).isoformat()
+    except ValueError:
+        return ""
 
 class AppState(rx.State):
     # ---------- Filters ----------
@@ -47,9 +162,38 @@ class AppState(rx.State):
     department: str = "All"
 
     # ---------- Data in memory ----------
-    trials: List[Dict] = []
-    resources: List[Dict] = []
-    allocations: List[Dict] = []
+    # Sessions keep only the version token; the tables live once per process
+    # in app.model.snapshot and are read through the properties below.
+    # data_tables is what this session's pages attached: every computed var is
+    # evaluated on hydrate, so tables outside it read as empty instead of
+    # being parsed for a page that never shows them.
+    data_version: str = ""
+    data_tables: list[str] = []
+
+    @property
+    def trials(self) -> tuple[dict, ...]:
+        return get_dataset(self.data_version).trials if "trials" in self.data_tables else ()
+
+    @property
+    def resources(self) -> tuple[dict, ...]:
+        return get_dataset(self.data_version).resources if "resources" in self.data_tables else ()
+
+    @property
+    def allocations(self) -> tuple[dict, ...]:
+        return get_dataset(self.data_version).allocations if "allocations" in self.data_tables else ()
+
+    @property
+    def _roster_rows(self) -> list[dict]:
+        # read through here rather than the normalized_resources var: a list var
+        # is type-checked element by element on every read
+        if "resources" not in self.data_tables:
+            return []
+        return _roster(get_dataset(self.data_version))
+
+    @property
+    def _records(self) -> RecordSet:
+        """Typed rows (ids/floats/dates pre-coerced) for the metric vars."""
+        return get_dataset(self.data_version).records(self.data_tables)
 
     # ---------- Selection for Trials panel ----------
     selected_trial_id: Optional[str] = None
@@ -78,83 +222,61 @@ class AppState(rx.State):
         {"title": "Oncology", "count": 7, "img": "/ta/oncology.png", "href": "/portfolio?ta=Oncology"},
     ]
 
-    # ---------- Load data (CSV) ----------
-    def on_load(self):
-        """Load datasets from app/data first, then known fallbacks."""
-        candidates = [
-            Path("app/data"),
-            Path("data"),
-            # repo-local fallback you specified
-            Path("/mnt/data/reins_reflex/reins_reflex/app/data"),
-            # original React upload fallback (kept for dev convenience)
-            Path("/mnt/data/reins_js/reins_js/src/data"),
-        ]
-        data_dir = next((p for p in candidates if p.exists()), None)
-
-        def safe_csv(name: str) -> pd.DataFrame:
-            if not data_dir:
-                return pd.DataFrame()
-            p = data_dir / name
-            if not p.exists():
-                return pd.DataFrame()
-            try:
-                return pd.read_csv(p)
-            except Exception:
-                return pd.DataFrame()
-
-        t = safe_csv("Trial.csv")
-        r = safe_csv("Resource.csv")
-        a = safe_csv("Allocation.csv")
-
-        # Trials
-        if not t.empty:
-            keep_t = [
-                "id", "title", "protocol_id", "phase", "therapeutic_area", "status",
-                "start_date", "end_date", "fte_allocation", "fsp_allocation",
-                "priority", "sites_count",
-            ]
-            self.trials = t[[c for c in keep_t if c in t.columns]].fillna(0).to_dict("records")
-        else:
-            self.trials = []
-
-        # Resources
-        if not r.empty:
-            allowed_r = ["id", "name", "type", "role", "utilization", "capacity", "department"]
-            cols = [c for c in allowed_r if c in r.columns]
-            df_r = r[cols].copy()
-            # numeric coercion only when present
-            for num in ("utilization", "capacity"):
-                if num in df_r.columns:
-                    df_r[num] = pd.to_numeric(df_r[num], errors="coerce").fillna(0.0)
-            if "id" in df_r.columns:
-                df_r["id"] = df_r["id"].astype(str)
-            self.resources = df_r.to_dict("records")
-        else:
-            self.resources = []
-
-        # Allocations
-        if not a.empty:
-            allowed_a = [
-                "trial_id", "protocol_id", "resource_id",
-                "weekly_hours", "allocation_percentage",
-                "role", "type", "start_date", "end_date",
-            ]
-            cols = [c for c in allowed_a if c in a.columns]
-            df_a = a[cols].copy()
-            # numeric coercion only when present
-            for num in ("weekly_hours", "allocation_percentage"):
-                if num in df_a.columns:
-                    df_a[num] = pd.to_numeric(df_a[num], errors="coerce").fillna(0.0)
-            # stringify ids
-            for idc in ("trial_id", "protocol_id", "resource_id"):
-                if idc in df_a.columns:
-                    df_a[idc] = df_a[idc].astype(str)
-            self.allocations = df_a.to_dict("records")
-        else:
-            self.allocations = []
+    # ---------- Load data (shared snapshot) ----------
+    async def _attach(self, tables: tuple[str, ...]):
+        """Attach this session to the process-wide dataset and the tables a page reads."""
+        # a cold table parses on a worker thread so the websocket stays responsive
+        self.data_version = await asyncio.to_thread(acquire, tables)
+        if not set(tables) <= set(self.data_tables):
+            self.data_tables = sorted(set(self.data_tables) | set(tables))
+        # with an as-of date set, the day's results for the tables now attached
+        await asyncio.to_thread(_warm_as_of, get_dataset(self.data_version), set(self.data_tables), self.as_of)
+
+    async def on_load(self):
+        """Attach this session to the process-wide dataset (parsed once, shared read-only)."""
+        await self._attach(PORTFOLIO_TABLES)
+        # every trial's card numbers, built once per snapshot (a no-op once built)
+        await asyncio.to_thread(get_dataset(self.data_version).rollups)
+        # and the capacity-conflict sweep behind the KPI strip and trial summaries
+        await asyncio.to_thread(get_dataset(self.data_version).build, PORTFOLIO_SHARED)
 
         # No default trial selected 
         self.selected_trial_id = None
+        return AppState.follow_data_version
+
+    _following_data: bool = False
+
+    @rx.event(background=True)
+    async def follow_data_version(self):
+        """Move this session onto each new snapshot as the watcher swaps it in."""
+        async with self:
+            if self._following_data:
+                return
+            self._following_data = True
+            version = self.data_version
+            token = self.router.session.client_token
+        while True:
+            try:
+                new = await asyncio.wait_for(wait_for_version(version), FOLLOW_CHECK)
+            except asyncio.TimeoutError:
+                new = version
+            if not connected(token):
+                async with self:
+                    # checked again under the state lock, so a reconnect's on_load
+                    # either sees this follower still running or starts a new one
+                    if not connected(token):
+                        self._following_data = False
+                        return
+            if new != version:
+                version = new
+                async with self:
+                    tables, day, month = set(self.data_tables), self.as_of, self._forecast_month
+                # the session's as-of results and forecast on the new snapshot, before it moves over
+                await asyncio.to_thread(_warm_as_of, get_dataset(version), tables, day)
+                if month:
+                    await asyncio.to_thread(_simulated, get_dataset(version), month)
+                async with self:
+                    self.data_version = version
 
     # ---------- Actions / Event Handlers ----------
     # explicit setters (and aliases) - avoids set_* vs set_*_ collisions
@@ -173,6 +295,43 @@ class AppState(rx.State):
     def set_department(self, value: Optional[str]):
         self.department = value
 
+    # ---------- As-of date (Portfolio and Resources) ----------
+    as_of: str = ""   # YYYY-MM-DD; blank = every booking regardless of dates
+
+    async def set_as_of(self, value: Optional[str]):
+        self.as_of = _iso_day(value)
+        # the day's trial cards and utilization, built off the event loop (shared across sessions)
+        await asyncio.to_thread(_warm_as_of, get_dataset(self.data_version), set(self.data_tables), self.as_of)
+        await self._warm_forecast()
+
+    async def clear_as_of(self):
+        self.as_of = ""
+        await self._warm_forecast()
+
+    @property
+    def _active_rows(self) -> Optional[np.ndarray]:
+        """Allocation rows booked on the as-of date (None: no date set, every row counts).
+
+        No rows until set_as_of (or the follow task) has built the day's.
+        """
+        if not self.as_of or "allocations" not in self.data_tables:
+            return None
+        rows = _booked_on(get_dataset(self.data_version), self.as_of, build=False)
+        return _NO_ROWS if rows is None else rows
+
+    def _active(self, rows: np.ndarray) -> np.ndarray:
+        active = self._active_rows
+        return rows if active is None else np.intersect1d(rows, active, assume_unique=True)
+
+    @property
+    def _utilization(self) -> UtilizationMatrix:
+        """Cross-portfolio load, over the as-of date's bookings when one is set."""
+        R = self._records
+        if self.as_of and {"resources", "allocations"} <= R.tables:
+            done = _utilization_as_of(get_dataset(self.data_version), self.as_of, build=False)
+            return NO_UTILIZATION if done is None else done
+        return R.utilization
+
     def set_query(self, value: Optional[str]):
         self.query = value
 
@@ -185,31 +344,19 @@ class AppState(rx.State):
     # ---------- Options (reactive lists) ---------- 
     @rx.var
     def status_options(self) -> List[str]:
-        if not self.trials:
-            return ["All"]
-        vals = {str(t.get("status")) for t in self.trials if t.get("status")}
-        return ["All"] + sorted(v for v in vals if v and v != "0")
+        return ["All"] + self._records.trial_facets.options["status"]
     
     @rx.var
     def phase_options(self) -> List[str]:
-        if not self.trials:
-            return ["All"]
-        vals = {str(t.get("phase")) for t in self.trials if t.get("phase")}
-        return ["All"] + sorted(v for v in vals if v and v != "0")
+        return ["All"] + self._records.trial_facets.options["phase"]
     
     @rx.var
     def priority_options(self) -> List[str]:
-        if not self.trials:
-            return ["All"]
-        vals = {str(t.get("priority")) for t in self.trials if t.get("priority")}
-        return ["All"] + sorted(v for v in vals if v and v != "0")
+        return ["All"] + self._records.trial_facets.options["priority"]
     
     @rx.var
     def area_options(self) -> List[str]:
-        if not self.trials:
-            return ["All"]
-        vals = {str(t.get("therapeutic_area")) for t in self.trials if t.get("therapeutic_area")}
-        return ["All"] + sorted(v for v in vals if v and v != "0")
+        return ["All"] + self._records.trial_facets.options["therapeutic_area"]
     
     @rx.var
     def department_options(self) -> List[str]:
@@ -222,80 +369,116 @@ class AppState(rx.State):
             return ["All"] + opts if opts else ["All"]
         return ["All"]
 
+    # per-option counts for the filter bar: "Phase II (12)"
+    @rx.var
+    def status_option_items(self) -> List[Dict[str, str]]:
+        return _option_items(self.status_options, self._facet_counts.get("status", {}))
+
+    @rx.var
+    def phase_option_items(self) -> List[Dict[str, str]]:
+        return _option_items(self.phase_options, self._facet_counts.get("phase", {}))
+
+    @rx.var
+    def priority_option_items(self) -> List[Dict[str, str]]:
+        return _option_items(self.priority_options, self._facet_counts.get("priority", {}))
+
+    @rx.var
+    def area_option_items(self) -> List[Dict[str, str]]:
+        return _option_items(self.area_options, self._facet_counts.get("therapeutic_area", {}))
+
+    @rx.var
+    def department_option_items(self) -> List[Dict[str, str]]:
+        return _option_items(self.department_options)
+
     # ---------- Derived: filtered trials ----------
+    @property
+    def _facet_filters(self) -> Dict[str, str]:
+        return {"status": self.status, "phase": self.phase, "priority": self.priority,
+                "therapeutic_area": self.therapeutic_area}
+
     @rx.var
-    def filtered_trials(self) -> List[Dict]:
-        """Filter trials based on current filter settings"""
-        data = list(self.trials)
-        
-        # Search filter
+    def _trial_search_hits(self) -> Optional[np.ndarray]:
+        """Ranked trial positions matching the search box (None when it is empty)."""
         q = self.query.lower().strip()
-        if q:
-            data = [t for t in data if 
-                    q in str(t.get("title", "")).lower() or 
-                    q in str(t.get("protocol_id", "")).lower()]
-        
-        # Status filter
-        if self.status != "All":
-            data = [t for t in data if str(t.get("status", "")) == self.status]
-        
-        # Phase filter
-        if self.phase != "All":
-            data = [t for t in data if str(t.get("phase", "")) == self.phase]
-        
-        # Priority filter
-        if self.priority != "All":
-            data = [t for t in data if str(t.get("priority", "")) == self.priority]
-        
-        # Therapeutic area filter
-        if self.therapeutic_area != "All":
-            data = [t for t in data if str(t.get("therapeutic_area", "")) == self.therapeutic_area]
+        return self._records.trial_search.search(q) if q else None
+
+    @rx.var
+    def _trial_query_mask(self) -> int:
+        """Search box matches as a bitset over the trials (all of them when empty)."""
+        fx = self._records.trial_facets
+        hits = self._trial_search_hits
+        return fx.all if hits is None else fx.of(hits)
+
+    @rx.var
+    def _facet_counts(self) -> Dict[str, Dict[str, int]]:
+        """facet -> {option: matching trials under the other active filters}."""
+        return self._records.trial_facets.counts(self._facet_filters, self._trial_query_mask)
+
+    @rx.var
+    def _filtered_trial_records(self) -> list[Trial]:
+        """Filter trials based on current filter settings"""
+        # search, status, phase, priority and area: one AND over the facet bitsets;
+        # with a search, in its rank order
+        fx = self._records.trial_facets
+        data = fx.take(fx.mask(self._facet_filters, self._trial_query_mask), self._trial_search_hits)
         
         # Department filter (if applicable)
-        if self.department != "All" and data and "department" in data[0]:
-            data = [t for t in data if str(t.get("department", "")) == self.department]
+        if self.department != "All" and data and "department" in data[0].row:
+            data = [t for t in data if str(t.row.get("department", "")) == self.department]
         
         return data
 
+    @rx.var
+    def filtered_trials(self) -> List[Dict]:
+        return [t.row for t in self._filtered_trial_records]
+
     # ---------- Selection helpers ----------
     @rx.var
-    def selected_trial(self) -> Dict | None:
-        """Current selected trial (falls back to first filtered trial) or None if nothing selected (default)"""
+    def _selected_trial_record(self) -> Optional[Trial]:
         if not self.selected_trial_id:
             return None
         target = str(self.selected_trial_id)
 
-        for t in self.filtered_trials:
-            if str(t.get("id", "")) == target or str(t.get("protocol_id", "")) == target:
+        for t in self._filtered_trial_records:
+            if t.id == target or t.protocol_id == target:
                 return t
         return None
+
+    @rx.var
+    def selected_trial(self) -> Dict | None:
+        """Current selected trial (falls back to first filtered trial) or None if nothing selected (default)"""
+        t = self._selected_trial_record
+        return t.row if t else None
     
     @rx.var
     def filtered_trials_with_counts(self) -> list[dict]:
-        by_pid: dict[str, set[str]] = {}
-        for a in self.allocations:
-            pid = str(a.get("trial_id", "")).strip()
-            rid = str(a.get("resource_id", "")).strip()
-            if pid and rid:
-                by_pid.setdefault(pid, set()).add(rid)
-
-        # Attach resource_count to each filtered trial (by protocol_id)
+        # distinct people per trial_id, counted once per snapshot in the index
+        ix = self._records.allocation_index
+        active = self._active_rows
+        counts = ix.resource_counts if active is None else ix.people_per_trial(active)
+        done = self._portfolio_rollups or {}
+        keys, over = self._records.trial_keys, self._trial_conflicts
+
+        # Attach resource_count (by protocol_id) and the card's rollup stats to each filtered trial
         out: list[dict] = []
-        for t in self.filtered_trials:
-            pid = str(t.get("protocol_id", "")).strip()
-            cnt = len(by_pid.get(pid, set()))
-            out.append({**t, "resource_count": cnt})
+        for t in self._filtered_trial_records:
+            cnt = counts.get(t.protocol_id.strip(), 0)
+            roll = done.get((t.id, t.protocol_id, t.protocol_id), NO_ROLLUP)
+            out.append({**t.row, "resource_count": cnt,
+                        "weekly_hours": int(round(roll.weekly_hours)),
+                        "avg_util": roll.avg_util,
+                        "overallocated": _count_at(over, keys.get(t.protocol_id.strip()))})
         return out
 
     # ---------- KPI atoms (scalars only; no nested dicts) ----------
     # TODO - Update these to be reactive using data
     @rx.var
     def active_trials(self) -> int:
-        return sum(1 for t in self.filtered_trials if str(t.get("status","")).lower() != "completed")
+        return sum(1 for t in self._filtered_trial_records if t.status.lower() != "completed")
 
     @rx.var
     def planning_trials(self) -> int:
-        return sum(1 for t in self.filtered_trials if str(t.get("status","")).lower() == "planning")
+        return sum(1 for t in self._filtered_trial_records if t.status.lower() == "planning")
 
     @rx.var
     def planning_text(self) -> str:
@@ -307,15 +490,15 @@ class AppState(rx.State):
 
     @rx.var
     def fte_share(self) -> int:
-        fte_cnt = sum(1 for r in self.resources if str(r.get("type")).upper() == "FTE")
-        fsp_cnt = sum(1 for r in self.resources if str(r.get("type")).upper() in {"FSP","CONTRACTOR"})
+        fte_cnt = sum(1 for r in self._records.resources if r.type_uc == "FTE")
+        fsp_cnt = sum(1 for r in self._records.resources if r.type_uc in {"FSP","CONTRACTOR"})
         denom = max(1, fte_cnt + fsp_cnt)
         return round(100 * fte_cnt / denom)
 
     @rx.var
     def fsp_share(self) -> int:
-        fte_cnt = sum(1 for r in self.resources if str(r.get("type")).upper() == "FTE")
-        fsp_cnt = sum(1 for r in self.resources if str(r.get("type")).upper() in {"FSP","CONTRACTOR"})
+        fte_cnt = sum(1 for r in self._records.resources if r.type_uc == "FTE")
+        fsp_cnt = sum(1 for r in self._records.resources if r.type_uc in {"FSP","CONTRACTOR"})
         denom = max(1, fte_cnt + fsp_cnt)
         return round(100 * fsp_cnt / denom)
 
@@ -325,9 +508,24 @@ class AppState(rx.State):
 
     @rx.var
     def avg_util(self) -> int:
-        vals = [float(r.get("utilization") or 0) for r in self.resources]
+        vals = [r.utilization for r in self._records.resources]
         return round(sum(vals) / max(1, len(vals)))
 
+    @rx.var
+    def capacity_conflicts(self) -> int:
+        """People whose overlapping bookings exceed their capacity (on the as-of date, if set)."""
+        C = self._records.conflicts
+        if self.as_of:
+            return len(np.unique(C.person[C.on(self.as_of)]))
+        return C.in_conflict
+
+    @rx.var
+    def capacity_conflicts_sub(self) -> str:
+        C = self._records.conflicts
+        if self.as_of:
+            return f"over capacity on {self.as_of}"
+        return f"{len(C)} over-capacity windows"
+
     @rx.var
     def avg_util_value(self) -> str:
         return f"{self.avg_util}%"
@@ -354,117 +552,107 @@ class AppState(rx.State):
         return self.selected_trial.get("therapeutic_area") if self.selected_trial else ""
     
     @rx.var
-    def selected_allocations(self) -> List[Dict]:
+    def _selected_allocation_rows(self) -> Optional[np.ndarray]:
         """
-        Allocations for the selected trial. Tries trial_id first then protocol_id
+        Allocation rows for the selected trial. Tries trial_id first then protocol_id
         """
-        if not self.selected_trial:
-            return []
-        tid = str(self.selected_trial.get("id", ""))
-        pid = str(self.selected_trial.get("protocol_id", ""))
-        out: List[Dict] = []
-        for a in self.allocations:
-            a_tid = str(a.get("trial_id", ""))
-            a_pid = str(a.get("protocol_id", ""))
-            if (tid and a_tid == tid) or (pid and (a_pid == pid or a_tid == pid)):
-                out.append(a)
-        return out
+        t = self._selected_trial_record
+        if t is None:
+            return None
+        tid, pid = t.id, t.protocol_id
+        ix = self._records.allocation_index
+        rows = [ix.trial_rows(tid)] if tid else []
+        if pid:
+            rows += [ix.protocol_rows(pid), ix.trial_rows(pid)]
+        # union keeps table order, matching the old full scan
+        return self._active(np.unique(np.concatenate(rows))) if rows else None
+
+    @rx.var
+    def _selected_allocation_records(self) -> list:
+        rows = self._selected_allocation_rows
+        return self._records.allocation_index.take(rows) if rows is not None else []
+
+    @property
+    def _portfolio_rollups(self) -> Optional[Dict[tuple, TrialRollup]]:
+        """Every trial's rollup when this session sees the tables they were built from."""
+        if not set(PORTFOLIO_TABLES) <= set(self.data_tables):
+            return None
+        ds = get_dataset(self.data_version)
+        return _rollups_as_of(ds, self.as_of, build=False) if self.as_of else ds.rollups(build=False)
+
+    @rx.var
+    def _trial_rollup(self) -> TrialRollup:
+        """Every trial-card aggregate for the selected trial."""
+        t = self._selected_trial_record
+        done = self._portfolio_rollups
+        hit = done.get((t.id, t.protocol_id, self.selected_trial_id)) if done and t else None
+        if hit is not None:
+            return hit   # precomputed with the snapshot
+        rows = self._selected_allocation_rows
+        if rows is None or not len(rows):
+            return NO_ROLLUP
+        R = self._records
+        # the charts and resources table use the rows booked under the selected id
+        return rollup_trial(R, rows, self._active(R.allocation_index.trial_rows(self.selected_trial_id)))
+
+    @rx.var
+    def selected_allocations(self) -> List[Dict]:
+        return get_dataset(self.data_version).allocation_rows(
+            [a.idx for a in self._selected_allocation_records])
 
     @rx.var
     def selected_resource_ids(self) -> List[str]:
         # TODO - update resource_id to use actual NTIDs and not names
-        ids = []
-        for a in self.selected_allocations:
-            rid = a.get("resource_id")
-            if rid is not None:
-                ids.append(str(rid))
-        return sorted(set(ids))
+        return sorted({a.resource_id for a in self._selected_allocation_records})
 
     @rx.var
     def selected_allocated_resources_count(self) -> int:
-        return len(self.selected_resource_ids)
+        # distinct people: aliases resolving to one roster row count once
+        return self._trial_rollup.people
 
     # Resource utilization metrics
 
     @rx.var
     def selected_weekly_hours(self) -> int:
-        allocs = self.selected_allocations
-        if not allocs:
+        roll = self._trial_rollup
+        if not roll.rows:
             return 0
 
         # 1) Direct weekly_hours if present
-        if "weekly_hours" in (allocs[0].keys() if allocs else {}):
-            total = sum(float(a.get("weekly_hours") or 0.0) for a in allocs)
-            return int(round(total))
+        if self._records.has_hours:
+            return int(round(roll.weekly_hours))
 
     @rx.var
     def _per_resource_util_list(self) -> List[float]:
         """Derived per-resource utilization % using ONLY present columns."""
-        allocs = self.selected_allocations
-        if not allocs:
-            return []
-
-        caps = {str(r.get("id")): float(r.get("capacity") or 0.0)
-                for r in self.resources if "id" in r and "capacity" in r}
-        base_util = {str(r.get("id")): float(r.get("utilization") or 0.0)
-                     for r in self.resources if "id" in r and "utilization" in r}
-
-        has_hours = any("weekly_hours" in a for a in allocs)
-        has_pct   = any("allocation_percentage" in a for a in allocs)
-
-        by_res: dict[str, dict[str, float]] = {}
-        for a in allocs:
-            rid = str(a.get("resource_id", ""))
-            if rid not in by_res:
-                by_res[rid] = {"hours": 0.0, "pct": 0.0}
-            if "weekly_hours" in a:
-                by_res[rid]["hours"] += float(a.get("weekly_hours") or 0.0)
-            if "allocation_percentage" in a:
-                by_res[rid]["pct"] += float(a.get("allocation_percentage") or 0.0)
-
-        utils: List[float] = []
-        for rid, agg in by_res.items():
-            cap = caps.get(rid, 0.0)
-            if has_hours and cap > 0:
-                u = (agg["hours"] / cap) * 100.0
-            elif has_pct:
-                u = agg["pct"]                    # already a percent
-            else:
-                u = base_util.get(rid, 0.0)       # fallback to resource.utilization if present
-            utils.append(max(0.0, u))
-        return utils
+        return self._trial_rollup.utils
 
     @rx.var
     def selected_avg_util(self) -> int:
-        vals = self._per_resource_util_list
-        return int(round(sum(vals) / len(vals))) if vals else 0
+        return self._trial_rollup.avg_util
+
+    @property
+    def _trial_conflicts(self) -> Optional[np.ndarray]:
+        """People in a capacity conflict per trial key (None until built, or without the tables)."""
+        if not set(PORTFOLIO_TABLES) <= set(self.data_tables):
+            return None
+        return _conflicts_by_trial(get_dataset(self.data_version), self.as_of, build=False)
 
     @rx.var
     def selected_overallocated(self) -> int:
-        return sum(1 for u in self._per_resource_util_list if u > 100.0)
+        """The trial's people whose bookings on it run into a capacity conflict (any trial's hours count)."""
+        t = self._selected_trial_record
+        if t is None:
+            return 0
+        return _count_at(self._trial_conflicts, self._records.trial_keys.get(t.protocol_id.strip()))
 
     def selected_underutilized(self) -> int:
-        return sum(1 for u in self._per_resource_util_list if u < 30.0)
+        return self._trial_rollup.underutilized
 
     # ---------- Resource Type split for selected trial ------------
     @rx.var
     def selected_type_counts(self) -> dict:
-        if not self.selected_resource_ids:
-            return {"fte": 0, "fsp": 0}
-        
-        # build id -> type lookup from Resource.csv
-        typ = {str(r.get("name")): str(r.get("type", "")).upper() for r in self.resources if "name" in r and "type" in r}
-        fte = 0
-        fsp = 0
-
-        for rid in self.selected_resource_ids:
-            t = typ.get(str(rid), "")
-            if t == "FTE":
-                fte += 1
-            else:
-                # Bucket ANY non-FTE as FSP/Contractor (e.g., "FSP", "CONTRACTOR", blanks)
-                fsp += 1
-        return {"fte": fte, "fsp": fsp}
+        return dict(self._trial_rollup.type_counts)
 
     @rx.var
     def selected_fte_pct(self) -> int:
@@ -492,62 +680,14 @@ class AppState(rx.State):
     @rx.var
     def selected_functional_breakdown(self) -> list[dict]:
         """
-        Weighted hours by functional area (role) for the *selected* trial,
-        using selected_resource_ids (not selected_allocations).
+        Weighted hours by functional area (role) for the *selected* trial.
 
         Hours source, in order of preference:
           - Allocation.weekly_hours  (if present)
           - Allocation.allocation_percentage × Resource.capacity (if both present)
         Only uses columns that exist in your CSVs.
         """
-        pid = self.selected_trial_id
-        if not pid or not self.selected_resource_ids:
-            return []
-
-        # Fast membership check for the selected resources.
-        selected_rids = {str(rid) for rid in self.selected_resource_ids}
-
-        # Lookups from Resource.csv (only if columns exist).
-        cap_lookup = {str(r.get("name")): float(r.get("capacity") or 0.0)
-                      for r in self.resources if "id" in r and "capacity" in r}
-        role_lookup = {str(r.get("name")): (str(r.get("role")) or "Unknown")
-                       for r in self.resources if "id" in r and "role" in r}
-
-        # Determine which allocation fields we actually have.
-        has_hours = any("weekly_hours" in a for a in self.allocations)
-        has_pct   = any("allocation_percentage" in a for a in self.allocations)
-
-        # Aggregate hours per *selected* resource, for the *selected* protocol.
-        hours_by_res: dict[str, float] = {}
-        for a in self.allocations:
-            if str(a.get("trial_id", "")) != str(pid):
-                continue
-            rid = str(a.get("resource_id", "")).strip()
-            if rid not in selected_rids:
-                continue
-
-            val = 0.0
-            if has_hours and "weekly_hours" in a:
-                val = float(a.get("weekly_hours") or 0.0)
-            elif has_pct and "allocation_percentage" in a and rid in cap_lookup:
-                pct = float(a.get("allocation_percentage") or 0.0)
-                val = (pct / 100.0) * cap_lookup.get(rid, 0.0)
-
-            if val:
-                hours_by_res[rid] = hours_by_res.get(rid, 0.0) + val
-
-        if not hours_by_res:
-            return []
-
-        # Roll up hours by functional area (role).
-        by_role: dict[str, float] = {}
-        for rid, hrs in hours_by_res.items():
-            role = role_lookup.get(rid, "Unknown")
-            by_role[role] = by_role.get(role, 0.0) + hrs
-
-        items = [{"label": k, "hours": v} for k, v in by_role.items()]
-        items.sort(key=lambda x: x["hours"], reverse=True)
-        return items
+        return self._trial_rollup.by_role
     
     @rx.var
     def selected_functional_breakdown_colored(self) -> list[dict]:
@@ -587,53 +727,7 @@ class AppState(rx.State):
           - Allocation.allocation_percentage × Resource.capacity   (only if both exist)
         Uses only columns that actually exist.
         """
-        pid = self.selected_trial_id
-        if not pid or not self.selected_resource_ids:
-            return []
-
-        selected_rids = {str(rid) for rid in self.selected_resource_ids}
-
-        # lookups from Resource.csv
-        cap_lookup = {str(r.get("name")): float(r.get("capacity") or 0.0)
-                      for r in self.resources if "id" in r and "capacity" in r}
-        dept_lookup = {str(r.get("name")): (str(r.get("department")) or "Unknown")
-                       for r in self.resources if "id" in r and "department" in r}
-
-        # see what allocation fields we have
-        has_hours = any("weekly_hours" in a for a in self.allocations)
-        has_pct   = any("allocation_percentage" in a for a in self.allocations)
-
-        # hours per selected resource, for the selected protocol
-        hours_by_res: dict[str, float] = {}
-        for a in self.allocations:
-            if str(a.get("trial_id", "")) != str(pid):
-                continue
-            rid = str(a.get("resource_id", "")).strip()
-            if rid not in selected_rids:
-                continue
-
-            val = 0.0
-            if has_hours and "weekly_hours" in a:
-                val = float(a.get("weekly_hours") or 0.0)
-            elif has_pct and "allocation_percentage" in a and rid in cap_lookup:
-                pct = float(a.get("allocation_percentage") or 0.0)
-                val = (pct / 100.0) * cap_lookup.get(rid, 0.0)
-
-            if val:
-                hours_by_res[rid] = hours_by_res.get(rid, 0.0) + val
-
-        if not hours_by_res:
-            return []
-
-        # roll up by department
-        by_dept: dict[str, float] = {}
-        for rid, hrs in hours_by_res.items():
-            dept = dept_lookup.get(rid, "Unknown")
-            by_dept[dept] = by_dept.get(dept, 0.0) + hrs
-
-        items = [{"label": k, "hours": v} for k, v in by_dept.items()]
-        items.sort(key=lambda x: x["hours"], reverse=True)
-        return items
+        return self._trial_rollup.by_department
 
     # data for recharts 
     @rx.var
@@ -663,77 +757,8 @@ class AppState(rx.State):
 
     @rx.var
     def selected_resources_detail(self) -> list[dict]:
-        pid = self.selected_trial_id
-        if not pid or not self.selected_resource_ids:
-            return []
-                
-        selected_rids = {str(rid) for rid in self.selected_resource_ids}    
-
-        # resource lookups (use only columns that exist)
-        R = {str(r.get("name")): r for r in self.resources if "name" in r}
-        caps  = {rid: float(r.get("capacity") or 0.0) for rid, r in R.items() if "capacity" in r}
-        names = {rid: str(r.get("name") or "") for rid, r in R.items() if "name" in r}
-        roles = {rid: str(r.get("role") or "") for rid, r in R.items() if "role" in r}
-        types = {rid: str(r.get("type") or "") for rid, r in R.items() if "type" in r}
-        depts = {rid: str(r.get("department") or "") for rid, r in R.items() if "department" in r}  
-
-        has_hours = any("weekly_hours" in a for a in self.allocations)
-        has_pct   = any("allocation_percentage" in a for a in self.allocations) 
-
-        agg: dict[str, dict] = {}
-        for a in self.allocations:
-            if str(a.get("trial_id", "")) != str(pid):
-                continue
-            rid = str(a.get("resource_id", "")).strip()
-            if rid not in selected_rids:
-                continue    
-
-            row = agg.setdefault(rid, {
-                "name": rid,
-                "name": names.get(rid, ""),
-                "role": roles.get(rid, ""),
-                "type": types.get(rid, ""),
-                "department": depts.get(rid, ""),
-                "capacity": caps.get(rid, 0.0),
-                "weekly_hours": 0.0,
-                "allocation_pct": 0.0,
-                "start_date": None,
-                "end_date": None,
-            })  
-
-            if has_hours and "weekly_hours" in a:
-                row["weekly_hours"] += float(a.get("weekly_hours") or 0.0)
-            if has_pct and "allocation_percentage" in a:
-                row["allocation_pct"] += float(a.get("allocation_percentage") or 0.0)   
-
-            s = str(a.get("start_date") or "").strip() or None
-            e = str(a.get("end_date") or "").strip() or None
-            # take min start / max end where present
-            if s:
-                row["start_date"] = min(filter(None, [row["start_date"], s])) if row["start_date"] else s
-            if e:
-                row["end_date"] = max(filter(None, [row["end_date"], e])) if row["end_date"] else e 
-
-        rows: list[dict] = []
-        for rid, row in agg.items():
-            hours = row["weekly_hours"]
-            if hours == 0.0 and row["allocation_pct"] and row["capacity"]:
-                hours = (row["allocation_pct"] / 100.0) * float(row["capacity"])    
-
-            pct = row["allocation_pct"]
-            if (pct == 0.0) and hours and row["capacity"]:
-                pct = (hours / float(row["capacity"])) * 100.0  
-
-            rows.append({
-                **row,
-                "weekly_hours": round(hours or 0.0, 1),
-                "allocation_pct": int(round(pct or 0.0)),
-                "date_range": f"{row['start_date']} - {row['end_date']}" if (row["start_date"] or row["end_date"]) else "",
-            })  
-
-        # sort highest allocation first
-        rows.sort(key=lambda x: x["allocation_pct"], reverse=True)
-        return rows 
+        # sorted highest allocation first
+        return self._trial_rollup.detail_rows()
 
     @rx.var
     def selected_resources_count(self) -> int:
@@ -747,78 +772,107 @@ class AppState(rx.State):
     resources_search: str = ""
     resources_tab: str = "resources"   # resources | open_positions | capacity_planning | incoming
 
-    # Tab counts (wire to real data later; resources tab already uses total_resources)
-    open_positions_count: int = 9
+    # Tab counts (resources tab uses total_resources)
     incoming_count: int = 0
 
+    @rx.var
+    def open_positions_count(self) -> int:
+        """Open positions matching the search box (all of them when it is empty)."""
+        q = (self.resources_search or "").strip().lower()
+        seg = self._records.position_search
+        return len(seg.search(q)) if q else len(seg)
+
     def set_resources_search(self, value: str): self.resources_search = value
 
     def set_resources_tab(self, value: str): self.resources_tab = value
 
-    def _norm_name(s: str) -> str:
-        s = (s or "").strip().lower()
-        s = re.sub(r"^(dr|mr|mrs|ms|miss|prof)\.?\s+", "", s)   # drop titles
-        s = re.sub(r"[^a-z\s]", "", s)                         # rm punct
-        s = re.sub(r"\s+", " ", s)
-        return s
+    # ---------- Capacity planning tab ----------
+    async def open_capacity_planning(self):
+        self.resources_tab = "capacity_planning"
+        await self._attach(PLANNING_TABLES)
+        await self._warm_forecast()
+
+    async def _warm_forecast(self):
+        """Run the open tab's forecast off the event loop (a no-op once cached)."""
+        if self._forecast_month:
+            await asyncio.to_thread(_simulated, get_dataset(self.data_version), self._forecast_month)
+
+    @property
+    def _forecast_month(self) -> str:
+        """The forecast's first month - the as-of date's, else this month ("" when the tab is closed)."""
+        if self.resources_tab != "capacity_planning" or not set(PLANNING_TABLES) <= set(self.data_tables):
+            return ""
+        return (self.as_of or date.today().isoformat())[:7]
+
+    @property
+    def _forecast(self) -> Optional[Forecast]:
+        """The cached forecast; never run here, on the event loop (handlers warm it first)."""
+        month = self._forecast_month
+        return _simulated(get_dataset(self.data_version), month, build=False) if month else None
 
-    def _norm_col(s: str) -> str:
-        # "Resource ID" == "resource_id" == "resource-id" == "resourceid"
-        return re.sub(r"[^a-z0-9]", "", (s or "").lower())
+    @rx.var
+    def forecast_cells(self) -> list[dict]:
+        """Role x month shortage grid, row by row: a header row of months, then one row per role."""
+        F = self._forecast
+        if F is None or not len(F.roles):
+            return []
+        months = [m.astype(object).strftime("%b %y") for m in F.months]
+        cells = [{"text": "Role", "bg": "transparent", "color": "#64748B"}]
+        cells += [{"text": m, "bg": "transparent", "color": "#64748B"} for m in months]
+        for r, role in enumerate(F.roles.tolist()):
+            cells.append({"text": role, "bg": "transparent", "color": "#0F172A"})
+            for p in F.shortage[r].tolist():
+                bg, fg = _shortage_style(p)
+                cells.append({"text": f"{int(round(p * 100))}%", "bg": bg, "color": fg})
+        return cells
+
+    @rx.var
+    def forecast_flags(self) -> list[dict]:
+        """Roles likely to run short (in half the scenarios or more), earliest first."""
+        F = self._forecast
+        if F is None:
+            return []
+        return [{"role": role, "month": month.astype(object).strftime("%B %Y"), "p": f"{int(round(p * 100))}%"}
+                for role, month, p in F.flagged()]
 
-    def _first(d: dict, keys: list[str]) -> str:
-        """Return the first non-null field in d whose (normalized) name matches any of keys."""
-        if not isinstance(d, dict):
+    @rx.var
+    def forecast_summary(self) -> str:
+        F = self._forecast
+        if F is None:
             return ""
-        want = {_norm_col(k) for k in keys}
-        for dk, v in d.items():
-            if _norm_col(dk) in want:
-                return "" if v is None else str(v).strip()
-        return ""
+        start = F.months[0].astype(object).strftime("%B %Y")
+        return (f"{F.scenarios:,} scenarios over {F.trials} active trials, "
+                f"{HORIZON} months from {start}")
 
     @rx.var
     def filtered_resources(self) -> list[dict]:
         """Apply the search box to name/role/type/department (case-insensitive)."""
         q = (self.resources_search or "").strip().lower()
-        base = self.normalized_resources
+        base = self._roster_rows
         
         if not q:
             return base
 
-        def hits(row: dict) -> bool:
-            return (
-                q in row["name"].lower()
-                or q in row["role"].lower()
-                or q in row["type"].lower()
-                or q in row["department"].lower()
-            )
-
-        return [r for r in base if hits(r)]
+        # rows line up with the roster, so the shared search index's ranked
+        # row positions pick them directly
+        return [base[i] for i in self._records.resource_search.search(q).tolist()]
 
     @rx.var
     def total_resources(self) -> int:
         return len(self.filtered_resources)
 
     # ---------- Actions / Allocations panel state -----------
-    allocations_data: list[dict] = []
     allocations_open: bool = False
     selected_resource_name: str = ""
     resource_allocations: dict[str, list[dict]] = {}
 
-    def load_allocations_from_csv(self, path: str = "data/Allocation.csv"):
-        """One-time load of allocations into state"""
-        if self.allocations_data: # already loaded
-            return
-        import csv, pathlib
-        p = pathlib.Path(path)
-        if not p.exists():
-            return
-        with p.open("r", encoding="utf-8-sig", newline="") as f:
-            self.allocations_data = list(csv.DictReader(f))
-
-    # Convenience zero-arg wrapper for on_load (since on_load passes no args)
-    def load_allocations(self):
-        self.load_allocations_from_csv()
+    # Resources page on_load: attach to the same shared snapshot the Portfolio
+    # reads, so both pages aggregate one allocation table
+    async def load_allocations(self):
+        await self._attach(RESOURCES_TABLES)
+        # load per trial and per week, capacity per week and the conflict sweep, built once per snapshot
+        await asyncio.to_thread(get_dataset(self.data_version).build, RESOURCES_SHARED)
+        return AppState.follow_data_version
 
     def open_allocations(self, name: str):
         self.allocations_open = True
@@ -833,64 +887,12 @@ class AppState(rx.State):
     
     @rx.var
     def normalized_resources(self) -> list[dict]:
-        base = self.resources or []
-        out: list[dict] = []
-        for r in base:
-            name = (r.get("Name") or r.get("name") or "").strip()
-            role = (r.get("Role") or r.get("role") or "").strip()
-            dept = (r.get("Department") or r.get("department") or "").strip()
-            tlab, tcolor, tbg = _type_style(r.get("Type") or r.get("type") or "")
-
-            # Prefer an ID if your resources dataset has it; else use normalized name (TO ADD LATER)
-            rid = _first(r, ["NTID", "Network ID", "Employee ID", "resource_ntid", "resource_guid"])
-            join_key = (rid or _norm_name(name)).lower()
-
-            out.append({
-                "name": name,
-                "role": role,
-                "type": tlab,
-                "type_color": tcolor,
-                "type_bg": tbg,
-                "department": dept,
-                "join_key": join_key,
-            })
-        return out
-
-    @rx.var
-    def _allocations_grouped(self) -> dict[str, list[dict]]:
-        """Group allocations by join_key (prefer ID, else normalized name)"""
-        groups: dict[str, list[dict]] = {}
-        rows = self.allocations_data or [] # populate from csv
-        for a in rows:
-            # Build the same join key as resources: prefer ID, else normalized person name
-            rid    = _first(a, ["NTID", "Network ID", "Employee ID", "resource_ntid", "resource_guid"])
-            person = _first(a, ["resource_id", "Resource", "Name", "Employee", "Assignee", "resource_name"])
-            key    = (rid or _norm_name(person)).lower()
-    
-            # Normalize the fields we display (map snake_case columns too)
-            trial  = _first(a, ["Trial", "Study", "Study Name", "Study Title", "trial_id"]) or "Unknown Trial"
-            phase  = _first(a, ["Phase"])  # blank if your CSV doesn’t have it
-            alloc  = _first(a, ["Allocation", "Percent", "FTE%", "Pct", "allocation_percentage"])
-
-            if alloc and not str(alloc).endswith("%"):
-                alloc = f"{alloc}%"
-                wh = _first(a, ["Weekly Hours", "Hours", "WeeklyHours", "weekly_hours"])
-
-            if wh and not str(wh).endswith("h"):
-                wh = f"{wh}h"
-                start = _first(a, ["Start Date", "Start", "From", "Begin", "start_date"])
-                end = _first(a, ["End Date", "End", "To", "Finish", "end_date"])
-    
-            row = {"trial": trial, "phase": phase, "allocation": alloc,
-                   "weekly_hours": wh, "start_date": start, "end_date": end}
-            
-            groups.setdefault(key, []).append(row)
-        return groups
+        return self._roster_rows
 
     @rx.var
     def selected_resource(self) -> dict:
         """Safe dict with the fields we display in the header of the panel"""
-        for r in self.normalized_resources:
+        for r in self._roster_rows:
             if r["name"] == self.selected_resource_name:
                 return r
         # fallback with a synthetic join_key
@@ -898,17 +900,114 @@ class AppState(rx.State):
                 "role": "", 
                 "department": "",
                 "type": "",
-                "join_key": _norm_name(self.selected_resource_name)}
+                "availability": "",
+                "join_key": norm_name(self.selected_resource_name)}
 
     @rx.var
     def selected_resource_allocations(self) -> list[dict]:
-        key = self.selected_resource.get("join_key") or _norm_name(self.selected_resource_name)
-        return self._allocations_grouped.get(key, [])
+        """The selected person's bookings, looked up by join_key (prefer ID, else normalized name)."""
+        key = self.selected_resource.get("join_key") or norm_name(self.selected_resource_name)
+        R = self._records
+        ix = R.allocation_index
+        return [{"trial": a.trial_id or "Unknown Trial",
+                 "phase": "",  # no Phase column in the allocation extract
+                 "allocation": _fmt_num(a.allocation_percentage, "%") if R.has_pct else "",
+                 "weekly_hours": _fmt_num(a.weekly_hours, "h") if R.has_hours else "",
+                 "start_date": a.start_date,
+                 "end_date": a.end_date}
+                for a in ix.take(self._active(ix.person_rows(key)))]
 
     @rx.var
     def has_selected_allocations(self) -> bool:
         return len(self.selected_resource_allocations) > 0
 
+    # ---------- Cross-portfolio load (app.model.utilization) ----------
+    @property
+    def _selected_person(self) -> int:
+        """The selected person's utilization-matrix row (their roster row; -1 = none)."""
+        name = self.selected_resource_name
+        return self._records.resource_keys.get(name) if name else -1
+
+    @rx.var
+    def selected_resource_load(self) -> dict[str, str]:
+        """Allocations panel KPIs: capacity, load, hours and trials across the whole portfolio."""
+        U, k = self._utilization, self._selected_person
+        if not 0 <= k < len(U):
+            return {"capacity": "—", "load": "—", "hours": "—", "trials": "0"}
+        cells = slice(U.indptr[k], U.indptr[k + 1])
+        return {"capacity": _fmt_num(round(float(U.capacity[k]), 1), "h") if U.capacity[k] else "—",
+                "load": f"{int(round(U.load[k]))}%",
+                "hours": _fmt_num(round(float(U.hours[cells].sum()), 1), "h"),
+                "trials": str(cells.stop - cells.start)}
+
+    @rx.var
+    def selected_resource_overallocated(self) -> bool:
+        U, k = self._utilization, self._selected_person
+        return bool(0 <= k < len(U) and U.load[k] > OVERALLOCATED)
+
+    @rx.var
+    def selected_resource_contributors(self) -> list[dict]:
+        """Trials behind the selected person's load, largest share first."""
+        k = self._selected_person
+        return [{"trial": t or "Unknown Trial", "pct": f"{int(round(p))}%", "hours": _fmt_num(round(h, 1), "h")}
+                for t, h, p in self._utilization.contributors(k)]
+
+    @rx.var
+    def selected_resource_weekly(self) -> list[dict]:
+        """The selected person's load % per week against that week's capacity, first booked week to last.
+
+        `load` is None in weeks without capacity (outside availability or on
+        leave); `away` marks those that still have hours booked.
+        """
+        C, k = self._records.capacity_calendar, self._selected_person
+        if not 0 <= k < len(C.people):
+            return []
+        weeks = C.booked_span(k)
+        if weeks.stop == weeks.start:
+            return []
+        return [{"week": w.strftime("%b %d, %Y"), "load": None if np.isnan(u) else int(round(u)), "away": bool(a)}
+                for w, u, a in zip(C.weeks[weeks].tolist(), C.load(weeks, k).tolist(),
+                                   C.away(weeks, k).tolist())]
+
+    @rx.var
+    def selected_resource_peak(self) -> str:
+        """Highest weekly load and the week it falls in ("" when nothing is dated)."""
+        weekly = [w for w in self.selected_resource_weekly if w["load"] is not None]
+        if not weekly:
+            return ""
+        top = max(weekly, key=lambda w: w["load"])
+        return f"Peak {top['load']}% (week of {top['week']})"
+
+    @rx.var
+    def selected_resource_away(self) -> str:
+        """How many weeks have hours booked while the person is unavailable ("" when none)."""
+        n = sum(w["away"] for w in self.selected_resource_weekly)
+        if not n:
+            return ""
+        return f"{n} booked week{'s' if n != 1 else ''} outside availability"
+
+    @rx.var
+    def selected_resource_conflicts(self) -> list[dict]:
+        """The selected person's over-capacity windows, with the trials booked in each."""
+        C, k = self._records.conflicts, self._selected_person
+        windows = C.of(k)
+        if self.as_of:
+            d = np.datetime64(self.as_of, "D").astype(np.int64)
+            windows = [w for w in windows if C.start[w] <= d <= C.end[w]]
+        out = []
+        for w in windows:
+            start, end = iso(C.start[w]), iso(C.end[w])
+            out.append({"range": f"{start or 'open'} to {end or 'ongoing'}",
+                        "peak": f"{int(round(C.peak[w]))}%",
+                        "trials": ", ".join(f"{t or 'Unknown Trial'} ({int(round(v))}%)"
+                                            for t, v in C.contributors(w))})
+        return out
+
+    @rx.var
+    def overallocated_people(self) -> int:
+        """People booked above 100% across all their trials."""
+        return self._utilization.overallocated
+
     # ---------- Footer ----------
     user_initials: str = "RA"
     user_name: str = "Rafael Abbariao"
@@ -0,0 +1,1190 @@
+"""Benchmarks for the data layer against a synthetic, production-sized portfolio.
+
+Usage: python scripts/bench.py {load,stream,records,index,keys,roster,facets,search,identity,global,rollup,rollups,matrix,weekly,asof,conflicts,capacity,simulate} [--allocations N]
+
+  load     CSV parse vs memory-mapped compiled snapshot, cold start of the Dataset
+  stream   whole-file vs chunked Allocation.csv ingestion: peak memory, rows/s
+  records  row dicts vs typed slot records: bytes per row, metric recompute time
+  index    per-trial / per-person allocation lookup: full scan vs hash index
+  keys     roster-wide hours/capacity join: string keys + dicts vs int32 FKs + bincount
+  roster   Resources page at 50k people: per-recompute regex keys vs keys precomputed at load
+  facets   Portfolio filters at 20k trials: one list pass per filter vs facet bitset AND + counts
+  search   trial search box at 5k-80k trials: per-keystroke scan vs n-gram index (ranked, typo-tolerant)
+  identity name/id aliases -> roster rows: phonetic blocking index vs all-pairs matching
+  global   command palette over every table: per-keystroke scans vs the shared index, incremental rebuild
+  rollup   trial card for a trial with thousands of allocations: a pass per var vs one loop vs bincount
+  rollups  every trial's card precomputed at snapshot build: serial vs process pool, then select = lookup
+  matrix   cross-portfolio load: per-query scans vs the sparse people x trials matrix
+  weekly   time-phased load: per-query date scans vs difference arrays + prefix sums over weeks
+  asof     bookings active on a day / in a window: date-string scans vs the interval tree
+  conflicts over-capacity windows: a day-by-day scan per person vs one sweep over start/end events
+  capacity weekly load against availability: a pass per person vs one division over the roster
+  simulate capacity-planning Monte Carlo: a loop per scenario vs vectorized batches, serial vs process pool
+
+The synthetic portfolio uses the same columns as app/data/ (invented values)
+and is written to a temp directory, never into the repo.
+"""
+import argparse
+import os
+import re
+import pathlib
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from app.model import snapshot  # noqa: E402
+from app.model.compiled import compile_snapshot  # noqa: E402
+from app.model.loader import SPECS, frame_bytes, project, read_table, safe_csv, to_records  # noqa: E402
+from app.model.indexes import AllocationIndex  # noqa: E402
+from app.model.records import RecordSet, compile_allocations  # noqa: E402
+from app.model.stream import stream_table  # noqa: E402
+
+PHASES = ["Phase I", "Phase II", "Phase III", "Phase IV"]
+AREAS = ["Oncology", "Vaccines", "Internal Medicine", "Inflammation & Immunology", "Neurology"]
+STATUSES = ["Planning", "Ongoing", "Completed", "On Hold"]
+PRIORITIES = ["High", "Medium", "Low"]
+TYPES = ["FTE", "FSP", "Contractor"]
+ROLES = ["Clinical Research Associate", "Data Manager", "Biostatistician",
+         "Clinical Trial Manager", "Regulatory Affairs Specialist", "Medical Monitor"]
+DEPTS = ["Clinical Operations", "Data Management", "Biostatistics", "Regulatory", "Medical Affairs"]
+
+
+FIRST = ["Avery", "Blake", "Casey", "Devon", "Emery", "Finley", "Harper", "Jordan", "Kendall",
+         "Logan", "Morgan", "Parker", "Quinn", "Riley", "Rowan", "Sawyer", "Skyler", "Taylor"]
+
+
+def _surname(i: int) -> str:
+    s = ""
+    while True:
+        i, r = divmod(i, 26)
+        s = "abcdefghijklmnopqrstuvwxyz"[r] + s
+        if not i:
+            return "Mc" + s.capitalize()
+
+
+def synth_portfolio(out: pathlib.Path, trials: int = 2_000, resources: int = 5_000,
+                    allocations: int = 1_000_000, seed: int = 7) -> pathlib.Path:
+    """Write Trial/Resource/Allocation.csv with the sample files' columns."""
+    rng = np.random.default_rng(seed)
+    out.mkdir(parents=True, exist_ok=True)
+    pids = np.array([f"SYN-{i:05d}" for i in range(trials)])
+    starts = pd.Timestamp("2023-01-01") + pd.to_timedelta(rng.integers(0, 900, trials), unit="D")
+    ends = starts + pd.to_timedelta(rng.integers(90, 1200, trials), unit="D")
+    pd.DataFrame({
+        "title": [f"Synthetic Study {i}" for i in range(trials)],
+        "protocol_id": pids,
+        "phase": rng.choice(PHASES, trials),
+        "therapeutic_area": rng.choice(AREAS, trials),
+        "status": rng.choice(STATUSES, trials),
+        "start_date": starts.strftime("%Y-%m-%d"),
+        "end_date": ends.strftime("%Y-%m-%d"),
+        "budget": rng.integers(500_000, 9_000_000, trials),
+        "fte_allocation": rng.integers(30, 80, trials),
+        "fsp_allocation": rng.integers(20, 70, trials),
+        "priority": rng.choice(PRIORITIES, trials),
+        "sites_count": rng.integers(1, 60, trials),
+        "enrollment_target": rng.integers(20, 600, trials),
+        "id": [f"t{i:08x}" for i in range(trials)],
+    }).to_csv(out / "Trial.csv", index=False)
+
+    # letters only: join keys normalize names (digits and punctuation dropped)
+    names = np.array([f"{FIRST[i % len(FIRST)]} {_surname(i // len(FIRST))}" for i in range(resources)])
+    avail = pd.Timestamp("2022-07-01") + pd.to_timedelta(rng.integers(0, 600, resources), unit="D")
+    pd.DataFrame({
+        "name": names,
+        "type": rng.choice(TYPES, resources, p=[0.6, 0.3, 0.1]),
+        "role": rng.choice(ROLES, resources),
+        "hourly_rate": rng.integers(60, 200, resources),
+        "capacity": rng.choice([32, 35, 40], resources),
+        "skills": "[]",
+        "availability_start": avail.strftime("%Y-%m-%d"),
+        "availability_end": (avail + pd.to_timedelta(rng.integers(365, 1200, resources), unit="D")).strftime("%Y-%m-%d"),
+        "department": rng.choice(DEPTS, resources),
+        "utilization": rng.integers(10, 120, resources),
+        "id": [f"r{i:08x}" for i in range(resources)],
+    }).to_csv(out / "Resource.csv", index=False)
+
+    a_start = pd.Timestamp("2023-01-01") + pd.to_timedelta(rng.integers(0, 900, allocations), unit="D")
+    a_end = a_start + pd.to_timedelta(rng.integers(30, 700, allocations), unit="D")
+    pd.DataFrame({
+        "trial_id": pids[rng.integers(0, trials, allocations)],
+        "resource_id": names[rng.integers(0, resources, allocations)],
+        "allocation_percentage": rng.integers(5, 60, allocations),
+        "weekly_hours": rng.integers(2, 24, allocations),
+        "start_date": a_start.strftime("%Y-%m-%d"),
+        "end_date": a_end.strftime("%Y-%m-%d"),
+        "notes": "Randomly assigned by system.",
+        "id": np.char.add("a", np.arange(allocations).astype(str)),
+    }).to_csv(out / "Allocation.csv", index=False)
+    return out
+
+
+def _origins(ds: snapshot.Dataset) -> dict:
+    return {name: st["origin"] for name, st in ds.load_stats.items()}
+
+
+PORTFOLIO = ("trials", "resources", "allocations")
+
+
+def _cold_load(data_dir: pathlib.Path) -> tuple[float, snapshot.Dataset]:
+    snapshot._files.clear()
+    snapshot._digests.clear()
+    t0 = time.perf_counter()
+    ds = snapshot.load_dataset(data_dir, preload=PORTFOLIO)
+    return time.perf_counter() - t0, ds
+
+
+def bench_load(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        d = synth_portfolio(pathlib.Path(tmp), allocations=args.allocations)
+        mb = (d / "Allocation.csv").stat().st_size / 1e6
+        print(f"Allocation.csv: {args.allocations:,} rows, {mb:.1f} MB")
+
+        csv_s, ds = _cold_load(d)
+        print(f"CSV parse        {csv_s:7.3f}s   origins={_origins(ds)}")
+        for name, st in ds.load_stats.items():
+            print(f"  {name:<12} {st['rows']:>9,} rows  {st['bytes_read'] / 1e6:7.1f} MB read  "
+                  f"parse {st['parse_s']:.3f}s  coerce {st['coerce_s']:.3f}s  "
+                  f"{st['resident_bytes'] / 1e6:6.1f} MB resident")
+
+        t0 = time.perf_counter()
+        compile_snapshot(d)
+        print(f"compile          {time.perf_counter() - t0:7.3f}s   (one-off)")
+
+        mm_s, ds = _cold_load(d)
+        print(f"compiled (mmap)  {mm_s:7.3f}s   origins={_origins(ds)}")
+        print(f"speed-up         {csv_s / max(mm_s, 1e-9):7.1f}x")
+
+
+def _peak(fn, retained=False):
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    out = fn()
+    secs = time.perf_counter() - t0
+    kept, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return (out, secs, peak, kept) if retained else (out, secs, peak)
+
+
+def bench_stream(args):
+    spec = SPECS["allocations"]
+    with tempfile.TemporaryDirectory() as tmp:
+        d = synth_portfolio(pathlib.Path(tmp), allocations=args.allocations)
+        print(f"Allocation.csv: {args.allocations:,} rows, {(d / spec.file).stat().st_size / 1e6:.1f} MB")
+
+        df, secs, peak = _peak(lambda: project(safe_csv(d, spec.file, spec), spec))
+        print(f"whole file   {secs:6.2f}s  peak {peak / 1e6:7.1f} MB  final {frame_bytes(df) / 1e6:6.1f} MB")
+        del df
+
+        def _progress(rows, done, total, elapsed):
+            print(f"  ... {rows:>10,} rows  {100 * done / total:5.1f}%  {rows / elapsed:,.0f} rows/s")
+
+        df, secs, peak = _peak(lambda: stream_table(d, "allocations", args.chunksize, _progress))
+        print(f"streamed     {secs:6.2f}s  peak {peak / 1e6:7.1f} MB  final {frame_bytes(df) / 1e6:6.1f} MB")
+
+
+def _dict_pass(allocs, resources, pid):
+    """Per-trial hours by role over row dicts, coercing per row (the pre-records vars)."""
+    caps = {str(r.get("name")): float(r.get("capacity") or 0.0) for r in resources if "capacity" in r}
+    roles = {str(r.get("name")): (str(r.get("role")) or "Unknown") for r in resources if "role" in r}
+    has_hours = any("weekly_hours" in a for a in allocs)
+    by_role: dict = {}
+    for a in allocs:
+        if str(a.get("trial_id", "")) != str(pid):
+            continue
+        rid = str(a.get("resource_id", "")).strip()
+        if has_hours and "weekly_hours" in a:
+            val = float(a.get("weekly_hours") or 0.0)
+        else:
+            val = float(a.get("allocation_percentage") or 0.0) / 100.0 * caps.get(rid, 0.0)
+        role = roles.get(rid, "Unknown")
+        by_role[role] = by_role.get(role, 0.0) + val
+    return by_role
+
+
+def _record_pass(recs, pid):
+    """The same aggregation over typed records (no per-row coercion)."""
+    caps = {r.name: r.capacity for r in recs.resources}
+    roles = {r.name: r.role or "Unknown" for r in recs.resources}
+    has_hours = recs.has_hours
+    by_role: dict = {}
+    for a in recs.allocations:
+        if a.trial_id != pid:
+            continue
+        val = (a.weekly_hours if has_hours
+               else a.allocation_percentage / 100.0 * caps.get(a.resource_id, 0.0))
+        role = roles.get(a.resource_id, "Unknown")
+        by_role[role] = by_role.get(role, 0.0) + val
+    return by_role
+
+
+def _best(fn, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def bench_records(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        d = synth_portfolio(pathlib.Path(tmp), allocations=args.allocations)
+        frames = {name: read_table(d, name) for name in PORTFOLIO}
+        n = len(frames["allocations"])
+
+        rows, secs, peak, kept = _peak(lambda: to_records("allocations", frames["allocations"]), True)
+        print(f"row dicts     build {secs:6.2f}s  {kept / n:6.1f} B/row held  {peak / n:6.1f} B/row peak")
+        del rows
+        _, secs, peak, kept = _peak(lambda: compile_allocations(frames["allocations"]), True)
+        print(f"slot records  build {secs:6.2f}s  {kept / n:6.1f} B/row held  {peak / n:6.1f} B/row peak")
+
+        ds = snapshot.Dataset("bench", frames=frames)
+        recs = RecordSet(ds, PORTFOLIO)
+        allocs = to_records("allocations", frames["allocations"])
+        resources = to_records("resources", frames["resources"])
+        pid = recs.trials[0].protocol_id
+        assert _dict_pass(allocs, resources, pid) == _record_pass(recs, pid)
+        t_dict = _best(lambda: _dict_pass(allocs, resources, pid))
+        t_rec = _best(lambda: _record_pass(recs, pid))
+        print(f"recompute (hours by role, one trial, {n:,} allocations)")
+        print(f"  dicts   {t_dict * 1000:8.1f} ms")
+        print(f"  records {t_rec * 1000:8.1f} ms   {t_dict / max(t_rec, 1e-9):.1f}x")
+
+
+def bench_index(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        d = synth_portfolio(pathlib.Path(tmp), allocations=args.allocations)
+        allocs = compile_allocations(read_table(d, "allocations"))
+        t0 = time.perf_counter()
+        ix = AllocationIndex(allocs)
+        print(f"index build   {(time.perf_counter() - t0) * 1000:8.1f} ms  ({len(allocs):,} allocations, once per snapshot)")
+
+        pid = allocs[0].trial_id
+        rid = allocs[0].resource_id
+        assert [a for a in allocs if a.trial_id == pid] == ix.take(ix.trial_rows(pid))
+        for label, scan, hit in (
+            ("trial lookup ", lambda: [a for a in allocs if a.trial_id == pid],
+             lambda: ix.take(ix.trial_rows(pid))),
+            ("person lookup", lambda: [a for a in allocs if a.resource_id == rid],
+             lambda: ix.take(ix.resource_rows(rid))),
+        ):
+            t_scan, t_hit = _best(scan), _best(hit)
+            print(f"{label} scan {t_scan * 1000:8.2f} ms   index {t_hit * 1000:7.3f} ms   "
+                  f"{t_scan / max(t_hit, 1e-9):,.0f}x")
+
+
+def bench_keys(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        d = synth_portfolio(pathlib.Path(tmp), allocations=args.allocations)
+        snapshot._files.clear()
+        snapshot._digests.clear()
+        ds = snapshot.load_dataset(d, preload=PORTFOLIO)
+        allocs, people = ds.allocation_records, ds.resource_records
+        t0 = time.perf_counter()
+        fk = ds.allocation_resource_keys
+        print(f"intern + encode  {(time.perf_counter() - t0) * 1000:7.1f} ms  (once per snapshot)")
+        hours = ds.frame("allocations")["weekly_hours"].to_numpy(dtype=float)
+        caps = np.array([r.capacity for r in people])
+
+        def by_string():
+            cap = {r.name: r.capacity for r in people}
+            tot: dict = {}
+            for a in allocs:
+                if a.resource_id in cap:
+                    tot[a.resource_id] = tot.get(a.resource_id, 0.0) + a.weekly_hours
+            return {k: 100.0 * v / cap[k] for k, v in tot.items() if cap[k]}
+
+        def by_key():
+            ok = fk >= 0
+            tot = np.bincount(fk[ok], weights=hours[ok], minlength=len(people))
+            return np.divide(100.0 * tot, caps, out=np.zeros_like(tot), where=caps > 0)
+
+        a, b = by_string(), by_key()
+        assert all(abs(b[ds.resource_keys.get(k)] - v) < 1e-6 for k, v in a.items())
+        t_str, t_key = _best(by_string), _best(by_key)
+        print(f"utilization per person over {len(allocs):,} allocations")
+        print(f"  string join   {t_str * 1000:8.1f} ms")
+        print(f"  int32 FKs     {t_key * 1000:8.1f} ms   {t_str / max(t_key, 1e-9):.0f}x")
+        print(f"  key column    {fk.nbytes / 1e6:6.1f} MB int32 vs "
+              f"{len(allocs) * 8 / 1e6:6.1f} MB of str pointers (+ the strings)")
+
+
+def _legacy_norm_name(s: str) -> str:
+    s = (s or "").strip().lower()
+    s = re.sub(r"^(dr|mr|mrs|ms|miss|prof)\.?\s+", "", s)
+    s = re.sub(r"[^a-z\s]", "", s)
+    return re.sub(r"\s+", " ", s)
+
+
+def _legacy_roster(people) -> list:
+    """normalized_resources as it was: a regex join key per row per recompute."""
+    return [{"name": r.name, "role": r.role, "type": r.type, "department": r.department,
+             "join_key": (r.ntid or _legacy_norm_name(r.name)).lower()} for r in people]
+
+
+def _legacy_search(rows, q) -> list:
+    return [r for r in rows if q in r["name"].lower() or q in r["role"].lower()
+            or q in r["type"].lower() or q in r["department"].lower()]
+
+
+def _legacy_grouped(allocs) -> dict:
+    groups: dict = {}
+    for a in allocs:
+        key = (a.ntid or _legacy_norm_name(a.resource_id)).lower()
+        groups.setdefault(key, []).append({"trial": a.trial_id, "start_date": a.start_date})
+    return groups
+
+
+def bench_roster(args):
+    import logging
+    logging.disable(logging.WARNING)
+    from app.state import AppState, RESOURCES_TABLES, _roster
+
+    with tempfile.TemporaryDirectory() as tmp:
+        d = synth_portfolio(pathlib.Path(tmp), resources=args.people, allocations=args.allocations)
+        snapshot._files.clear()
+        snapshot._digests.clear()
+        t0 = time.perf_counter()
+        ds = snapshot.load_dataset(d, preload=RESOURCES_TABLES)
+        people, allocs = ds.resource_records, ds.allocation_records
+        ds.allocation_index
+        print(f"load + records + index  {time.perf_counter() - t0:6.2f}s  "
+              f"({len(people):,} people, {len(allocs):,} allocations; keys normalized once here)")
+        snapshot._install(ds)
+
+        s = AppState(_reflex_internal_init=True)
+        s.data_version, s.data_tables = ds.version, list(RESOURCES_TABLES)
+        var = lambda name: AppState.computed_vars[name].fget
+
+        t_old = _best(lambda: _legacy_roster(people), 3)
+        t_build = _best(lambda: (_roster.cache_clear(), var("normalized_resources")(s)), 3)
+        t_new = _best(lambda: var("normalized_resources")(s), 3)
+        print(f"normalized_resources   regex {t_old * 1000:7.1f} ms per recompute   "
+              f"precomputed {t_build * 1000:7.1f} ms once per snapshot, then {t_new * 1000:.3f} ms")
+
+        rows = var("normalized_resources")(s)
+        s.normalized_resources   # warm the cached var the search reads
+        legacy_rows = _legacy_roster(people)
+        for q in ("a", "av", "ave", "avery", "avery mcb", "data man"):
+            s.resources_search = q
+            assert len(var("filtered_resources")(s)) == len(_legacy_search(legacy_rows, q))
+            t_old = _best(lambda: _legacy_search(legacy_rows, q), 3)
+            t_new = _best(lambda: var("filtered_resources")(s), 3)
+            print(f"  keystroke {q!r:<12} lower() x4 {t_old * 1000:6.1f} ms   "
+                  f"index {t_new * 1000:6.1f} ms")
+
+        s.selected_resource_name = rows[len(rows) // 2]["name"]
+        t_old = _best(lambda: _legacy_grouped(allocs), 3)
+        t_new = _best(lambda: var("selected_resource_allocations")(s), 3)
+        print(f"open allocations panel  group all {t_old * 1000:7.1f} ms   "
+              f"join-key index {t_new * 1000:7.3f} ms")
+
+
+def _legacy_filter(trials, f: dict) -> list:
+    """filtered_trials as it was: a copy, then one list pass per active filter."""
+    data = list(trials)
+    for k in ("status", "phase", "priority", "therapeutic_area"):
+        if f[k] != "All":
+            data = [t for t in data if getattr(t, k) == f[k]]
+    return data
+
+
+def _legacy_counts(trials, f: dict) -> dict:
+    """Per-option counts the scanning way: re-filter with each option swapped in."""
+    out = {}
+    for k in ("status", "phase", "priority", "therapeutic_area"):
+        opts = sorted({getattr(t, k) for t in trials} - {""})
+        out[k] = {v: len(_legacy_filter(trials, {**f, k: v})) for v in opts}
+    return out
+
+
+def bench_facets(args):
+    import logging
+    logging.disable(logging.WARNING)
+    from app.state import AppState
+
+    with tempfile.TemporaryDirectory() as tmp:
+        d = synth_portfolio(pathlib.Path(tmp), trials=args.trials, resources=100, allocations=100)
+        snapshot._files.clear()
+        snapshot._digests.clear()
+        ds = snapshot.load_dataset(d, preload=("trials",))
+        trials = ds.trial_records
+        t0 = time.perf_counter()
+        fx = ds.trial_facets
+        print(f"{len(trials):,} trials: facet bitsets built in {(time.perf_counter() - t0) * 1000:.1f} ms "
+              f"(once per snapshot)")
+        snapshot._install(ds)
+        s = AppState(_reflex_internal_init=True)
+        s.data_version, s.data_tables = ds.version, ["trials"]
+        var = lambda name: AppState.computed_vars[name].fget
+
+        combos = [{}, {"status": "Ongoing"}, {"status": "Ongoing", "phase": "Phase II"},
+                  {"status": "Ongoing", "phase": "Phase II", "priority": "High",
+                   "therapeutic_area": "Oncology"}]
+        for c in combos:
+            f = {"status": "All", "phase": "All", "priority": "All", "therapeutic_area": "All", **c}
+            s.status, s.phase, s.priority, s.therapeutic_area = (
+                f["status"], f["phase"], f["priority"], f["therapeutic_area"])
+            got = var("_filtered_trial_records")(s)
+            assert got == _legacy_filter(trials, f)
+            counts = var("_facet_counts")(s)
+            assert all(counts[k][v] == n for k, vs in _legacy_counts(trials, f).items() for v, n in vs.items())
+            t_old = _best(lambda: _legacy_filter(trials, f))
+            t_cnt = _best(lambda: _legacy_counts(trials, f), 3)
+            t_mask = _best(lambda: (fx.mask(f, fx.all), fx.counts(f, fx.all)))
+            t_new = _best(lambda: var("_filtered_trial_records")(s))
+            label = " + ".join(c.values()) or "no filter"
+            print(f"  {label:<40} {len(got):>6,} rows   list passes {t_old * 1000:6.2f} ms "
+                  f"(+ counts by scan {t_cnt * 1000:7.1f} ms)   "
+                  f"bitset AND + all counts {t_mask * 1000:5.3f} ms   with row list {t_new * 1000:6.2f} ms")
+
+
+TITLE_WORDS = ["Efficacy", "Safety", "Dose-Ranging", "Extension", "Registry", "Adaptive",
+               "Randomized", "Open-Label", "Biomarker", "Pediatric", "Long-Term", "Pivotal"]
+INDICATIONS = ["Lung Cancer", "Breast Cancer", "Heart Failure", "Hypertension", "Psoriasis",
+               "Alzheimer's", "Migraine", "Influenza", "RSV", "Lupus", "Crohn's", "Asthma"]
+
+
+def _synth_trials(n: int, rng) -> list[dict]:
+    return [{"id": f"t{i:08x}", "protocol_id": f"{AREAS[i % 5][:3].upper()}-{2020 + i % 6}-{i:05d}",
+             "title": f"{rng.choice(TITLE_WORDS)} {rng.choice(INDICATIONS)} "
+                      f"{rng.choice(PHASES)} Study {i % 997}",
+             "therapeutic_area": AREAS[i % 5], "status": rng.choice(STATUSES),
+             "phase": rng.choice(PHASES), "priority": rng.choice(PRIORITIES)} for i in range(n)]
+
+
+def bench_search(args):
+    from app.model.records import compile_trials
+    from app.model.search import TrigramIndex
+
+    rng = np.random.default_rng(7)
+    queries = ("c", "ca", "can", "cancer", "breast can", "onc-2023", "alzheimers", "migrane", "xyzzy")
+    for n in args.trials:
+        trials = compile_trials(_synth_trials(n, rng))
+        docs = [f"{t.protocol_lc}\x1f{t.title_lc}\x1f{t.therapeutic_area.lower()}" for t in trials]
+        t0 = time.perf_counter()
+        ix = TrigramIndex(docs)
+        print(f"{n:>7,} trials: index built in {time.perf_counter() - t0:5.2f}s (once per snapshot)")
+        for q in queries:
+            # what every keystroke used to do (title/protocol only, table order)
+            scan = lambda: [t for t in trials
+                            if q in str(t.row.get("title", "")).lower() or q in str(t.row.get("protocol_id", "")).lower()]
+            t_scan, t_ix = _best(scan, 3), _best(lambda: ix.search(q), 3)
+            print(f"    {q!r:<13} scan {t_scan * 1000:7.2f} ms   index {t_ix * 1000:6.2f} ms  "
+                  f"{len(scan()):>7,} / {len(ix.search(q)):>7,} hits")
+
+
+def bench_global(args):
+    import logging
+    logging.disable(logging.WARNING)
+    from app.model import search
+
+    queries = ("s", "sy", "syn", "synthetic", "syn-0042", "data man", "xyzzy")
+    with tempfile.TemporaryDirectory() as tmp:
+        d = synth_portfolio(pathlib.Path(tmp), trials=args.trials, resources=args.people,
+                            allocations=args.allocations)
+        snapshot._files.clear()
+        snapshot._digests.clear()
+        ds = snapshot.load_dataset(d, preload=snapshot.TABLES)
+        t0 = time.perf_counter()
+        ix = ds.search_index
+        ix.search("warm")
+        t_full = time.perf_counter() - t0
+        sizes = {t: len(ix.segment(t)) for t in search.SEARCH_FIELDS}
+        print(f"index over {sum(sizes.values()):,} rows built in {t_full:5.2f}s  {sizes}")
+
+        docs = {t: search._documents(ds.frame(t), f) for t, f in search.SEARCH_FIELDS.items()}
+        for q in queries:
+            # what a scan-per-keystroke palette would do, even with the text prepared
+            scan = lambda: {t: [i for i, doc in enumerate(ds_docs) if q in doc] for t, ds_docs in docs.items()}
+            t_scan = _best(scan, 3)
+            t_pal = _best(lambda: ix.palette(q, budget_ms=10_000), 3)
+            out = ix.palette(q, budget_ms=args.budget)
+            hits = sum(g["total"] for g in out["groups"].values())
+            print(f"    {q!r:<12} scan {t_scan * 1000:7.1f} ms   palette {t_pal * 1000:6.2f} ms  "
+                  f"{hits:>7,} hits; in a {args.budget} ms budget: skipped {out['skipped'] or '-'}")
+
+        # a new extract where only Trial.csv changed
+        trials = pd.read_csv(d / "Trial.csv")
+        trials.loc[0, "title"] = "Synthetic Study renamed"
+        trials.to_csv(d / "Trial.csv", index=False)
+        snapshot._files.clear()
+        ds2 = snapshot.load_dataset(d)
+        t0 = time.perf_counter()
+        ds2.search_index.search("renamed")
+        print(f"reload with Trial.csv changed: re-indexed in {time.perf_counter() - t0:5.2f}s "
+              f"(full build {t_full:5.2f}s) -> {len(ds2.search_index.search('renamed')['trials'])} hit")
+
+
+def _legacy_util(R, allocs, fk) -> list:
+    people, has_hours, has_pct = R.resources, R.has_hours, R.has_pct
+    by_res: dict = {}
+    for a, k in zip(allocs, fk):
+        rid = k if k >= 0 else a.resource_id
+        if rid not in by_res:
+            by_res[rid] = {"hours": 0.0, "pct": 0.0, "k": k}
+        by_res[rid]["hours"] += a.weekly_hours
+        by_res[rid]["pct"] += a.allocation_percentage
+    utils = []
+    for agg in by_res.values():
+        k = agg["k"]
+        cap = people[k].capacity if k >= 0 else 0.0
+        u = agg["hours"] / cap * 100.0 if has_hours and cap > 0 else agg["pct"] if has_pct else 0.0
+        utils.append(max(0.0, u))
+    return utils
+
+
+def _legacy_types(R, ids) -> dict:
+    fte = fsp = 0
+    seen: set = set()
+    for rid in ids:
+        k = R.resource_keys.get(rid)
+        if k >= 0 and k in seen:
+            continue
+        seen.add(k)
+        if k >= 0 and R.resources[k].type_uc == "FTE":
+            fte += 1
+        else:
+            fsp += 1
+    return {"fte": fte, "fsp": fsp}
+
+
+def _legacy_breakdown(R, pid, selected, attr) -> list:
+    people, has_hours, has_pct = R.resources, R.has_hours, R.has_pct
+    hours_by_res: dict = {}
+    res_key: dict = {}
+    ix = R.allocation_index
+    rows = ix.trial_rows(pid)
+    for a, k in zip(ix.take(rows), R.allocation_resource_keys[rows].tolist()):
+        rid = a.resource_id
+        if rid not in selected:
+            continue
+        val = a.weekly_hours if has_hours else (
+            a.allocation_percentage / 100.0 * people[k].capacity if has_pct and k >= 0 else 0.0)
+        if val:
+            rid = k if k >= 0 else rid
+            hours_by_res[rid] = hours_by_res.get(rid, 0.0) + val
+            res_key[rid] = k
+    by: dict = {}
+    for rid, hrs in hours_by_res.items():
+        k = res_key[rid]
+        label = (getattr(people[k], attr) or "Unknown") if k >= 0 else "Unknown"
+        by[label] = by.get(label, 0.0) + hrs
+    return sorted(({"label": k, "hours": v} for k, v in by.items()), key=lambda x: x["hours"], reverse=True)
+
+
+def _legacy_detail(R, pid, selected) -> list:
+    people, has_hours, has_pct = R.resources, R.has_hours, R.has_pct
+    agg: dict = {}
+    ix = R.allocation_index
+    rows = ix.trial_rows(pid)
+    for a, k in zip(ix.take(rows), R.allocation_resource_keys[rows].tolist()):
+        rid = a.resource_id
+        if rid not in selected:
+            continue
+        r = people[k] if k >= 0 else None
+        row = agg.get(k if k >= 0 else rid) or agg.setdefault(k if k >= 0 else rid, {
+            "name": r.name if r else "", "role": r.role if r else "", "type": r.type if r else "",
+            "department": r.department if r else "", "capacity": r.capacity if r else 0.0,
+            "weekly_hours": 0.0, "allocation_pct": 0.0, "start_date": None, "end_date": None})
+        if has_hours:
+            row["weekly_hours"] += a.weekly_hours
+        if has_pct:
+            row["allocation_pct"] += a.allocation_percentage
+        s, e = a.start_date or None, a.end_date or None
+        if s:
+            row["start_date"] = min(filter(None, [row["start_date"], s])) if row["start_date"] else s
+        if e:
+            row["end_date"] = max(filter(None, [row["end_date"], e])) if row["end_date"] else e
+    out = []
+    for row in agg.values():
+        hours, pct = row["weekly_hours"], row["allocation_pct"]
+        if hours == 0.0 and pct and row["capacity"]:
+            hours = pct / 100.0 * float(row["capacity"])
+        if pct == 0.0 and hours and row["capacity"]:
+            pct = hours / float(row["capacity"]) * 100.0
+        out.append({**row, "weekly_hours": round(hours or 0.0, 1), "allocation_pct": int(round(pct or 0.0)),
+                    "date_range": f"{row['start_date'] or ''} - {row['end_date'] or ''}"
+                    if (row["start_date"] or row["end_date"]) else ""})
+    out.sort(key=lambda x: x["allocation_pct"], reverse=True)
+    return out
+
+
+def _legacy_card(R, rows, pid) -> dict:
+    """The trial card as its vars computed it: each var re-walks the trial's rows."""
+    allocs = R.allocation_index.take(rows)
+    fk = R.allocation_resource_keys[[a.idx for a in allocs]].tolist()
+    ids = sorted({a.resource_id for a in allocs})
+    selected = set(ids)
+    return {"people": len({k if k >= 0 else a.resource_id for a, k in zip(allocs, fk)}),
+            "utils": _legacy_util(R, allocs, fk), "type_counts": _legacy_types(R, ids),
+            "by_role": _legacy_breakdown(R, pid, selected, "role"),
+            "by_department": _legacy_breakdown(R, pid, selected, "department"),
+            "detail": _legacy_detail(R, pid, selected)}
+
+
+def bench_rollup(args):
+    from app.model.rollup import rollup_trial, rollup_trial_loop
+
+    with tempfile.TemporaryDirectory() as tmp:
+        d = synth_portfolio(pathlib.Path(tmp), trials=args.trials, resources=args.people,
+                            allocations=args.allocations)
+        snapshot._files.clear()
+        snapshot._digests.clear()
+        ds = snapshot.load_dataset(d, preload=PORTFOLIO)
+        R = ds.records(PORTFOLIO)
+        ix = R.allocation_index
+        pid = R.trials[0].protocol_id
+        rows = ix.trial_rows(pid)
+        print(f"trial {pid}: {len(rows):,} allocations, {len(ix.allocations):,} in the portfolio")
+
+        old, new = _legacy_card(R, rows, pid), rollup_trial(R, rows, rows)
+        assert old == {"people": new.people, "utils": new.utils, "type_counts": new.type_counts,
+                       "by_role": new.by_role, "by_department": new.by_department,
+                       "detail": new.detail_rows()}
+        t_old = _best(lambda: _legacy_card(R, rows, pid), 5)
+        t_loop = _best(lambda: rollup_trial_loop(R, rows, rows), 5)
+        t_new = _best(lambda: rollup_trial(R, rows, rows), 5)
+        print(f"select trial   pass per var {t_old * 1000:7.1f} ms   one loop {t_loop * 1000:7.1f} ms   "
+              f"vectorized {t_new * 1000:7.1f} ms   {t_old / max(t_new, 1e-9):.1f}x")
+
+
+def bench_rollups(args):
+    from app.model.rollup import rollup_portfolio, rollup_trial, selections
+
+    with tempfile.TemporaryDirectory() as tmp:
+        d = synth_portfolio(pathlib.Path(tmp), trials=args.trials, resources=args.people,
+                            allocations=args.allocations)
+        snapshot._files.clear()
+        snapshot._digests.clear()
+        ds = snapshot.load_dataset(d, preload=PORTFOLIO)
+        R = ds.records(PORTFOLIO)
+        t0 = time.perf_counter()
+        todo = selections(R)
+        R.allocation_arrays, R.resource_arrays, R.allocation_resource_keys
+        print(f"{len(todo):,} trials, {len(R.allocations):,} allocations "
+              f"(index + arrays {time.perf_counter() - t0:5.2f}s, shared by both)")
+
+        t0 = time.perf_counter()
+        serial = rollup_portfolio(R, workers=1)
+        t_serial = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        pooled = rollup_portfolio(R, workers=args.workers)
+        t_pool = time.perf_counter() - t0
+        key = todo[len(todo) // 2][0]
+        assert serial.keys() == pooled.keys() and serial[key].detail == pooled[key].detail
+        print(f"build all rollups   serial {t_serial:6.2f}s   {args.workers} processes {t_pool:6.2f}s   "
+              f"{t_serial / t_pool:.1f}x on {os.cpu_count()} cores")
+
+        _, rows, card = todo[len(todo) // 2]
+        t_roll = _best(lambda: rollup_trial(R, rows, card), 5)
+        t_hit = _best(lambda: pooled.get(key), 5)
+        print(f"select trial        rollup {t_roll * 1000:7.2f} ms   lookup {t_hit * 1e6:6.2f} us")
+
+
+def _legacy_loads(R) -> dict:
+    """Load % per person: one pass over every allocation, then hours / capacity."""
+    people, hours = R.resources, {}
+    for a, k in zip(R.allocations, R.allocation_resource_keys.tolist()):
+        if k >= 0:
+            hours[k] = hours.get(k, 0.0) + a.weekly_hours
+    return {k: h / people[k].capacity * 100.0 for k, h in hours.items() if people[k].capacity > 0}
+
+
+def _legacy_by(allocs, attr) -> list:
+    """(key, hours) per distinct `attr` of some allocation records, most hours first."""
+    out: dict = {}
+    for a in allocs:
+        out[getattr(a, attr)] = out.get(getattr(a, attr), 0.0) + a.weekly_hours
+    return sorted(out.items(), key=lambda x: x[1], reverse=True)
+
+
+def bench_matrix(args):
+    from app.model.utilization import UtilizationMatrix
+
+    with tempfile.TemporaryDirectory() as tmp:
+        d = synth_portfolio(pathlib.Path(tmp), trials=args.trials, resources=args.people,
+                            allocations=args.allocations)
+        snapshot._files.clear()
+        snapshot._digests.clear()
+        ds = snapshot.load_dataset(d, preload=PORTFOLIO)
+        R = ds.records(PORTFOLIO)
+        ix = R.allocation_index
+        R.allocation_arrays, R.resource_arrays, R.allocation_resource_keys
+        t0 = time.perf_counter()
+        U = UtilizationMatrix(R)
+        t_build = time.perf_counter() - t0
+        print(f"{len(U):,} people x {len(U.trials):,} trials, {len(U.hours):,} cells from "
+              f"{len(R.allocations):,} allocations   built in {t_build * 1000:.0f} ms")
+
+        old = _legacy_loads(R)
+        assert np.allclose(list(old.values()), U.load[list(old)])
+        t_old = _best(lambda: sorted(_legacy_loads(R).items(), key=lambda x: x[1], reverse=True)[:10], 3)
+        t_new = _best(lambda: U.top_overallocated(10), 5)
+        print(f"top 10 over 100%   scan {t_old * 1000:8.1f} ms   matrix {t_new * 1e6:7.1f} us   "
+              f"({U.overallocated:,} people over)")
+
+        k = U.top_overallocated(1)[0][0]
+        key = ds.resource_keys.keys[k]
+        t_old = _best(lambda: _legacy_by(ix.take(ix.person_rows(key)), "trial_id"), 5)
+        t_new = _best(lambda: U.contributors(k), 5)
+        print(f"person's trials    rows  {t_old * 1e6:8.1f} us   matrix {t_new * 1e6:7.1f} us   "
+              f"({len(U.contributors(k))} trials)")
+
+        pid = R.trials[0].protocol_id
+        t_old = _best(lambda: _legacy_by(ix.take(ix.trial_rows(pid)), "resource_id"), 5)
+        t_new = _best(lambda: U.staffing(pid), 5)
+        print(f"trial's staffing   rows  {t_old * 1e6:8.1f} us   matrix {t_new * 1e6:7.1f} us   "
+              f"({len(U.staffing(pid))} people)")
+
+
+def _legacy_weekly(allocs, weeks) -> np.ndarray:
+    """Hours per week: every allocation checked against every week it might cover."""
+    from datetime import date
+    from app.model.timeline import monday
+    out = np.zeros(len(weeks))
+    for a in allocs:
+        try:
+            s, e = monday(date.fromisoformat(a.start_date[:10])), monday(date.fromisoformat(a.end_date[:10]))
+        except ValueError:   # blank or not a date
+            continue
+        for i, w in enumerate(weeks):
+            if s <= w <= e:
+                out[i] += a.weekly_hours
+    return out
+
+
+def bench_weekly(args):
+    import datetime
+    from app.model.intervals import parse_days
+    from app.model.timeline import WeeklyLoad, monday
+    from app.model.utilization import UtilizationMatrix
+
+    with tempfile.TemporaryDirectory() as tmp:
+        d = synth_portfolio(pathlib.Path(tmp), trials=args.trials, resources=args.people,
+                            allocations=args.allocations)
+        snapshot._files.clear()
+        snapshot._digests.clear()
+        ds = snapshot.load_dataset(d, preload=PORTFOLIO)
+        R = ds.records(PORTFOLIO)
+        ix = R.allocation_index
+        U = UtilizationMatrix(R)
+        t0 = time.perf_counter()
+        T = WeeklyLoad(R, U)
+        t_build = time.perf_counter() - t0
+        print(f"{len(T.people):,} people and {len(T.trials):,} trials x {len(T.weeks)} weeks from "
+              f"{len(R.allocations):,} allocations   built in {t_build * 1000:.0f} ms")
+
+        q3 = T.span(datetime.date(2024, 7, 1), datetime.date(2024, 9, 30))
+        k = int(U.order[0])
+        rows = ix.take(ix.person_rows(ds.resource_keys.keys[k]))
+        assert np.allclose(_legacy_weekly(rows, T.weeks[q3]), T.hours[k, q3])
+        t_old = _best(lambda: _legacy_weekly(ix.take(ix.person_rows(ds.resource_keys.keys[k])), T.weeks[q3]), 5)
+        t_new = _best(lambda: T.load(k, q3), 5)
+        print(f"person in Q3       scan {t_old * 1000:8.2f} ms   slice {t_new * 1e6:7.1f} us")
+
+        pid = R.trials[0].protocol_id
+        c = int(np.flatnonzero(T.trials == pid)[0])
+        assert np.allclose(_legacy_weekly(ix.take(ix.trial_rows(pid)), T.weeks), T.demand[c])
+        t_old = _best(lambda: _legacy_weekly(ix.take(ix.trial_rows(pid)), T.weeks), 3)
+        t_new = _best(lambda: T.demand[c], 5)
+        print(f"trial demand       scan {t_old * 1000:8.2f} ms   slice {t_new * 1e6:7.1f} us   "
+              f"({len(T.weeks)} weeks)")
+
+        depts = np.concatenate([R.resource_arrays.department,
+                                np.full(len(T.people) - len(R.resources), "Unknown", dtype=object)])
+        labels, grouped = T.by(depts)
+        fk = R.allocation_resource_keys
+        dept = pd.factorize(np.where(fk >= 0, R.resource_arrays.department[np.maximum(fk, 0)], "Unknown"))
+        start = monday(parse_days([a.start_date for a in R.allocations]))
+        end = monday(parse_days([a.end_date for a in R.allocations]))
+        hours = R.allocation_arrays.weekly_hours
+
+        def scan():
+            # one masked pass over every allocation per week
+            out = np.zeros((len(dept[1]), len(T.weeks)))
+            for i, w in enumerate(T.weeks):
+                on = (start <= w) & (w <= end)
+                out[:, i] = np.bincount(dept[0][on], hours[on], len(dept[1]))
+            return out
+        want = scan()
+        got = grouped[[list(labels).index(d) for d in dept[1]]]
+        assert np.allclose(want, got)
+        t_old = _best(scan, 1)
+        t_new = _best(lambda: T.by(depts), 3)
+        print(f"dept hours / week  scan {t_old * 1000:8.1f} ms   group {t_new * 1000:7.1f} ms")
+
+
+def bench_asof(args):
+    from app.model.intervals import IntervalIndex, NAT, parse_days
+    from app.model.columnar import take
+
+    with tempfile.TemporaryDirectory() as tmp:
+        d = synth_portfolio(pathlib.Path(tmp), trials=args.trials, resources=args.people,
+                            allocations=args.allocations)
+        snapshot._files.clear()
+        snapshot._digests.clear()
+        ds = snapshot.load_dataset(d, preload=PORTFOLIO)
+        R = ds.records(PORTFOLIO)
+        A = R.allocation_arrays
+        allocs = R.allocations
+        start, end = take(parse_days(A.starts), A.start, NAT), take(parse_days(A.ends), A.end, NAT)
+        t0 = time.perf_counter()
+        tree = IntervalIndex(start, end)
+        print(f"{len(tree):,} dated allocations   tree of {len(tree.center):,} nodes built in "
+              f"{(time.perf_counter() - t0) * 1000:.0f} ms")
+
+        for day in ("2023-02-01", "2024-06-01", "2025-09-01"):
+            want = [a.idx for a in allocs if a.start_date <= day <= a.end_date]
+            assert want == tree.at(day).tolist()
+            t_old = _best(lambda: [a for a in allocs if a.start_date <= day <= a.end_date], 1)
+            t_mask = _best(lambda: np.flatnonzero((start <= np.datetime64(day)) & (end >= np.datetime64(day))), 3)
+            t_new = _best(lambda: tree.at(day), 5)
+            print(f"booked on {day}   strings {t_old * 1000:7.1f} ms   mask {t_mask * 1000:6.2f} ms   "
+                  f"tree {t_new * 1000:6.2f} ms   ({len(want):,} rows)")
+
+        lo, hi = np.datetime64("2024-07-01"), np.datetime64("2024-07-14")
+        want = np.flatnonzero((start <= hi) & (end >= lo))
+        assert np.array_equal(want, tree.overlapping(lo, hi))
+        t_mask = _best(lambda: np.flatnonzero((start <= hi) & (end >= lo)), 3)
+        t_new = _best(lambda: tree.overlapping(lo, hi), 5)
+        print(f"overlap 2 weeks       mask {t_mask * 1000:6.2f} ms   tree {t_new * 1000:6.2f} ms   "
+              f"({len(want):,} rows)")
+
+
+def _legacy_windows(share, s, e) -> list:
+    """One person's over-capacity windows: their load summed on every day of the calendar."""
+    from app.model.conflicts import BASIS
+    from app.model.rollup import OVERALLOCATED
+    days = np.arange(s.min(), e.max() + 1)
+    load = np.array([share[(s <= d) & (e >= d)].sum() for d in days])
+    over = load > OVERALLOCATED * BASIS
+    edges = np.flatnonzero(np.diff(np.r_[0, over.astype(np.int8), 0]))
+    return [(int(days[a]), int(days[b - 1])) for a, b in zip(edges[::2], edges[1::2])]
+
+
+def bench_conflicts(args):
+    from app.model.conflicts import Conflicts
+
+    with tempfile.TemporaryDirectory() as tmp:
+        d = synth_portfolio(pathlib.Path(tmp), trials=args.trials, resources=args.people,
+                            allocations=args.allocations)
+        snapshot._files.clear()
+        snapshot._digests.clear()
+        ds = snapshot.load_dataset(d, preload=PORTFOLIO)
+        R = ds.records(PORTFOLIO)
+        U = ds.utilization
+        t0 = time.perf_counter()
+        C = Conflicts(R, U)
+        t_build = time.perf_counter() - t0
+        print(f"{len(R.allocations):,} allocations   {len(C):,} windows for {C.in_conflict:,} people   "
+              f"swept in {t_build * 1000:.0f} ms")
+
+        # the scan needs every day of each person's calendar: time it on a sample and scale up
+        people = np.unique(C._row_person[C._share > 0])
+        sample = people[np.linspace(0, len(people) - 1, min(args.sample, len(people))).astype(int)]
+        by = C._by_person
+
+        def scan():
+            out = []
+            for k in sample.tolist():
+                rows = by[C._row_ptr[k]:C._row_ptr[k + 1]]
+                rows = rows[C._share[rows] > 0]
+                out.append(_legacy_windows(C._share[rows], C._s[rows], C._e[rows]))
+            return out
+        t0 = time.perf_counter()
+        want = scan()
+        t_old = (time.perf_counter() - t0) / len(sample) * len(people)
+        got = [list(zip(C.start[C.of(k)].tolist(), C.end[C.of(k)].tolist())) for k in sample.tolist()]
+        assert want == got
+        print(f"every window       daily scan ~{t_old:8.1f} s (est. from {len(sample)} people)   "
+              f"sweep {t_build * 1000:7.0f} ms")
+
+        day = "2024-06-01"
+        t_new = _best(lambda: C.on(day), 5)
+        print(f"in conflict on {day}   {t_new * 1000:6.2f} ms   ({len(np.unique(C.person[C.on(day)])):,} people)")
+
+
+def bench_capacity(args):
+    from app.model.timeline import monday
+
+    with tempfile.TemporaryDirectory() as tmp:
+        d = synth_portfolio(pathlib.Path(tmp), trials=args.trials, resources=args.people,
+                            allocations=args.allocations)
+        snapshot._files.clear()
+        snapshot._digests.clear()
+        ds = snapshot.load_dataset(d, preload=PORTFOLIO)
+        T = ds.timeline
+        t0 = time.perf_counter()
+        C = ds.capacity_calendar
+        print(f"{len(C.people):,} people x {len(C.weeks)} weeks   calendar built in "
+              f"{(time.perf_counter() - t0) * 1000:.0f} ms "
+              f"({int(np.count_nonzero(C.away())):,} booked weeks outside availability)")
+
+        R = ds.resource_arrays
+        frm, to = monday(R.available_from), monday(R.available_to)
+
+        def per_person():
+            # each person's weeks masked by their availability, then divided
+            out = np.full(T.hours.shape, np.nan)
+            for k in range(len(R.capacity)):
+                on = (T.weeks >= frm[k]) & (T.weeks <= to[k])
+                if R.capacity[k] > 0:
+                    out[k, on] = T.hours[k, on] / R.capacity[k] * 100.0
+            return out
+        want = per_person()
+        assert np.allclose(want, C.load(), equal_nan=True)
+        t_old = _best(per_person, 1)
+        t_new = _best(C.load, 3)
+        print(f"roster load / week  per person {t_old * 1000:8.1f} ms   vectorized {t_new * 1000:7.1f} ms")
+
+
+def _legacy_scenario(P, seed) -> np.ndarray:
+    """One scenario's months x roles demand, trial by trial and month by month."""
+    from app.model import simulation as sim
+    rng = np.random.default_rng(seed)
+    T = len(P.sites)
+    # the same draws, in the same order, as a one-scenario batch
+    ramp = P.ramp * rng.uniform(*sim.RAMP_SPREAD, (1, T))
+    start = P.start + P.planning * rng.uniform(0.0, sim.PLANNING_SLIP, (1, T))
+    pace = rng.lognormal(-sim.ENROLL_SIGMA ** 2 / 2, sim.ENROLL_SIGMA, (1, T))
+    demand = P.baseline.copy()
+    for t in range(T):
+        r, s = float(ramp[0, t]), float(start[0, t])
+
+        def active(x):
+            x = max(x, 0.0)
+            return x * x / (2 * r) if x <= r else x - r / 2
+        need = P.on_plan[t] / pace[0, t]
+        done = (2 * r * need) ** 0.5 if need <= r / 2 else need + r / 2
+        if not P.enrolls[t]:
+            done = P.planned[t]
+        for m in range(sim.HORIZON):
+            k0, k1 = m - s, m + 1 - s
+            a = active(min(k1, done)) - active(min(k0, done))
+            a += sim.CLOSEOUT_LOAD * max(min(k1, done + sim.CLOSEOUT_MONTHS) - max(k0, done), 0.0)
+            demand[m] += a * P.weights[t]
+    return demand
+
+
+def bench_simulate(args):
+    from app.model import simulation as sim
+
+    with tempfile.TemporaryDirectory() as tmp:
+        d = synth_portfolio(pathlib.Path(tmp), trials=args.trials, resources=args.people,
+                            allocations=args.allocations)
+        snapshot._files.clear()
+        snapshot._digests.clear()
+        ds = snapshot.load_dataset(d, preload=PORTFOLIO)
+        R = ds.records(PORTFOLIO)
+        first = np.datetime64(args.start, "M")
+        t0 = time.perf_counter()
+        # per-snapshot structures the app builds anyway (keys, column arrays)
+        R.allocation_resource_keys, R.allocation_trial_keys, R.allocation_arrays, R.resource_arrays
+        print(f"snapshot keys and arrays in {(time.perf_counter() - t0) * 1000:.0f} ms (shared)")
+        t0 = time.perf_counter()
+        P = sim.PlanInputs(R, first)
+        print(f"{P.trials:,} trials to simulate x {len(P.roles)} roles x {sim.HORIZON} months   "
+              f"inputs in {(time.perf_counter() - t0) * 1000:.0f} ms")
+
+        seeds = np.random.SeedSequence(0).spawn(args.sample)
+        for s in seeds[:3]:
+            assert np.allclose(_legacy_scenario(P, s), sim._batch(P, s, 1)[1])
+        t0 = time.perf_counter()
+        for s in seeds:
+            _legacy_scenario(P, s)
+        t_old = (time.perf_counter() - t0) / len(seeds) * args.scenarios
+        print(f"loop per scenario  ~{t_old:8.1f} s for {args.scenarios:,} scenarios (est. from {len(seeds)})")
+
+        t0 = time.perf_counter()
+        F = sim.simulate(R, first, args.scenarios, workers=1)
+        t_serial = time.perf_counter() - t0
+        print(f"vectorized         {t_serial:9.2f} s serial")
+        if args.workers > 1:
+            t0 = time.perf_counter()
+            G = sim.simulate(R, first, args.scenarios, workers=args.workers)
+            t_pool = time.perf_counter() - t0
+            assert np.array_equal(F.shortage, G.shortage) and np.allclose(F.demand, G.demand)
+            print(f"process pool       {t_pool:9.2f} s with {args.workers} workers ({os.cpu_count()} cores)   "
+                  f"same result as serial")
+        for role, month, p in F.flagged()[:5]:
+            print(f"  short from {month}: {role} (up to {p:.0%} of scenarios)")
+
+
+SYLLABLES = ["bar", "cor", "dan", "el", "fen", "gar", "hol", "ist", "kal", "lor",
+             "mar", "nov", "or", "pel", "ros", "san", "tor", "val", "wen", "zel"]
+
+
+def _person(i: int) -> tuple[str, str]:
+    """(first, last) - varied enough that surnames do not all share one block."""
+    j, f = divmod(i, len(FIRST))
+    syl = [SYLLABLES[(j // len(SYLLABLES) ** k) % len(SYLLABLES)] for k in range(3)]
+    return FIRST[f], "".join(syl).capitalize()
+
+
+def _typo(word: str, rng) -> str:
+    i = int(rng.integers(1, len(word)))
+    return word[:i] + "aeiou"[int(rng.integers(0, 5))] + word[i + 1:]
+
+
+def _aliases(n_people: int, n: int, rng) -> list[tuple[str, int]]:
+    """(alias, true roster row or -1) in the shapes extracts actually use."""
+    out = []
+    for _ in range(n):
+        i = int(rng.integers(0, n_people))
+        first, last = _person(i)
+        kind = int(rng.integers(0, 6))
+        if kind == 0:
+            out.append((f"{first} {last}", i))
+        elif kind == 1:
+            out.append((f"Dr. {first} {last}", i))
+        elif kind == 2:
+            out.append((f"{last}, {first}", i))
+        elif kind == 3:
+            out.append((f"{first} {_typo(last, rng)}", i))
+        elif kind == 4:
+            out.append((f"R{i:06d}", i))
+        else:
+            out.append((f"{first} Unlisted{i}", -1))
+    return out
+
+
+def bench_identity(args):
+    from app.model.identity import IdentityResolver, person_name
+
+    rng = np.random.default_rng(7)
+    names = [" ".join(_person(i)) for i in range(args.people)]
+    ids = [f"R{i:06d}" for i in range(args.people)]
+    t0 = time.perf_counter()
+    res = IdentityResolver(names, ids, [""] * args.people)
+    print(f"roster of {args.people:,}: exact maps + blocking index {time.perf_counter() - t0:6.2f}s")
+
+    aliases = list(dict(_aliases(args.people, args.aliases, rng)).items())
+    t0 = time.perf_counter()
+    got = res.resolve_all(a for a, _ in aliases)
+    secs = time.perf_counter() - t0
+    right = sum(got[a] == i for a, i in aliases)
+    wrong = sum(got[a] >= 0 and got[a] != i for a, i in aliases)
+    print(f"resolve {len(aliases):,} distinct aliases  blocked {secs:6.2f}s   "
+          f"{right / len(aliases):.1%} correct, {wrong} wrong matches")
+    for m in ("id", "name", "normalized", "fuzzy", "ambiguous", "unresolved"):
+        print(f"  {m:<11} {sum(v == m for v in res.methods.values()):>8,}")
+
+    # all-pairs: every leftover alias scored against every roster name
+    from difflib import SequenceMatcher
+    fuzzy = [a for a, m in res.methods.items() if m in ("fuzzy", "ambiguous", "unresolved")]
+    sample = fuzzy[:args.sample]
+    norms = [person_name(n) for n in names]
+
+    def all_pairs():
+        for a in sample:
+            m = SequenceMatcher(b=person_name(a), autojunk=False)
+            for n in norms:
+                m.set_seq1(n)
+                m.ratio()
+
+    t_all = _best(all_pairs, 1) * len(fuzzy) / max(len(sample), 1)
+    print(f"fuzzy pass for {len(fuzzy):,} aliases  all-pairs ~{t_all:8.1f}s (extrapolated from "
+          f"{len(sample)})   blocked {secs:6.2f}s total")
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("load", help="CSV vs compiled snapshot cold start")
+    p.add_argument("--allocations", type=int, default=1_000_000)
+    p.set_defaults(fn=bench_load)
+    p = sub.add_parser("stream", help="whole-file vs chunked Allocation.csv ingestion")
+    p.add_argument("--allocations", type=int, default=1_000_000)
+    p.add_argument("--chunksize", type=int, default=250_000)
+    p.set_defaults(fn=bench_stream)
+    p = sub.add_parser("records", help="row dicts vs typed slot records")
+    p.add_argument("--allocations", type=int, default=500_000)
+    p.set_defaults(fn=bench_records)
+    p = sub.add_parser("index", help="allocation lookups: full scan vs hash index")
+    p.add_argument("--allocations", type=int, default=500_000)
+    p.set_defaults(fn=bench_index)
+    p = sub.add_parser("keys", help="string vs integer-key roster join")
+    p.add_argument("--allocations", type=int, default=500_000)
+    p.set_defaults(fn=bench_keys)
+    p = sub.add_parser("roster", help="Resources page vars at 50k people")
+    p.add_argument("--people", type=int, default=50_000)
+    p.add_argument("--allocations", type=int, default=250_000)
+    p.set_defaults(fn=bench_roster)
+    p = sub.add_parser("facets", help="Portfolio filters: list passes vs facet bitsets")
+    p.add_argument("--trials", type=int, default=20_000)
+    p.set_defaults(fn=bench_facets)
+    p = sub.add_parser("search", help="trial search box: per-keystroke scan vs n-gram index")
+    p.add_argument("--trials", type=int, nargs="+", default=[5_000, 20_000, 80_000])
+    p.set_defaults(fn=bench_search)
+    p = sub.add_parser("identity", help="alias resolution: blocking index vs all pairs")
+    p.add_argument("--people", type=int, default=50_000)
+    p.add_argument("--aliases", type=int, default=100_000)
+    p.add_argument("--sample", type=int, default=20)
+    p.set_defaults(fn=bench_identity)
+    p = sub.add_parser("global", help="command palette: scans vs the shared index")
+    p.add_argument("--trials", type=int, default=20_000)
+    p.add_argument("--people", type=int, default=50_000)
+    p.add_argument("--allocations", type=int, default=250_000)
+    p.add_argument("--budget", type=int, default=50)
+    p.set_defaults(fn=bench_global)
+    p = sub.add_parser("rollup", help="trial card: a pass per var vs one shared rollup")
+    p.add_argument("--trials", type=int, default=20)
+    p.add_argument("--people", type=int, default=2_000)
+    p.add_argument("--allocations", type=int, default=100_000)
+    p.set_defaults(fn=bench_rollup)
+    p = sub.add_parser("rollups", help="every trial's rollup at snapshot build: serial vs process pool")
+    p.add_argument("--trials", type=int, default=2_000)
+    p.add_argument("--people", type=int, default=5_000)
+    p.add_argument("--allocations", type=int, default=1_000_000)
+    p.add_argument("--workers", type=int, default=4)
+    p.set_defaults(fn=bench_rollups)
+    p = sub.add_parser("matrix", help="cross-portfolio load: scans vs the people x trials matrix")
+    p.add_argument("--trials", type=int, default=2_000)
+    p.add_argument("--people", type=int, default=20_000)
+    p.add_argument("--allocations", type=int, default=200_000)
+    p.set_defaults(fn=bench_matrix)
+    p = sub.add_parser("weekly", help="time-phased load: date scans vs prefix sums over weeks")
+    p.add_argument("--trials", type=int, default=2_000)
+    p.add_argument("--people", type=int, default=20_000)
+    p.add_argument("--allocations", type=int, default=1_000_000)
+    p.set_defaults(fn=bench_weekly)
+    p = sub.add_parser("asof", help="active bookings on a day: scans vs the interval tree")
+    p.add_argument("--trials", type=int, default=2_000)
+    p.add_argument("--people", type=int, default=20_000)
+    p.add_argument("--allocations", type=int, default=1_000_000)
+    p.set_defaults(fn=bench_asof)
+    p = sub.add_parser("conflicts", help="over-capacity windows: daily scans vs one event sweep")
+    p.add_argument("--trials", type=int, default=2_000)
+    p.add_argument("--people", type=int, default=20_000)
+    p.add_argument("--allocations", type=int, default=1_000_000)
+    p.add_argument("--sample", type=int, default=200)
+    p.set_defaults(fn=bench_conflicts)
+    p = sub.add_parser("capacity", help="weekly load vs availability: per-person passes vs one division")
+    p.add_argument("--trials", type=int, default=2_000)
+    p.add_argument("--people", type=int, default=20_000)
+    p.add_argument("--allocations", type=int, default=1_000_000)
+    p.set_defaults(fn=bench_capacity)
+    p = sub.add_parser("simulate", help="capacity-planning Monte Carlo: scenario loop vs batches vs pool")
+    p.add_argument("--trials", type=int, default=2_000)
+    p.add_argument("--people", type=int, default=20_000)
+    p.add_argument("--allocations", type=int, default=200_000)
+    p.add_argument("--scenarios", type=int, default=2_000)
+    p.add_argument("--sample", type=int, default=10)
+    p.add_argument("--start", default="2024-06")
+    p.add_argument("--workers", type=int, default=4)
+    p.set_defaults(fn=bench_simulate)
+    args = ap.parse_args()
+    args.fn(args)
+
+
+if __name__ == "__main__":
+    main()
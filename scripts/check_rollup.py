@@ -0,0 +1,84 @@
+"""Parity check: vectorized trial rollup vs the record loop, on every trial.
+
+Usage: python scripts/check_rollup.py [DATA_DIR] [--synthetic]   (default: app/data)
+Runs `rollup_trial` and `rollup_trial_loop` (app/model/rollup.py) for every
+trial, selected by trial id and by protocol id, and fails on the first field
+that differs. It repeats with allocation and roster columns dropped, so each
+step of the precedence is exercised: weekly_hours, then allocation % x
+capacity, then the roster's utilization. --synthetic checks a generated
+portfolio (scripts/bench.py) instead.
+"""
+import sys
+import time
+import pathlib
+import tempfile
+
+import numpy as np
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from app.model import snapshot  # noqa: E402
+from app.model.rollup import rollup_trial, rollup_trial_loop  # noqa: E402
+
+TABLES = ("trials", "resources", "allocations")
+FIELDS = ("rows", "weekly_hours", "people", "utils", "avg_util", "overallocated", "underutilized",
+          "type_counts", "by_role", "by_department", "detail")
+# (label, allocation columns dropped, roster columns dropped)
+VARIANTS = (
+    ("as extracted", (), ()),
+    ("no weekly_hours", ("weekly_hours",), ()),
+    ("no hours or percent", ("weekly_hours", "allocation_percentage"), ()),
+    ("no capacity", ("weekly_hours",), ("capacity",)),
+    ("no roster types/roles", (), ("type", "role", "department")),
+)
+
+
+def _selections(R):
+    """(selected id, trial rows, card rows) as AppState builds them."""
+    ix = R.allocation_index
+    for t in R.trials:
+        rows = [ix.trial_rows(t.id)] if t.id else []
+        if t.protocol_id:
+            rows += [ix.protocol_rows(t.protocol_id), ix.trial_rows(t.protocol_id)]
+        rows = np.unique(np.concatenate(rows)) if rows else np.empty(0, dtype=np.int64)
+        for sel in filter(None, (t.id, t.protocol_id)):
+            yield sel, rows, ix.trial_rows(sel)
+
+
+def check(base: snapshot.Dataset) -> int:
+    checked = 0
+    for label, drop_alloc, drop_roster in VARIANTS:
+        frames = {name: base.frame(name) for name in TABLES}
+        frames["allocations"] = frames["allocations"].drop(columns=list(drop_alloc), errors="ignore")
+        frames["resources"] = frames["resources"].drop(columns=list(drop_roster), errors="ignore")
+        ds = snapshot.Dataset(f"check-{label}", data_dir=base.data_dir, digests=base.digests, frames=frames)
+        R = ds.records(TABLES)
+        t_loop = t_vec = 0.0
+        for sel, rows, card in _selections(R):
+            t0 = time.perf_counter()
+            want = rollup_trial_loop(R, rows, card)
+            t1 = time.perf_counter()
+            got = rollup_trial(R, rows, card)
+            t_loop, t_vec = t_loop + t1 - t0, t_vec + time.perf_counter() - t1
+            for f in FIELDS:
+                if getattr(got, f) != getattr(want, f):
+                    raise SystemExit(f"✗ {label}: trial {sel!r} differs in {f}:\n"
+                                     f"  loop       {getattr(want, f)!r}\n  vectorized {getattr(got, f)!r}")
+            checked += 1
+        print(f"✓ {label:<22} {len(R.trials):>6,} trials   loop {t_loop:6.3f}s   vectorized {t_vec:6.3f}s")
+    return checked
+
+
+if __name__ == "__main__":
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    if "--synthetic" in sys.argv:
+        sys.path.insert(0, str(ROOT / "scripts"))
+        from bench import synth_portfolio
+        with tempfile.TemporaryDirectory() as tmp:
+            d = synth_portfolio(pathlib.Path(tmp), trials=200, resources=2_000, allocations=100_000)
+            n = check(snapshot.load_dataset(d, preload=TABLES))
+    else:
+        n = check(snapshot.load_dataset(pathlib.Path(args[0]) if args else ROOT / "app" / "data",
+                                        preload=TABLES))
+    print(f"✓ {n:,} selections identical")
@@ -0,0 +1,61 @@
+"""Parity check: TrigramIndex vs a plain substring scan, including degenerate corpora.
+
+Usage: python scripts/check_search.py
+Builds a TrigramIndex (app/model/search.py) over corpora too short to have
+every gram length - single characters, blank documents, nothing at all - and
+over a generated one, then checks `contains` against `q in doc` for every
+query up to four characters drawn from the corpus (plus a few absent ones)
+and that `search` never fails.
+"""
+import sys
+import pathlib
+
+import numpy as np
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from app.model.search import TrigramIndex  # noqa: E402
+
+CORPORA = {
+    "empty": [],
+    "one char": ["a"],
+    "blank": [""],
+    "all blank": ["", "", ""],
+    "no trigrams": ["ab", "c"],
+    "short and blank": ["", "a", "ab", "", "abc"],
+}
+
+
+def _generated(n: int = 500, seed: int = 0) -> list[str]:
+    rng = np.random.default_rng(seed)
+    letters = np.array(list("abcde -"))
+    return ["".join(rng.choice(letters, rng.integers(0, 12))) for _ in range(n)]
+
+
+def _queries(docs: list[str]) -> set[str]:
+    out = {"", "z", "zz", "zzz", "zzzz", "a", "ab", "abc", "abcd"}
+    for d in docs:
+        for k in range(1, 5):
+            out.update(d[i:i + k] for i in range(len(d) - k + 1))
+    return out
+
+
+def check(label: str, docs: list[str]) -> int:
+    ix = TrigramIndex(docs)
+    queries = sorted(_queries(docs))
+    for q in queries:
+        want = [i for i, d in enumerate(docs) if q and q in d]
+        got = ix.contains(q).tolist()
+        if got != want:
+            raise SystemExit(f"✗ {label}: contains({q!r}) = {got}, expected {want}")
+        if sorted(ix.search(q).tolist()[:len(want)]) != want:
+            raise SystemExit(f"✗ {label}: search({q!r}) does not rank the substring matches first")
+    print(f"✓ {label:<16} {len(docs):>5,} docs  {len(queries):>5,} queries")
+    return len(queries)
+
+
+if __name__ == "__main__":
+    n = sum(check(label, docs) for label, docs in CORPORA.items())
+    n += check("generated", _generated())
+    print(f"✓ {n:,} queries identical")
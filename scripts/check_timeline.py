@@ -0,0 +1,78 @@
+"""Parity check: the weekly timeline vs a per-booking loop, with outlier dates.
+
+Usage: python scripts/check_timeline.py [DATA_DIR]   (default: app/data)
+Adds bookings dated 1900 and 2205 - a mistyped year - to the extract, builds
+the weekly timeline (app/model/timeline.py) and checks that the week axis
+stays within WINDOW_WEEKS of this week, and that every person's hours per
+week match a loop that adds each booking to the weeks it covers, clipped to
+the axis.
+"""
+import sys
+import pathlib
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from app.model import snapshot  # noqa: E402
+from app.model.timeline import WINDOW_WEEKS, monday  # noqa: E402
+from app.model.utilization import person_rows  # noqa: E402
+
+TABLES = ("resources", "allocations")
+OUTLIERS = (("2205-01-01", "2205-06-30"), ("1900-01-01", "1900-03-01"),
+            ("1900-01-01", "2205-01-01"), ("", "2205-01-01"), ("1900-01-01", ""))
+
+
+def _day(label: str):
+    try:
+        return monday(date.fromisoformat(label))
+    except ValueError:
+        return None
+
+
+def _week(weeks: np.ndarray, d) -> int:
+    """Index of the week of `d`, clipped to the axis."""
+    return int(np.clip((d - weeks[0]).astype(np.int64) // 7, 0, len(weeks) - 1))
+
+
+def check(base: snapshot.Dataset) -> int:
+    alloc = base.frame("allocations")
+    extra = alloc.iloc[[0] * len(OUTLIERS)].copy()
+    extra["start_date"] = [s for s, _ in OUTLIERS]
+    extra["end_date"] = [e for _, e in OUTLIERS]
+    frames = {"resources": base.frame("resources"),
+              "allocations": pd.concat([alloc, extra], ignore_index=True)}
+    ds = snapshot.Dataset("check-outliers", data_dir=base.data_dir, digests=base.digests, frames=frames)
+    R = ds.records(TABLES)
+    T = R.timeline
+    w, today = len(T.weeks), monday(date.today())
+    if T.weeks[0] < today - WINDOW_WEEKS * 7 or T.weeks[-1] > today + WINDOW_WEEKS * 7:
+        raise SystemExit(f"✗ week axis {T.weeks[0]} .. {T.weeks[-1]} is outside the window")
+
+    row, _ = person_rows(R)
+    want = np.zeros_like(T.hours)
+    hours = frames["allocations"]["weekly_hours"].to_numpy(dtype=float)
+    for k, (s, e) in enumerate(zip(frames["allocations"]["start_date"], frames["allocations"]["end_date"])):
+        s, e = _day(str(s)), _day(str(e))
+        if s is None and e is None or s is not None and e is not None and e < s:
+            continue
+        a = 0 if s is None else _week(T.weeks, s)
+        b = w - 1 if e is None else _week(T.weeks, e)
+        want[row[k], a:b + 1] += hours[k]
+    if not np.allclose(T.hours, want):
+        bad = np.argwhere(~np.isclose(T.hours, want))[0]
+        raise SystemExit(f"✗ {T.people[bad[0]]!r} week {T.weeks[bad[1]]}: "
+                         f"{T.hours[tuple(bad)]} vs {want[tuple(bad)]}")
+    print(f"✓ {len(row):,} bookings ({len(OUTLIERS)} outliers) over {w:,} weeks "
+          f"{T.weeks[0]} .. {T.weeks[-1]}")
+    return len(row)
+
+
+if __name__ == "__main__":
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    n = check(snapshot.load_dataset(pathlib.Path(args[0]) if args else ROOT / "app" / "data",
+                                    preload=TABLES))
+    print(f"✓ {n:,} bookings identical")
@@ -0,0 +1,23 @@
+"""Compile app/data/*.csv into the memory-mapped columnar snapshot the app loads.
+
+Usage: python scripts/compile_snapshot.py [DATA_DIR]   (default: app/data)
+Writes DATA_DIR/.compiled/; the app falls back to the CSVs for any table whose
+source changed after compiling, so re-run this after dropping in new extracts.
+"""
+import sys
+import pathlib
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from app.model.compiled import compile_snapshot  # noqa: E402
+
+
+def run(data_dir: pathlib.Path):
+    manifest = compile_snapshot(data_dir)
+    for name, meta in manifest["tables"].items():
+        print(f"✓ {name:<17} {meta['rows']:>9,} rows  {len(meta['columns'])} cols  ({meta['file']})")
+
+
+if __name__ == "__main__":
+    run(pathlib.Path(sys.argv[1]) if len(sys.argv) > 1 else ROOT / "app" / "data")
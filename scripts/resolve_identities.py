@@ -0,0 +1,50 @@
+"""Resolve every person reference in the booking tables and write the crosswalk.
+
+Usage: python scripts/resolve_identities.py [DATA_DIR]   (default: app/data)
+Reads Allocation.resource_id and SiteAllocation.resource_id, resolves each
+distinct alias against Resource.csv (see app/model/identity.py) and writes
+DATA_DIR/ResourceCrosswalk.csv. Rows marked method=manual are kept as they
+are; fill in resource_key on unresolved/ambiguous rows and mark them manual
+to pin them. The app picks the file up on its next reload.
+"""
+import sys
+import time
+import pathlib
+from collections import Counter
+
+import pandas as pd
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from app.model.identity import UNRESOLVED, AMBIGUOUS  # noqa: E402
+from app.model.keys import labels  # noqa: E402
+from app.model.loader import SPECS  # noqa: E402
+from app.model.snapshot import load_dataset  # noqa: E402
+
+REFERENCES = (("allocations", "resource_id"), ("site_allocations", "resource_id"))
+
+
+def run(data_dir: pathlib.Path):
+    ds = load_dataset(data_dir)
+    resolver = ds.resource_keys
+    t0 = time.perf_counter()
+    for table, col in REFERENCES:
+        resolver.resolve_all(labels(ds.frame(table), col))
+    secs = time.perf_counter() - t0
+
+    rows = resolver.crosswalk_rows(ds.crosswalk)
+    out = data_dir / SPECS["crosswalk"].file
+    pd.DataFrame(rows, columns=["alias", "resource_key", "method"]).to_csv(out, index=False)
+
+    by_method = Counter(r["method"] for r in rows)
+    print(f"✓ {len(rows):,} aliases against {len(resolver):,} people in {secs:.3f}s -> {out}")
+    for m, n in by_method.most_common():
+        print(f"  {m:<11} {n:>7,}")
+    todo = [r["alias"] for r in rows if r["method"] in (UNRESOLVED, AMBIGUOUS)]
+    if todo:
+        print(f"  needs review: {', '.join(todo[:10])}{' …' if len(todo) > 10 else ''}")
+
+
+if __name__ == "__main__":
+    run(pathlib.Path(sys.argv[1]) if len(sys.argv) > 1 else ROOT / "app" / "data")